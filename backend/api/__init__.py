@@ -5,7 +5,9 @@ from .routes.animals import router as animals_router
 from .routes.event_types import router as event_types_router
 from .routes.events import router as events_router
 from .routes.groups import router as groups_router
+from .routes.metrics import router as metrics_router
 from .routes.roles import router as roles_router
+from .routes.search import router as search_router
 from .routes.upload import router as upload_router
 from .routes.users import router as users_router
 from .routes.zoo import router as zoo_router
@@ -19,5 +21,7 @@ api_router.include_router(events_router)
 api_router.include_router(event_types_router)
 api_router.include_router(groups_router)
 api_router.include_router(roles_router)
+api_router.include_router(search_router)
 api_router.include_router(upload_router)
 api_router.include_router(admin_router)
+api_router.include_router(metrics_router)
@@ -1,48 +1,215 @@
 from typing import Annotated, AsyncGenerator
 
-from fastapi import Depends, status
+from fastapi import Depends, Query, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import defaultload
+from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 from starlette.exceptions import HTTPException
 
-from core.db import engine
+from core.config import settings
+from core.db import engine, replica_engine
+from core.replica import (
+    LAG_CHECK_INTERVAL,
+    LAG_QUERY,
+    SAFE_METHODS,
+    lag_check_due,
+    note_write,
+    replica_failed,
+    replica_usable,
+)
 from core.security import get_token_data
-from db.users import get_user_by_username
-from models import User
-from schemas import TokenData
+from db.permissions import PermissionType, ensure_role_permissions, has_permission
+from db.tokens import is_revoked, principal_from_claims
+from db.utils import MAX_PAGE_SIZE, SortOrder, estimate_count, paginate
+from models import Role, User
+from schemas import Principal, TokenData
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login")
 
 
-async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
+async def get_db_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSession(engine) as session:
         yield session
+    # the caller's next reads shouldn't miss what it just wrote
+    if request.method not in SAFE_METHODS:
+        note_write(request)
 
 
 SessionDep = Annotated[AsyncSession, Depends(get_db_session)]
 
 
-async def get_current_user(
-    token: Annotated[str, Depends(oauth2_scheme)], session: SessionDep
-) -> User:
-    credentials_exception = HTTPException(
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    A session for routes that only read, on the replica when it is configured,
+    reachable, caught up and the caller has no recent writes of its own.
+    """
+    session = None
+    if replica_engine and replica_usable(request):
+        session = AsyncSession(replica_engine)
+        try:
+            if lag_check_due():
+                lag = await session.scalar(text(LAG_QUERY))
+                if lag > settings.REPLICA_MAX_LAG:
+                    replica_failed(retry_after=LAG_CHECK_INTERVAL)
+                    await session.close()
+                    session = None
+            else:
+                await session.connection()
+        except (DBAPIError, OSError):
+            replica_failed()
+            await session.close()
+            session = None
+
+    async with session or AsyncSession(engine) as session:
+        yield session
+
+
+ReadSessionDep = Annotated[AsyncSession, Depends(get_read_session)]
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _decode_token(token: str) -> dict:
     try:
         payload = get_token_data(token)
-        username = payload.get("sub")  # type: ignore
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
     except JWTError:
-        raise credentials_exception
-    user = await get_user_by_username(token_data.username, session)  # type: ignore
+        raise _credentials_exception()
+    if payload.get("sub") is None:
+        raise _credentials_exception()
+    return payload
+
+
+async def _load_user(session: AsyncSession, username: str) -> User:
+    # permissions come from the per-role cache, skip joining them on every request
+    user = (
+        await session.exec(
+            select(User)
+            .where(User.username == username)
+            .options(defaultload(User.role).lazyload(Role.permissions))  # type: ignore
+        )
+    ).first()
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+
+    await ensure_role_permissions(session, user.role_id)
     return user
 
 
+async def get_current_user(
+    token: Annotated[str, Depends(oauth2_scheme)], session: SessionDep
+) -> User:
+    payload = _decode_token(token)
+    token_data = TokenData(username=payload["sub"])
+    return await _load_user(session, token_data.username)  # type: ignore
+
+
 CurrentUser = Annotated[User, Depends(get_current_user)]
+
+
+async def get_principal(
+    token: Annotated[str, Depends(oauth2_scheme)], session: SessionDep
+) -> Principal:
+    """
+    The caller as described by the token's claims, verified without touching
+    the database. Tokens without claims, or whose claims were revoked by a
+    role or tier change, fall back to loading the user.
+    """
+    payload = _decode_token(token)
+
+    claims = principal_from_claims(payload)
+    if claims:
+        principal, version = claims
+        if not await is_revoked(principal.id, version):
+            # only queries for a role this worker hasn't cached yet
+            await ensure_role_permissions(session, principal.role_id)
+            return principal
+
+    user = await _load_user(session, payload["sub"])
+    return Principal(
+        id=user.id,
+        username=user.username,
+        role_id=user.role_id,
+        role=user.role.name,
+        tier=user.tier,
+        zoo_id=user.zoo_id,
+    )
+
+
+CurrentPrincipal = Annotated[Principal, Depends(get_principal)]
+
+
+def require_permission(permission: PermissionType):
+    """Route dependency, e.g. `dependencies=[require_permission("create_events")]`."""
+
+    async def check(principal: CurrentPrincipal) -> None:
+        if not has_permission(principal, permission):
+            raise HTTPException(
+                status_code=401, detail="You are not authorized to perform this action"
+            )
+
+    return Depends(check)
+
+
+class PageParams:
+    """
+    Opt-in keyset pagination for list endpoints.
+
+    Without a `limit` the full list is returned as before. The cursor for the
+    next page is sent in the `X-Next-Cursor` header and, when `count=true`, a
+    planner estimate of the total rows in `X-Total-Count`.
+    """
+
+    def __init__(
+        self,
+        response: Response,
+        limit: int | None = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+        cursor: str | None = None,
+        count: bool = False,
+    ):
+        self.response = response
+        self.limit = limit
+        self.cursor = cursor
+        self.count = count
+        self.next_cursor: str | None = None
+
+    async def fetch(
+        self,
+        session: AsyncSession,
+        query,
+        sort_column,
+        id_column,
+        order: SortOrder = "asc",
+        key=None,
+    ) -> list:
+        if self.count:
+            total = await estimate_count(session, query)
+            self.response.headers["X-Total-Count"] = str(total)
+
+        rows, next_cursor = await paginate(
+            session,
+            query,
+            sort_column,
+            id_column,
+            order=order,
+            limit=self.limit,
+            cursor=self.cursor,
+            key=key,
+        )
+        self.next_cursor = next_cursor
+        if next_cursor:
+            self.response.headers["X-Next-Cursor"] = next_cursor
+
+        return rows
+
+
+Pagination = Annotated[PageParams, Depends()]
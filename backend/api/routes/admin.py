@@ -1,12 +1,12 @@
 import tempfile
 from datetime import date
 
-import pandas as pd
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import FileResponse
 from sqlmodel import select
 
-from api.deps import CurrentUser, SessionDep
+from api.deps import CurrentUser, ReadSessionDep, require_permission
+from core.singleflight import stats as coalescing_stats
 from db.permissions import has_permission
 from models import Animal, Event, User
 
@@ -15,14 +15,21 @@ router = APIRouter(prefix="/admin", tags=["admin"])
 
 @router.get("/reports", response_class=FileResponse)
 async def get_reports(
-    from_: date, to: date, entity: str, current_user: CurrentUser, session: SessionDep
+    from_: date,
+    to: date,
+    entity: str,
+    current_user: CurrentUser,
+    session: ReadSessionDep,
 ):
-    if not has_permission(current_user.role.permissions, "create_reports"):
+    if not has_permission(current_user, "create_reports"):
         raise HTTPException(status_code=400, detail="Not enough permissions")
 
     if entity not in ["events", "animals", "users"]:
         raise HTTPException(status_code=400, detail="Invalid entity")
 
+    # pandas (and numpy) take a few hundred ms to import, only pay for it here
+    import pandas as pd
+
     if entity == "animals":
         animals = await session.exec(
             select(Animal)
@@ -60,3 +67,15 @@ async def get_reports(
         tmp_file_name, media_type="text/csv", filename=f"{entity}.csv"
     )
     return response
+
+
+@router.get("/coalescing", dependencies=[require_permission("create_reports")])
+async def get_coalescing_stats() -> dict[str, dict[str, int]]:
+    """
+    Per coalesced route, the handler runs since startup and the requests
+    that shared a concurrent run instead of executing it again.
+    """
+    return {
+        name: {"executions": counts["executions"], "shared": counts["shared"]}
+        for name, counts in coalescing_stats.items()
+    }
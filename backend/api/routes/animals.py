@@ -1,64 +1,93 @@
 from datetime import UTC, date, datetime, timedelta
+from typing import Literal
 
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy import func
-from sqlalchemy.orm import joinedload
 from sqlmodel import and_, col, desc, select
 
-from api.deps import CurrentUser, SessionDep
-from core.utils import snake_to_capital_case
+from api.deps import (
+    CurrentPrincipal,
+    CurrentUser,
+    Pagination,
+    ReadSessionDep,
+    SessionDep,
+    require_permission,
+)
+from core.singleflight import coalesce
+from core.utils import as_utc, snake_to_capital_case
 from db.animals import (
-    get_all_animals,
     get_animal_by_id,
+    get_animals_query,
     get_animals_status,
+    get_health_log_timeline_query,
     log_audit,
     log_fields_update,
     retrieve_animal_logs,
     toggle_animal_availability,
 )
+from db.archive import get_archived_audits, get_archived_health_logs
 from db.events import get_events_details
+from db.forecast import forecast_availability
+from db.history import stream_animal_history
 from db.permissions import has_permission
+from db.typeahead import suggest_animals
+from db.users import get_users_by_ids
+from db.utils import SortOrder, decode_cursor, encode_cursor
 from models import (
     Animal,
     AnimalAudit,
     AnimalAuditWithDetails,
     AnimalEvent,
-    AnimalEventWithDetails,
+    AnimalForecast,
     AnimalHealthLog,
     AnimalHealthLogIn,
     AnimalHealthLogWithDetails,
     AnimalIn,
+    AnimalSuggestion,
     AnimalWithCurrentEvent,
     AnimalWithEvents,
     Event,
-    EventComment,
-    EventCommentWithUser,
-    EventWithDetailsAndComments,
     FeedEvent,
+    HealthLogEntry,
+    HealthLogTimeline,
     RestingAnimal,
-    UserEvent,
-    UserEventWithDetails,
     Zoo,
 )
 
 router = APIRouter(prefix="/animals", tags=["Animals"])
 
+TIMELINE_PAGE_SIZE = 50
+MAX_FORECAST_WINDOW = timedelta(days=7)
+
 
 @router.get("/")
 async def read_all_animals(
-    session: SessionDep, zoo_id: int | None = None
+    session: SessionDep,
+    page: Pagination,
+    zoo_id: int | None = None,
+    status: Literal["checked_in", "checked_out", "unavailable"] | None = None,
+    species: str | None = None,
+    sort: Literal["updated_at", "created_at", "name"] = "updated_at",
+    order: SortOrder = "desc",
 ) -> list[Animal]:
-    return await get_all_animals(zoo_id, session)
+    query = get_animals_query(zoo_id=zoo_id, status=status, species=species)
+    return await page.fetch(
+        session, query, col(getattr(Animal, sort)), col(Animal.id), order
+    )
 
 
 @router.get("/status")
-async def get_animal_status(session: SessionDep, zoo_id: int | None = None):
+@coalesce
+async def get_animal_status(session: ReadSessionDep, zoo_id: int | None = None):
     return await get_animals_status(session, zoo_id=zoo_id)
 
 
 @router.get("/feed")
-async def get_feed(session: SessionDep) -> list[FeedEvent]:
+@coalesce
+async def get_feed(
+    session: ReadSessionDep, days: int = Query(default=30, ge=1, le=366)
+) -> list[FeedEvent]:
     req_actions = [
         "checked_in",
         "checked_out",
@@ -70,7 +99,11 @@ async def get_feed(session: SessionDep) -> list[FeedEvent]:
 
     feed = await session.exec(
         select(AnimalAudit)
-        .where(col(AnimalAudit.action).in_(req_actions))
+        .where(
+            col(AnimalAudit.action).in_(req_actions),
+            # bounded so only the latest monthly partitions are scanned
+            col(AnimalAudit.changed_at) >= datetime.now(UTC) - timedelta(days=days),
+        )
         .order_by(desc(AnimalAudit.changed_at))
     )
     feed = list(feed.unique())
@@ -89,6 +122,47 @@ async def get_feed(session: SessionDep) -> list[FeedEvent]:
     return feed_list
 
 
+@router.get("/forecast")
+async def get_availability_forecast(
+    session: ReadSessionDep,
+    zoo_id: int,
+    from_: datetime = Query(alias="from"),
+    to: datetime = Query(),
+    step: int = Query(default=15, ge=5, le=60),
+) -> list[AnimalForecast]:
+    """
+    Every animal's projected availability between `from` and `to`, in `step`
+    minute resolution, from its scheduled events, rest time and daily caps.
+    """
+    # either may come without an offset, those are taken as UTC
+    from_, to = as_utc(from_), as_utc(to)
+    if to <= from_:
+        raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+
+    if to - from_ > MAX_FORECAST_WINDOW:
+        raise HTTPException(
+            status_code=400, detail="Forecast window can't be longer than a week"
+        )
+
+    if (24 * 60) % step:
+        raise HTTPException(status_code=400, detail="'step' must divide a day evenly")
+
+    return await forecast_availability(
+        session, zoo_id, from_, to, timedelta(minutes=step)
+    )
+
+
+@router.get("/typeahead")
+async def get_animal_suggestions(
+    session: ReadSessionDep,
+    principal: CurrentPrincipal,
+    q: str = Query(min_length=1, max_length=100),
+    limit: int = Query(default=10, ge=1, le=50),
+) -> list[AnimalSuggestion]:
+    """The best matches for `q` in the caller's zoo, for pickers as the user types."""
+    return await suggest_animals(session, q, limit, zoo_id=principal.zoo_id)
+
+
 @router.get("/{animal_id}")
 async def get_animal(animal_id: int, session: SessionDep) -> Animal:
     animal = await get_animal_by_id(animal_id, session)
@@ -132,65 +206,12 @@ async def get_animal_details(animal_id: int, session: SessionDep) -> AnimalWithE
     )
 
     # events
-    events = await session.exec(
-        select(Event).join(AnimalEvent).where(AnimalEvent.animal_id == animal_id)
-    )
-    events = events.all()
-
-    event_ids = [event.id for event in events]
-    print("event_ids", event_ids)
-    event_animal_details: list[AnimalEvent] = await session.exec(
-        select(AnimalEvent)
-        .where(col(AnimalEvent.event_id).in_(event_ids))
-        .options(
-            joinedload(AnimalEvent.animal),  # type: ignore
-        )
-    )
-    event_animal_details = list(event_animal_details.unique())  # type: ignore
-
-    event_user_details = await session.exec(
-        select(UserEvent)
-        .where(col(UserEvent.event_id).in_(event_ids))
-        .options(
-            joinedload(UserEvent.user),  # type: ignore
-        )
+    animal_events = select(AnimalEvent.event_id).where(
+        AnimalEvent.animal_id == animal_id
     )
-    event_user_details = list(event_user_details.unique())
-
-    events_comments = await session.exec(
-        select(EventComment)
-        .where(col(EventComment.event_id).in_(event_ids))
-        .options(
-            joinedload(EventComment.user)  # type: ignore
-        )
+    events_with_details = await get_events_details(
+        session, col(Event.id).in_(animal_events)
     )
-    events_comments = list(events_comments.unique())
-
-    events_with_details: list[EventWithDetailsAndComments] = []
-    for event in events:
-        event_details = EventWithDetailsAndComments(
-            event=event,
-            animals=[
-                AnimalEventWithDetails(
-                    animal_event=animal_event, animal=animal_event.animal
-                )
-                for animal_event in event_animal_details
-                if animal_event.event_id == event.id
-            ],
-            users=[
-                UserEventWithDetails(user_event=user_event, user=user_event.user)
-                for user_event in event_user_details
-                if user_event.event_id == event.id
-            ],
-            comments=[
-                EventCommentWithUser(user=event_comment.user, comment=event_comment)
-                for event_comment in events_comments
-                if event_comment.event_id == event.id
-            ],
-            event_type=event.event_type,
-            zoo=event.zoo,
-        )
-        events_with_details.append(event_details)
 
     # separate events based on current, past, upcoming
     current_time = datetime.now(UTC)
@@ -208,7 +229,12 @@ async def get_animal_details(animal_id: int, session: SessionDep) -> AnimalWithE
 
     # calculate weekly activity (total duration of events in a week)
     weekly_event_activity = sum(
-        (event.duration for event in event_animal_details if event.duration),
+        (
+            animal.animal_event.duration
+            for event in events_with_details
+            for animal in event.animals
+            if animal.animal_event.duration
+        ),
         timedelta(0),
     )
 
@@ -225,7 +251,8 @@ async def get_animal_details(animal_id: int, session: SessionDep) -> AnimalWithE
 
 
 @router.get("/details/resting")
-async def get_resting_animals(session: SessionDep) -> list[RestingAnimal]:
+@coalesce
+async def get_resting_animals(session: ReadSessionDep) -> list[RestingAnimal]:
     animals_status = await get_animals_status(session)
 
     resting_animals = list(
@@ -252,14 +279,15 @@ async def get_resting_animals(session: SessionDep) -> list[RestingAnimal]:
             weekly_event_activity_hours=weekly_event_activity_hours,
             daily_checkout_count=animal.daily_event_count,
             daily_checkout_duration=animal.daily_event_duration,
-            health_logs=await get_animal_health_logs(animal.animal.id, session),
+            health_logs=await retrieve_animal_logs(animal.animal.id, session),
         )
         for animal in resting_animals
     ]
 
 
 @router.get("/details/checkedout")
-async def get_checked_out_animals(session: SessionDep) -> list[AnimalWithCurrentEvent]:
+@coalesce
+async def get_checked_out_animals(session: ReadSessionDep) -> list[AnimalWithCurrentEvent]:
     animals = await session.exec(
         select(Animal, AnimalEvent)
         .join(AnimalEvent)
@@ -273,10 +301,7 @@ async def get_checked_out_animals(session: SessionDep) -> list[AnimalWithCurrent
     animals = list(animals.all())
 
     events_ids = [animal_event.event_id for animal, animal_event in animals]
-    events = await session.exec(select(Event).where(col(Event.id).in_(events_ids)))
-    events = list(events.unique())
-
-    events_details = await get_events_details(session, events)
+    events_details = await get_events_details(session, col(Event.id).in_(events_ids))
 
     animals_with_events = []
     for animal, animal_event in animals:
@@ -298,13 +323,8 @@ async def get_checked_out_animals(session: SessionDep) -> list[AnimalWithCurrent
     return animals_with_events
 
 
-@router.post("/")
+@router.post("/", dependencies=[require_permission("add_animal")])
 async def create_animal(body: AnimalIn, session: SessionDep, current_user: CurrentUser):
-    if not has_permission(current_user.role.permissions, "add_animal"):
-        raise HTTPException(
-            status_code=401, detail="You are not authorized to perform this action"
-        )
-
     animal = Animal(**body.model_dump())
     session.add(animal)
     await session.commit()
@@ -323,13 +343,8 @@ async def create_animal(body: AnimalIn, session: SessionDep, current_user: Curre
     return JSONResponse({"message": "Animal created"}, status_code=200)
 
 
-@router.delete("/{animal_id}")
+@router.delete("/{animal_id}", dependencies=[require_permission("delete_animals")])
 async def delete_animal(animal_id: int, session: SessionDep, current_user: CurrentUser):
-    if not has_permission(current_user.role.permissions, "delete_animals"):
-        raise HTTPException(
-            status_code=401, detail="You are not authorized to perform this action"
-        )
-
     animal = await get_animal_by_id(animal_id, session)
     if not animal:
         raise HTTPException(status_code=404, detail="Animal not found")
@@ -371,18 +386,13 @@ async def delete_animal(animal_id: int, session: SessionDep, current_user: Curre
     return {"message": "Animal deleted"}
 
 
-@router.put("/{animal_id}")
+@router.put("/{animal_id}", dependencies=[require_permission("update_animals")])
 async def update_animal(
     animal_id: int,
     animal_update: AnimalIn,
     session: SessionDep,
     current_user: CurrentUser,
 ):
-    if not has_permission(current_user.role.permissions, "update_animals"):
-        raise HTTPException(
-            status_code=401, detail="You are not authorized to perform this action"
-        )
-
     animal = await get_animal_by_id(animal_id, session)
     if not animal:
         raise HTTPException(status_code=404, detail="Animal not found")
@@ -398,60 +408,142 @@ async def update_animal(
     return JSONResponse(content={"message": "Animal updated"}, status_code=200)
 
 
-@router.put("/{animal_id}/unavailable")
+@router.put(
+    "/{animal_id}/unavailable",
+    dependencies=[require_permission("make_animal_unavailable")],
+)
 async def mark_animal_unavailable(
     animal_id: int, session: SessionDep, current_user: CurrentUser
 ):
-    if not has_permission(current_user.role.permissions, "make_animal_unavailable"):
-        raise HTTPException(
-            status_code=401, detail="You are not authorized to perform this action"
-        )
-
     await toggle_animal_availability(session, animal_id, current_user.id, "unavailable")
     return JSONResponse(
         content={"message": "Animal marked unavailable"}, status_code=200
     )
 
 
-@router.put("/{animal_id}/available")
+@router.put(
+    "/{animal_id}/available", dependencies=[require_permission("make_animal_available")]
+)
 async def mark_animal_available(
     animal_id: int, session: SessionDep, current_user: CurrentUser
 ):
-    if not has_permission(current_user.role.permissions, "make_animal_available"):
-        raise HTTPException(
-            status_code=401, detail="You are not authorized to perform this action"
-        )
-
     await toggle_animal_availability(session, animal_id, current_user.id, "available")
     return JSONResponse(content={"message": "Animal marked available"}, status_code=200)
 
 
+@router.get("/{animal_id}/history")
+async def get_animal_history(
+    animal_id: int, session: SessionDep, order: SortOrder = "desc"
+) -> StreamingResponse:
+    """
+    Audits, health logs and event participations in one time ordered stream,
+    as newline delimited JSON objects with a `type` and an `at` timestamp.
+    """
+    animal = await get_animal_by_id(animal_id, session)
+    if not animal:
+        raise HTTPException(status_code=404, detail="Animal not found")
+
+    return StreamingResponse(
+        stream_animal_history(animal_id, order), media_type="application/x-ndjson"
+    )
+
+
 @router.get("/{animal_id}/audits")
 async def get_animal_audits(
-    animal_id: int, session: SessionDep
+    animal_id: int,
+    session: ReadSessionDep,
+    from_: datetime | None = Query(default=None, alias="from"),
+    to: datetime | None = None,
 ) -> list[AnimalAuditWithDetails]:
     animal = await get_animal_by_id(animal_id, session)
     if not animal:
         raise HTTPException(status_code=404, detail="Animal not found")
 
+    # a time range lets postgres skip the monthly partitions outside of it
     audits = await session.exec(
         select(AnimalAudit)
-        .where(col(AnimalAudit.animal_id) == animal_id)
+        .where(
+            col(AnimalAudit.animal_id) == animal_id,
+            col(AnimalAudit.changed_at) >= from_ if from_ else True,
+            col(AnimalAudit.changed_at) < to if to else True,
+        )
         .order_by(desc(AnimalAudit.changed_at))
     )
-    audits = audits.unique()
-
-    return [
+    audits = [
         AnimalAuditWithDetails(audit=audit, animal=audit.animal, user=audit.user)
-        for audit in audits
+        for audit in audits.unique()
     ]
 
+    # only a range with a start can reach back into the cold archive
+    if from_:
+        ids = {audit.audit.id for audit in audits}
+        archived = await get_archived_audits(session, animal, from_, to)
+        audits += [audit for audit in archived if audit.audit.id not in ids]
+        audits.sort(key=lambda audit: audit.audit.changed_at, reverse=True)
+
+    return audits
+
 
 @router.get("/{animal_id}/health-log")
 async def get_animal_health_logs(
-    animal_id: int, session: SessionDep
+    animal_id: int,
+    session: ReadSessionDep,
+    from_: datetime | None = Query(default=None, alias="from"),
+    to: datetime | None = None,
 ) -> list[AnimalHealthLogWithDetails]:
-    return await retrieve_animal_logs(animal_id, session)
+    logs = await retrieve_animal_logs(animal_id, session, from_, to)
+
+    if from_:
+        animal = await get_animal_by_id(animal_id, session)
+        ids = {log.log.id for log in logs}
+        archived = await get_archived_health_logs(session, animal, from_, to)
+        logs += [log for log in archived if log.log.id not in ids]
+        logs.sort(key=lambda log: log.log.logged_at, reverse=True)
+
+    return logs
+
+
+@router.get("/{animal_id}/health-log/timeline")
+async def get_animal_health_log_timeline(
+    animal_id: int,
+    session: ReadSessionDep,
+    page: Pagination,
+    since: str | None = None,
+) -> HealthLogTimeline:
+    """
+    Health logs newest first, paged by (logged_at, id). With `since` (from an
+    earlier response) only the logs added after it are returned.
+    """
+    animal = await get_animal_by_id(animal_id, session)
+    if not animal:
+        raise HTTPException(status_code=404, detail="Animal not found")
+
+    logged_at = col(AnimalHealthLog.logged_at)
+    query = get_health_log_timeline_query(
+        animal_id, decode_cursor(since, logged_at) if since else None
+    )
+
+    page.limit = page.limit or TIMELINE_PAGE_SIZE
+    logs = await page.fetch(
+        session,
+        query,
+        logged_at,
+        col(AnimalHealthLog.id),
+        "desc",
+        key=lambda log: (log.logged_at, log.id),
+    )
+    users = await get_users_by_ids(session, {log.logged_by for log in logs})
+
+    # the first page starts at the newest log, later pages keep the old mark
+    if logs and not page.cursor:
+        since = encode_cursor(logs[0].logged_at, logs[0].id)
+
+    return HealthLogTimeline(
+        animal=animal,
+        users=users,  # type: ignore
+        logs=[HealthLogEntry.model_validate(log._mapping) for log in logs],
+        since=since,
+    )
 
 
 @router.post("/{animal_id}/health-log")
@@ -461,7 +553,7 @@ async def create_animal_health_log(
     session: SessionDep,
     current_user: CurrentUser,
 ):
-    if not has_permission(current_user.role.permissions, "add_animal_health_log"):
+    if not has_permission(current_user, "add_animal_health_log"):
         raise HTTPException(
             status_code=401, detail="Not Authorized to perform this action"
         )
@@ -500,7 +592,7 @@ async def update_animal_health_log(
     session: SessionDep,
     current_user: CurrentUser,
 ):
-    if not has_permission(current_user.role.permissions, "add_animal_health_log"):
+    if not has_permission(current_user, "add_animal_health_log"):
         raise HTTPException(
             status_code=401, detail="Not Authorized to perform this action"
         )
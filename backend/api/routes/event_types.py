@@ -22,7 +22,7 @@ async def create_event_type(
     session: SessionDep,
     current_user: CurrentUser,
 ):
-    if not has_permission(current_user.role.permissions, "create_event_type"):
+    if not has_permission(current_user, "create_event_type"):
         raise HTTPException(
             status_code=403, detail="You don't have permission to create an event type"
         )
@@ -56,7 +56,7 @@ async def update_event_type(
     current_user: CurrentUser,
     event_updated: EventTypeIn = Body(...),
 ):
-    if not has_permission(current_user.role.permissions, "update_event_type"):
+    if not has_permission(current_user, "update_event_type"):
         raise HTTPException(
             status_code=403, detail="You don't have permission to update an event type"
         )
@@ -86,7 +86,7 @@ async def update_group(
     session: SessionDep,
     current_user: CurrentUser,
 ):
-    if not has_permission(current_user.role.permissions, "update_event_type"):
+    if not has_permission(current_user, "update_event_type"):
         raise HTTPException(
             status_code=403, detail="You don't have permission to update an event type"
         )
@@ -108,7 +108,7 @@ async def update_zoo(
     session: SessionDep,
     current_user: CurrentUser,
 ):
-    if not has_permission(current_user.role.permissions, "update_event_type"):
+    if not has_permission(current_user, "update_event_type"):
         raise HTTPException(
             status_code=403, detail="You don't have permission to update an event type"
         )
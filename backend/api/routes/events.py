@@ -1,13 +1,23 @@
-from datetime import UTC, datetime
+from datetime import UTC, date, datetime, time, timedelta
+from typing import Literal
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, File, Form, HTTPException, Query, UploadFile
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from sqlalchemy import func
 from sqlalchemy.orm import joinedload
 from sqlmodel import and_, col, select
 
-from api.deps import CurrentUser, SessionDep
+from api.deps import (
+    CurrentPrincipal,
+    CurrentUser,
+    Pagination,
+    ReadSessionDep,
+    SessionDep,
+    require_permission,
+)
+from core.metrics import CHECKINS, CHECKOUTS
+from core.singleflight import coalesce
 from db.animals import (
     log_audit,
     update_animals_status,
@@ -16,16 +26,40 @@ from db.animals import (
     validate_event_clashes,
     validate_tiers,
 )
-from db.events import get_events_details
-from db.permissions import has_permission
+from db.events import (
+    get_calendar_events,
+    get_calendar_summary,
+    get_events_details,
+    get_events_query,
+)
+from db.event_import import import_events, parse_events_csv, raise_row_errors
+from db.planning import plan_event_assignments
+from db.series import (
+    cancel_occurrence,
+    get_materialized,
+    get_page_occurrences,
+    get_series,
+    materialize_occurrence,
+    merge_by_start,
+    series_until,
+    validate_occurrence,
+    validate_series_clashes,
+)
 from db.users import validate_check_in_out_permissions, validate_users
+from db.utils import SortOrder
 from models import (
     Animal,
     AnimalEvent,
+    CalendarDay,
+    CalendarEvent,
     Event,
     EventComment,
     EventCommentIn,
     EventCreate,
+    EventImportResult,
+    EventPlan,
+    EventSeries,
+    EventSeriesCreate,
     EventType,
     EventWithDetails,
     EventWithDetailsAndComments,
@@ -33,16 +67,34 @@ from models import (
     User,
     UserEvent,
 )
+from schemas import MAX_IMPORT_ROWS, EventImport, PlanRequest
 
 router = APIRouter(prefix="/events", tags=["Events"])
 
 
 @router.get("/")
-async def read_all_events(session: SessionDep, details: bool = True):
+async def read_all_events(
+    session: ReadSessionDep,
+    page: Pagination,
+    details: bool = True,
+    zoo_id: int | None = None,
+    from_: datetime | None = Query(default=None, alias="from"),
+    to: datetime | None = None,
+    sort: Literal["start_at", "created_at"] = "start_at",
+    order: SortOrder = "asc",
+):
+    """
+    With both `from` and `to`, occurrences of recurring events that are not
+    events yet are included too, without an id; a page then also holds the
+    occurrences between its first and last event.
+    """
+    query = get_events_query(zoo_id=zoo_id, from_=from_, to=to)
+    sort_column = col(getattr(Event, sort))
+    expand = bool(from_ and to and sort == "start_at")
+
     if details:
         query = (
-            select(
-                Event,
+            query.add_columns(
                 EventType,
                 func.count(col(AnimalEvent.animal_id)).label("animal_count"),
             )
@@ -50,34 +102,83 @@ async def read_all_events(session: SessionDep, details: bool = True):
             .join(EventType)
             .group_by(col(Event.id), col(EventType.id))
         )
-        events = (await session.exec(query)).all()
-        return [
+        events = await page.fetch(
+            session,
+            query,
+            sort_column,
+            col(Event.id),
+            order,
+            key=lambda row: (getattr(row[0], sort), row[0].id),
+        )
+        items = [
             {"event": event, "animal_count": animal_count, "event_type": event_type}
             for event, event_type, animal_count in events
         ]
-
-    query = select(Event)
-    events = (await session.exec(query)).all()
+        if expand:
+            occurrences = await get_page_occurrences(
+                session,
+                from_,  # type: ignore
+                to,  # type: ignore
+                zoo_id,
+                order,
+                page.cursor,
+                events[-1][0].start_at if page.next_cursor else None,
+            )
+            event_types = {
+                event_type.id: event_type
+                for event_type in await session.exec(
+                    select(EventType).where(
+                        col(EventType.id).in_(
+                            {event.event_type_id for event, _ in occurrences}
+                        )
+                    )
+                )
+            }
+            items = merge_by_start(
+                items,
+                [
+                    {
+                        "event": event,
+                        "animal_count": len(series.animal_ids),
+                        "event_type": event_types[event.event_type_id],
+                    }
+                    for event, series in occurrences
+                ],
+                order,
+                key=lambda item: item["event"].start_at,
+            )
+        return items
+
+    events = await page.fetch(session, query, sort_column, col(Event.id), order)
+    if expand:
+        occurrences = await get_page_occurrences(
+            session,
+            from_,  # type: ignore
+            to,  # type: ignore
+            zoo_id,
+            order,
+            page.cursor,
+            events[-1].start_at if page.next_cursor else None,
+        )
+        events = merge_by_start(
+            events,
+            [event for event, _ in occurrences],
+            order,
+            key=lambda event: event.start_at,
+        )
     return events
 
 
 @router.get("/details")
+@coalesce
 async def get_events_details_by_date(
     session: SessionDep,
     id: int = Query(..., description="Event ID to filter events"),
 ) -> EventWithDetailsAndComments:
-    query = (
-        select(
-            Event,
-        )
-        .where(Event.id == id)
-        .options(
-            joinedload(Event.event_type),  # type: ignore
-            joinedload(Event.zoo),  # type: ignore
-        )
-    )
-    events = list((await session.exec(query)).all())
-    return (await get_events_details(session, events))[0]
+    events = await get_events_details(session, col(Event.id) == id)
+    if not events:
+        raise HTTPException(status_code=404, detail="Event not found")
+    return events[0]
 
 
 class GetUpcomingLiveEvents(BaseModel):
@@ -86,22 +187,12 @@ class GetUpcomingLiveEvents(BaseModel):
 
 
 @router.get("/details/upcoming-live")
+@coalesce
 async def get_upcoming_live_events(
-    session: SessionDep,
+    session: ReadSessionDep,
 ) -> GetUpcomingLiveEvents:
     now = datetime.now(UTC)
-    query = (
-        select(
-            Event,
-        )
-        .where(Event.end_at > now)
-        .options(
-            joinedload(Event.event_type),  # type: ignore
-            joinedload(Event.zoo),  # type: ignore
-        )
-    )
-    events = list((await session.exec(query)).all())
-    events_details = await get_events_details(session, events)
+    events_details = await get_events_details(session, col(Event.end_at) > now)
 
     live, upcoming = [], []
     for event in events_details:
@@ -113,13 +204,188 @@ async def get_upcoming_live_events(
     return GetUpcomingLiveEvents(live=live, upcoming=upcoming)
 
 
-@router.post("/")
+@router.get("/calendar")
+@coalesce
+async def get_events_calendar(
+    session: ReadSessionDep,
+    from_: date = Query(alias="from"),
+    to: date = Query(),
+    zoo_id: int | None = None,
+    summary: bool = False,
+) -> list[CalendarEvent] | list[CalendarDay]:
+    if to < from_:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+
+    if (to - from_).days > 366:
+        raise HTTPException(
+            status_code=400, detail="Calendar window can't be longer than a year"
+        )
+
+    # both ends are inclusive days
+    start = datetime.combine(from_, time(), tzinfo=UTC)
+    end = datetime.combine(to + timedelta(days=1), time(), tzinfo=UTC)
+
+    if summary:
+        return await get_calendar_summary(session, start, end, zoo_id=zoo_id)
+    return await get_calendar_events(session, start, end, zoo_id=zoo_id)
+
+
+@router.post("/plan", dependencies=[require_permission("create_events")])
+async def plan_events(
+    body: PlanRequest, session: SessionDep, principal: CurrentPrincipal
+) -> EventPlan:
+    """
+    Propose animals for a batch of events without creating anything, keeping
+    to existing schedules, rest time, daily caps and the planner's tier.
+    """
+    for event in body.events:
+        if event.end_at <= event.start_at:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Event {event.name} must end after its start time",
+            )
+
+    return await plan_event_assignments(session, body, principal.tier)
+
+
+@router.post("/import", dependencies=[require_permission("create_events")])
+async def import_events_json(
+    body: EventImport, session: SessionDep, current_user: CurrentUser
+) -> EventImportResult:
+    """
+    Create a batch of events at once. Nothing is created unless every row is
+    valid, otherwise the errors of each row are returned.
+    """
+    return await import_events(
+        session, body.zoo_id, body.events, current_user, dry_run=body.dry_run
+    )
+
+
+@router.post("/import/csv", dependencies=[require_permission("create_events")])
+async def import_events_csv(
+    session: SessionDep,
+    current_user: CurrentUser,
+    file: UploadFile = File(...),
+    zoo_id: int = Form(...),
+    dry_run: bool = Form(False),
+) -> EventImportResult:
+    """The same as /import, with the events as csv rows."""
+    events, errors = parse_events_csv(await file.read())
+    raise_row_errors(errors)
+    if not events:
+        raise HTTPException(status_code=400, detail="No events to import")
+    if len(events) > MAX_IMPORT_ROWS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {MAX_IMPORT_ROWS} events per import"
+        )
+
+    return await import_events(session, zoo_id, events, current_user, dry_run=dry_run)
+
+
+@router.post("/series/", dependencies=[require_permission("create_events")])
+async def create_event_series(
+    body: EventSeriesCreate, session: SessionDep, current_user: CurrentUser
+) -> EventSeries:
+    """
+    A recurring event. Its occurrences show up in event listings and the
+    calendar, and become events of their own once materialized.
+    """
+    if body.series.end_at < body.series.start_at:
+        raise HTTPException(
+            status_code=400, detail="Event end time must be after its start time"
+        )
+
+    # validate event type
+    event_type = await session.exec(
+        select(EventType.id).where(
+            and_(
+                EventType.id == body.series.event_type_id,
+                EventType.zoo_id == body.series.zoo_id,
+            )
+        )
+    )
+    if not event_type.first():
+        raise HTTPException(status_code=404, detail="Event type not found for this zoo")
+
+    animal_ids = list(dict.fromkeys(body.animal_ids))
+    user_ids = list(dict.fromkeys(body.user_ids))
+    await validate_users(user_ids, session)
+    await validate_animals(animal_ids, zoo_id=body.series.zoo_id, session=session)
+
+    series = EventSeries(
+        **body.series.model_dump(),
+        animal_ids=animal_ids,
+        user_ids=user_ids,
+        created_by=current_user.id,
+    )
+    series.until = series_until(series)
+    await validate_series_clashes(session, series)
+
+    session.add(series)
+    await session.commit()
+    await session.refresh(series)
+    return series
+
+
+@router.get("/series/{series_id}")
+async def read_event_series(series_id: int, session: SessionDep) -> EventSeries:
+    return await get_series(session, series_id)
+
+
+@router.delete(
+    "/series/{series_id}", dependencies=[require_permission("delete_events")]
+)
+async def delete_event_series(series_id: int, session: SessionDep):
+    """Stop a series, occurrences that are events already are kept."""
+    series = await get_series(session, series_id)
+    await session.delete(series)
+    await session.commit()
+
+    return {"message": "Event series deleted"}
+
+
+@router.post(
+    "/series/{series_id}/occurrences",
+    dependencies=[require_permission("create_events")],
+)
+async def materialize_series_occurrence(
+    series_id: int, start: datetime, session: SessionDep
+) -> Event:
+    """
+    The occurrence starting at `start` as an event, to check animals out to
+    or edit like any other. Created the first time, returned after that.
+    """
+    return await materialize_occurrence(session, series_id, start)
+
+
+@router.delete(
+    "/series/{series_id}/occurrences",
+    dependencies=[require_permission("delete_events")],
+)
+async def cancel_series_occurrence(
+    series_id: int, start: datetime, session: SessionDep
+):
+    series = await get_series(session, series_id)
+    start = validate_occurrence(series, start)
+    if await get_materialized(session, series_id, start):
+        raise HTTPException(
+            status_code=400,
+            detail="This occurrence is an event already, delete the event instead",
+        )
+
+    cancel_occurrence(series, start)
+    await session.commit()
+
+    return {"message": "Occurrence cancelled"}
+
+
+@router.post("/", dependencies=[require_permission("create_events")])
 async def create_event(
     body: EventCreate, session: SessionDep, current_user: CurrentUser
 ):
-    if not has_permission(current_user.role.permissions, "create_events"):
+    if body.event.end_at < body.event.start_at:
         raise HTTPException(
-            status_code=401, detail="You are not authorized to perform this action"
+            status_code=400, detail="Event end time must be after its start time"
         )
 
     # validate event type
@@ -187,6 +453,7 @@ async def create_event(
 
     # update animals status
     if body.checkout_immediately:
+        CHECKOUTS.inc(amount=len(body.animal_ids))
         await update_animals_status(body.animal_ids, "checked_out", session)
 
     # refresh event
@@ -223,15 +490,10 @@ async def create_event(
     return JSONResponse({"message": "Event created"}, status_code=200)
 
 
-@router.put("/{event_id}")
+@router.put("/{event_id}", dependencies=[require_permission("update_events")])
 async def update_event(
     body: EventCreate, session: SessionDep, current_user: CurrentUser, event_id: int
 ):
-    if not has_permission(current_user.role.permissions, "update_events"):
-        raise HTTPException(
-            status_code=401, detail="You are not authorized to perform this action"
-        )
-
     event = await session.get(Event, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
@@ -247,6 +509,11 @@ async def update_event(
     if event.end_at < datetime.now(UTC):
         raise HTTPException(status_code=400, detail="Event is already ended")
 
+    if body.event.end_at < body.event.start_at:
+        raise HTTPException(
+            status_code=400, detail="Event end time must be after its start time"
+        )
+
     # validate event type
     event_type = await session.exec(
         select(EventType.id).where(
@@ -360,13 +627,8 @@ async def update_event(
     return JSONResponse({"message": "Event updated"}, status_code=200)
 
 
-@router.delete("/{event_id}")
-async def delete_event(event_id: int, session: SessionDep, current_user: CurrentUser):
-    if not has_permission(current_user.role.permissions, "delete_events"):
-        raise HTTPException(
-            status_code=401, detail="You are not authorized to perform this action"
-        )
-
+@router.delete("/{event_id}", dependencies=[require_permission("delete_events")])
+async def delete_event(event_id: int, session: SessionDep):
     event = await session.get(Event, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
@@ -385,6 +647,12 @@ async def delete_event(event_id: int, session: SessionDep, current_user: Current
     for animal_link in animal_links:
         await session.delete(animal_link)
 
+    # a deleted occurrence must not come back from its series
+    if event.series_id:
+        series = await session.get(EventSeries, event.series_id)
+        if series:
+            cancel_occurrence(series, event.occurrence_start)  # type: ignore
+
     await session.delete(event)
     await session.commit()
 
@@ -426,18 +694,13 @@ class AssignAnimalsIn(BaseModel):
     animal_ids: list[int]
 
 
-@router.put("/{event_id}/animals")
+@router.put("/{event_id}/animals", dependencies=[require_permission("update_events")])
 async def reassign_animals_to_event(
     event_id: int,
     session: SessionDep,
     current_user: CurrentUser,
     body: AssignAnimalsIn,
 ):
-    if not has_permission(current_user.role.permissions, "update_events"):
-        raise HTTPException(
-            status_code=401, detail="You are not authorized to perform this action"
-        )
-
     event = await session.get(Event, event_id)
 
     if not event:
@@ -465,7 +728,7 @@ async def reassign_animals_to_event(
     if clashing_animals:
         raise HTTPException(
             status_code=400,
-            detail=f'Some animals are already assigned to an event during this time: {", ".join([animal for animal in clashing_animals])}',
+            detail=f"Some animals are already assigned to an event during this time: {', '.join([animal for animal in clashing_animals])}",
         )
 
     # already assigned animals
@@ -530,18 +793,13 @@ class AssignHandlersIn(BaseModel):
     handler_ids: list[int]
 
 
-@router.put("/{event_id}/handlers")
+@router.put("/{event_id}/handlers", dependencies=[require_permission("update_events")])
 async def reassign_handlers_to_event(
     event_id: int,
     session: SessionDep,
     current_user: CurrentUser,
     body: AssignHandlersIn,
 ):
-    if not has_permission(current_user.role.permissions, "update_events"):
-        raise HTTPException(
-            status_code=401, detail="You are not authorized to perform this action"
-        )
-
     event = await session.get(Event, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
@@ -690,6 +948,7 @@ async def checkin_animal(
         session.add(animal_link)
 
     await session.commit()
+    CHECKINS.inc(amount=len(animals_link))
     await session.refresh(event)
 
     # update animals status and audit logs
@@ -796,6 +1055,7 @@ async def checkout_animal(
         session.add(animal_link)
 
     await session.commit()
+    CHECKOUTS.inc(amount=len(animals_link))
     await session.refresh(event)
 
     # update animals status
@@ -28,7 +28,7 @@ async def get_groups(
 
 @router.post("/")
 async def create_group(group: GroupIn, session: SessionDep, current_user: CurrentUser):
-    if not has_permission(current_user.role.permissions, "create_group"):
+    if not has_permission(current_user, "create_group"):
         raise HTTPException(
             status_code=403, detail="You do not have permission to create a group"
         )
@@ -0,0 +1,20 @@
+import secrets
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+
+from core.config import settings
+from core.metrics import render
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics(request: Request):
+    """Prometheus scrape endpoint, behind METRICS_TOKEN when it is set."""
+    if settings.METRICS_TOKEN and not secrets.compare_digest(
+        request.headers.get("authorization", ""), f"Bearer {settings.METRICS_TOKEN}"
+    ):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
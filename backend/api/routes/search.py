@@ -0,0 +1,42 @@
+from fastapi import APIRouter, HTTPException, Query
+
+from api.deps import CurrentPrincipal, Pagination, ReadSessionDep
+from db.permissions import has_permission
+from db.search import SearchType, search_query
+from models import SearchHit
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+DEFAULT_PAGE_SIZE = 20
+
+
+@router.get("/")
+async def search(
+    session: ReadSessionDep,
+    principal: CurrentPrincipal,
+    page: Pagination,
+    q: str = Query(min_length=2, max_length=200),
+    type: SearchType = "animals",
+    zoo_id: int | None = None,
+) -> list[SearchHit]:
+    """
+    Ranked full-text search, best matches first. `q` takes web search syntax
+    ("quoted phrases", or, -excluded) and results are from the caller's zoo,
+    others only for zoo admins.
+    """
+    if (
+        zoo_id
+        and zoo_id != principal.zoo_id
+        and not has_permission(principal, "update_zoo")
+    ):
+        raise HTTPException(
+            status_code=403, detail="You don't have permission to search another zoo"
+        )
+    query, rank, id_column = search_query(type, q, zoo_id or principal.zoo_id)
+
+    # ranked results are always paged, a broad term could match everything
+    page.limit = page.limit or DEFAULT_PAGE_SIZE
+    rows = await page.fetch(
+        session, query, rank, id_column, "desc", key=lambda row: (row.rank, row.id)
+    )
+    return [SearchHit.model_validate(row._mapping) for row in rows]
@@ -1,22 +1,15 @@
 import uuid
 
-import boto3
-from botocore.exceptions import NoCredentialsError, PartialCredentialsError
 from fastapi import APIRouter, File, HTTPException, UploadFile
 from fastapi.responses import JSONResponse
 
-from api.deps import CurrentUser
+from api.deps import CurrentPrincipal
 from core.config import settings
+from core.tracing import span
+from core.utils import get_s3_client
 
 router = APIRouter(prefix="/upload", tags=["Upload"])
 
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-    region_name=settings.AWS_REGION,
-)
-
 allowed_content_types = [
     "image/jpeg",
     "image/png",
@@ -28,19 +21,28 @@ allowed_content_types = [
 
 
 @router.post("/")
-async def upload_file(_: CurrentUser, file: UploadFile = File(...)):
+async def upload_file(_: CurrentPrincipal, file: UploadFile = File(...)):
     if file.content_type not in allowed_content_types:
         raise HTTPException(status_code=400, detail="Invalid file type")
+
+    from botocore.exceptions import NoCredentialsError, PartialCredentialsError
+
     try:
         file_content = await file.read()
         key = str(uuid.uuid4())
 
-        s3_client.put_object(
-            Body=file_content,
-            Key=key,
-            Bucket=settings.AWS_BUCKET_NAME,
-            ContentType=file.content_type,
-        )
+        with span(
+            "s3.put_object",
+            bucket=settings.AWS_BUCKET_NAME,
+            key=key,
+            size=len(file_content),
+        ):
+            get_s3_client().put_object(
+                Body=file_content,
+                Key=key,
+                Bucket=settings.AWS_BUCKET_NAME,
+                ContentType=file.content_type,
+            )
 
         file_url = f"https://{settings.AWS_BUCKET_NAME}.s3.{settings.AWS_REGION}.amazonaws.com/{key}"
         return JSONResponse({"file_url": file_url}, status_code=200)
@@ -1,34 +1,48 @@
-import os
-import secrets
 from datetime import UTC, datetime, timedelta
-from typing import Annotated
+from typing import Annotated, Literal
 
-import resend
-from fastapi import APIRouter, Body, Depends, status
+from fastapi import APIRouter, Body, Depends, Query, status
 from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel
 from sqlmodel import col, select
 from starlette.exceptions import HTTPException
 
-from api.deps import CurrentUser, SessionDep
-from core.config import settings
+from api.deps import (
+    CurrentPrincipal,
+    CurrentUser,
+    Pagination,
+    ReadSessionDep,
+    SessionDep,
+)
+from core.email import wake_up_worker
 from core.security import (
     create_access_token,
     get_password_hash,
     verify_password,
 )
+from db.emails import queue_email
 from db.events import get_events_details
-from db.permissions import has_permission
+from db.permissions import get_role_permissions, has_permission
 from db.roles import get_role
-from db.users import get_user_by_email, get_user_by_id, get_user_by_username
+from db.users import (
+    consume_reset_token,
+    create_reset_token,
+    get_user_by_email,
+    get_user_by_id,
+    get_user_by_username,
+)
+from db.tokens import get_token_version, revoke_tokens, token_claims
+from db.typeahead import suggest_users
+from db.utils import SortOrder
 from db.zoo import get_main_zoo
 from models import (
     Event,
-    PasswordResetToken,
     Role,
+    RoleWithPermissions,
     User,
     UserEvent,
+    UserSuggestion,
     UserWithDetails,
     UserWithEvents,
 )
@@ -39,9 +53,6 @@ router = APIRouter(prefix="/users", tags=["Users"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login")
 
 
-resend.api_key = settings.RESEND_API_KEY
-
-
 @router.post("/login")
 async def login(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()], session: SessionDep
@@ -65,8 +76,9 @@ async def login(
         )
 
     access_token_expires = timedelta(minutes=24 * 60 * 30)  # 30 days
+    version = await get_token_version(session, user.id)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data=token_claims(user, version), expires_delta=access_token_expires
     )
 
     return Token(access_token=access_token, token_type="bearer")
@@ -85,40 +97,14 @@ async def reset_password(body: ResetPasswordIn, session: SessionDep):
             detail="User not found",
         )
 
-    token = secrets.token_urlsafe(32)
+    token = create_reset_token(session, user.id)
 
     reset_link = f"https://open-hams-1.onrender.com//change-password?token={token}"
 
-    # get current working directory
-    cwd = os.getcwd()
-    template = os.path.join(cwd, "templates", "emails", "reset-password.html")
-
-    with open(template, "r") as file:
-        html = file.read()
-
-    params: resend.Emails.SendParams = {
-        "from": "OpenHAMS <hams@ahmed-abdullah.live>",
-        "to": [user.email],
-        "subject": "Password Change Request",
-        "html": html.format(resetLink=reset_link),
-    }
+    queue_email(session, user.email, "reset-password", reset_link=reset_link)
 
-    try:
-        email = resend.Emails.send(params)
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail="Error sending email",
-        )
-
-    reset_token = PasswordResetToken(
-        token=token,
-        user_id=user.id,
-        expires_at=datetime.now(UTC) + timedelta(hours=2),
-    )  # type: ignore
-
-    session.add(reset_token)
     await session.commit()
+    wake_up_worker()
 
     return JSONResponse(
         {"message": "We have send an email with change password link"}, status_code=200
@@ -132,11 +118,7 @@ class ChangePasswordIn(BaseModel):
 
 @router.post("/change-password")
 async def change_password(body: ChangePasswordIn, session: SessionDep):
-    reset_token = (
-        await session.exec(
-            select(PasswordResetToken).where(PasswordResetToken.token == body.token)
-        )
-    ).first()
+    reset_token = await consume_reset_token(session, body.token)
 
     if not reset_token:
         raise HTTPException(
@@ -158,16 +140,29 @@ async def change_password(body: ChangePasswordIn, session: SessionDep):
         )
 
     user.hashed_password = get_password_hash(body.password)
-    await session.delete(reset_token)
     await session.commit()
 
     return JSONResponse({"message": "Password changed successfully"}, status_code=200)
 
 
 @router.get("/", response_model=list[UserWithDetails])
-async def get_users(session: SessionDep):
-    users = (await session.exec(select(User).order_by(User.created_at))).unique()  # type: ignore
-    return users
+async def get_users(
+    session: SessionDep,
+    page: Pagination,
+    zoo_id: int | None = None,
+    role: str | None = None,
+    sort: Literal["created_at", "first_name", "username"] = "created_at",
+    order: SortOrder = "asc",
+):
+    query = select(User)
+    if zoo_id is not None:
+        query = query.where(User.zoo_id == zoo_id)
+    if role is not None:
+        query = query.join(Role).where(Role.name == role)
+
+    return await page.fetch(
+        session, query, col(getattr(User, sort)), col(User.id), order
+    )
 
 
 @router.get("/handlers")
@@ -181,6 +176,20 @@ async def get_handlers(session: SessionDep) -> list[UserWithDetails]:
     return list(handlers)  # type: ignore
 
 
+@router.get("/typeahead")
+async def get_user_suggestions(
+    session: ReadSessionDep,
+    principal: CurrentPrincipal,
+    q: str = Query(min_length=1, max_length=100),
+    limit: int = Query(default=10, ge=1, le=50),
+    handlers: bool = False,
+) -> list[UserSuggestion]:
+    """The best matches for `q` in the caller's zoo, for pickers as the user types."""
+    return await suggest_users(
+        session, q, limit, zoo_id=principal.zoo_id, handlers_only=handlers
+    )
+
+
 @router.post("/")
 async def create_user(session: SessionDep, user: UserCreate):
     # check if username or email already exists
@@ -225,26 +234,38 @@ async def update_user(
 
 @router.get("/me")
 async def get_authenticated_user(current_user: CurrentUser) -> UserWithDetails:
-    return current_user  # type: ignore
+    # the role's permissions aren't loaded with the current user, use the cache
+    role = RoleWithPermissions.model_validate(
+        {
+            **current_user.role.model_dump(),
+            "permissions": get_role_permissions(current_user.role_id),
+        }
+    )
+    return UserWithDetails.model_validate(
+        {
+            **current_user.model_dump(),
+            "role": role,
+            "group": current_user.group,
+            "zoo": current_user.zoo,
+        }
+    )
 
 
 @router.get("/me/permissions")
 async def get_authenticated_user_permissions(current_user: CurrentUser):
-    return current_user.role.permissions  # type: ignore
+    return get_role_permissions(current_user.role_id)
 
 
 @router.get("/{user_id}")
-async def get_user(user_id: int, session: SessionDep, _: CurrentUser) -> UserWithEvents:
+async def get_user(
+    user_id: int, session: SessionDep, _: CurrentPrincipal
+) -> UserWithEvents:
     user = await get_user_by_id(user_id, session)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    events = await session.exec(
-        select(Event).join(UserEvent).where(UserEvent.user_id == user_id)
-    )
-    events = list(events.all())
-
-    events_details = await get_events_details(session=session, events=events)
+    user_events = select(UserEvent.event_id).where(UserEvent.user_id == user_id)
+    events_details = await get_events_details(session, col(Event.id).in_(user_events))
 
     current, past, upcoming = [], [], []
 
@@ -268,10 +289,7 @@ async def get_user(user_id: int, session: SessionDep, _: CurrentUser) -> UserWit
 
 @router.delete("/{user_id}")
 async def delete_user(user_id: int, session: SessionDep, current_user: CurrentUser):
-    if (
-        not has_permission(current_user.role.permissions, "delete_users")
-        or current_user.id != user_id
-    ):
+    if not has_permission(current_user, "delete_users") or current_user.id != user_id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Unauthorized to delete this user",
@@ -282,6 +300,7 @@ async def delete_user(user_id: int, session: SessionDep, current_user: CurrentUs
         raise HTTPException(status_code=404, detail="User not found")
 
     await session.delete(user)
+    await revoke_tokens(session, user_id)
     await session.commit()
     return {"message": "User deleted"}
 
@@ -293,7 +312,7 @@ async def update_user_role(
     current_user: CurrentUser,
     roleIn: RoleIn = Body(...),
 ):
-    if not has_permission(current_user.role.permissions, "update_user_role"):
+    if not has_permission(current_user, "update_user_role"):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="You do not have permission to update roles",
@@ -308,6 +327,7 @@ async def update_user_role(
         raise HTTPException(status_code=404, detail="User not found")
 
     user.role_id = role.id  # type: ignore
+    await revoke_tokens(session, user.id)
 
     await session.commit()
     return JSONResponse(
@@ -322,7 +342,7 @@ async def update_user_tier(
     current_user: CurrentUser,
     tierIn: TierIn = Body(...),
 ):
-    if not has_permission(current_user.role.permissions, "update_user_tier"):
+    if not has_permission(current_user, "update_user_tier"):
         raise HTTPException(
             status_code=401,
             detail="You do not have permission to update user tiers",
@@ -339,6 +359,7 @@ async def update_user_tier(
         raise HTTPException(status_code=404, detail="User not found")
 
     user.tier = tierIn.tier
+    await revoke_tokens(session, user.id)
     await session.commit()
     return {"message": f"Tier updated to {tierIn.tier}"}
 
@@ -350,7 +371,7 @@ async def update_user_group(
     user_id: int,
     group_id: int | None = None,
 ):
-    if not has_permission(current_user.role.permissions, "update_user_group"):
+    if not has_permission(current_user, "update_user_group"):
         raise HTTPException(
             status_code=403,
             detail="You do not have permission to update user groups",
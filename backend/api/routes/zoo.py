@@ -1,7 +1,6 @@
 from fastapi import APIRouter, HTTPException
 
-from api.deps import CurrentUser, SessionDep
-from db.permissions import has_permission
+from api.deps import SessionDep, require_permission
 from db.zoo import get_zoo, get_zoo_by_id, get_zoo_by_name
 from models import Zoo
 from schemas import ZooIn
@@ -30,15 +29,8 @@ async def read_zoo_by_name(zoo_name: str, session: SessionDep):
     return zoo
 
 
-@router.post("/")
-async def create_zoo(
-    body: ZooIn, session: SessionDep, current_user: CurrentUser
-) -> Zoo:
-    if not has_permission(current_user.role.permissions, "create_zoo"):
-        raise HTTPException(
-            status_code=401, detail="You are not authorized to perform this action"
-        )
-
+@router.post("/", dependencies=[require_permission("create_zoo")])
+async def create_zoo(body: ZooIn, session: SessionDep) -> Zoo:
     zoo = Zoo(**body.model_dump())  # type: ignore
     session.add(zoo)
     await session.commit()
@@ -46,15 +38,8 @@ async def create_zoo(
     return zoo
 
 
-@router.put("/{zoo_id}")
-async def update_zoo(
-    zoo_id: int, zoo_updated: ZooIn, session: SessionDep, current_user: CurrentUser
-) -> Zoo:
-    if not has_permission(current_user.role.permissions, "update_zoo"):
-        raise HTTPException(
-            status_code=401, detail="You are not authorized to perform this action"
-        )
-
+@router.put("/{zoo_id}", dependencies=[require_permission("update_zoo")])
+async def update_zoo(zoo_id: int, zoo_updated: ZooIn, session: SessionDep) -> Zoo:
     zoo = await get_zoo_by_id(zoo_id, session)
     if not zoo:
         raise HTTPException(status_code=404, detail="Zoo not found")
@@ -68,13 +53,8 @@ async def update_zoo(
     return zoo
 
 
-@router.delete("/{zoo_id}")
-async def delete_zoo(zoo_id: int, session: SessionDep, current_user: CurrentUser):
-    if not has_permission(current_user.role.permissions, "delete_zoo"):
-        raise HTTPException(
-            status_code=401, detail="You are not authorized to perform this action"
-        )
-
+@router.delete("/{zoo_id}", dependencies=[require_permission("delete_zoo")])
+async def delete_zoo(zoo_id: int, session: SessionDep):
     zoo = await get_zoo_by_id(zoo_id, session)
     if not zoo:
         raise HTTPException(status_code=404, detail="Zoo not found")
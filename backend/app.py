@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -6,13 +7,24 @@ from fastapi.middleware.cors import CORSMiddleware
 from api import api_router
 from api.seed import seed_db
 from core.config import settings
+from core.email import run_worker
+from core.metrics import MetricsMiddleware
+from core.maintenance import run_maintenance
+from core.tracing import TracingMiddleware, instrument_routes
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await seed_db()
+
+    email_worker = asyncio.create_task(run_worker()) if settings.EMAIL_WORKER else None
+    maintenance = asyncio.create_task(run_maintenance())
     yield
 
+    maintenance.cancel()
+    if email_worker:
+        email_worker.cancel()
+
 
 app = FastAPI(title=settings.APP_NAME, version=settings.APP_VERSION, lifespan=lifespan)
 
@@ -22,6 +34,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "X-Trace-Id"],
 )
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
 
 app.include_router(api_router)
+instrument_routes(app)
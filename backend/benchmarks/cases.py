@@ -0,0 +1,141 @@
+from datetime import UTC, datetime, time, timedelta
+from typing import Awaitable, Callable
+
+from fastapi import HTTPException
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import col
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from db.animals import get_animals_status, validate_event_clashes
+from db.events import get_events_details
+from db.forecast import forecast_availability
+from db.planning import plan_event_assignments
+from models import Event
+from schemas import PlannedEvent, PlanRequest
+
+
+class BenchContext:
+    def __init__(self, engine: AsyncEngine, client: AsyncClient):
+        self.engine = engine
+        self.client = client
+
+    async def get(self, url: str, **params):
+        response = await self.client.get(url, params=params)
+        response.raise_for_status()
+        return response
+
+
+Case = Callable[[BenchContext], Awaitable[object]]
+
+CASES: dict[str, Case] = {}
+
+
+def case(name: str):
+    def register(fn: Case) -> Case:
+        CASES[name] = fn
+        return fn
+
+    return register
+
+
+# ---------------------------------------------
+# DB HELPERS
+# ---------------------------------------------
+
+
+@case("db.get_animals_status")
+async def animals_status(ctx: BenchContext):
+    async with AsyncSession(ctx.engine) as session:
+        return await get_animals_status(session, zoo_id=1)
+
+
+@case("db.get_events_details.upcoming")
+async def events_details_upcoming(ctx: BenchContext):
+    async with AsyncSession(ctx.engine) as session:
+        return await get_events_details(session, col(Event.end_at) > datetime.now(UTC))
+
+
+@case("db.validate_event_clashes")
+async def event_clashes(ctx: BenchContext):
+    now = datetime.now(UTC)
+    async with AsyncSession(ctx.engine) as session:
+        try:
+            await validate_event_clashes(
+                list(range(1, 6)), now + timedelta(hours=1), now, 1, session
+            )
+        except HTTPException:
+            # a clash is as valid an outcome as no clash here
+            pass
+
+
+@case("db.plan_event_assignments.day")
+async def plan_day(ctx: BenchContext):
+    # a full day of programs tomorrow, one every 15 minutes from 9 to 17
+    day = datetime.combine(datetime.now(UTC).date(), time(9), tzinfo=UTC)
+    events = [
+        PlannedEvent(
+            name=f"Program {i}",
+            start_at=day + timedelta(days=1, minutes=15 * i),
+            end_at=day + timedelta(days=1, minutes=15 * i + 45),
+            count=1 + i % 3,
+        )
+        for i in range(32)
+    ]
+    async with AsyncSession(ctx.engine) as session:
+        return await plan_event_assignments(
+            session, PlanRequest(zoo_id=1, events=events), max_tier=3
+        )
+
+
+@case("db.forecast_availability.day")
+async def forecast_day(ctx: BenchContext):
+    start = datetime.now(UTC)
+    async with AsyncSession(ctx.engine) as session:
+        return await forecast_availability(
+            session, 1, start, start + timedelta(days=1), timedelta(minutes=15)
+        )
+
+
+# ---------------------------------------------
+# ENDPOINTS
+# ---------------------------------------------
+
+
+@case("GET /animals/status")
+async def animals_status_endpoint(ctx: BenchContext):
+    return await ctx.get("/animals/status", zoo_id=1)
+
+
+@case("GET /animals/feed")
+async def animals_feed(ctx: BenchContext):
+    return await ctx.get("/animals/feed")
+
+
+@case("GET /animals/details/resting")
+async def resting_animals(ctx: BenchContext):
+    return await ctx.get("/animals/details/resting")
+
+
+@case("GET /events/")
+async def events_list(ctx: BenchContext):
+    return await ctx.get("/events/", zoo_id=1, limit=100)
+
+
+@case("GET /events/details/upcoming-live")
+async def upcoming_live_events(ctx: BenchContext):
+    return await ctx.get("/events/details/upcoming-live")
+
+
+@case("GET /events/calendar")
+async def events_calendar(ctx: BenchContext):
+    today = datetime.now(UTC).date()
+    return await ctx.get(
+        "/events/calendar",
+        **{
+            "from": (today - timedelta(days=30)).isoformat(),
+            "to": today.isoformat(),
+            "zoo_id": 1,
+            "summary": "true",
+        },
+    )
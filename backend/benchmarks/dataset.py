@@ -0,0 +1,538 @@
+"""
+Deterministic synthetic zoo for benchmarks and load tests.
+
+Ids are assigned while generating so link rows never need a read back, and
+everything is bulk-loaded with PostgreSQL COPY through asyncpg. Audits, the
+largest table, are streamed from a generator straight into COPY so memory
+stays bounded by one zoo's events.
+"""
+
+import itertools
+import random
+from collections import defaultdict
+from datetime import UTC, datetime, timedelta
+from typing import Iterable, Iterator
+
+from passlib.context import CryptContext
+from pydantic import BaseModel, Field
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from db.partitions import create_audit_partitions
+from db.permissions import permission_names
+from db.roles import BASIC_ROLES
+from models import (
+    Animal,
+    AnimalAudit,
+    AnimalEvent,
+    AnimalHealthLog,
+    Event,
+    EventComment,
+    EventType,
+    Permission,
+    Role,
+    RolePermission,
+    User,
+    UserEvent,
+    Zoo,
+)
+
+# every generated user can log in with this password
+BENCH_PASSWORD = "benchmark-password"
+
+# (species, tier needed to handle it)
+SPECIES = [
+    ("Panthera leo", 4),
+    ("Ailurus fulgens", 3),
+    ("Tapirus terrestris", 3),
+    ("Python regius", 2),
+    ("Bubo virginianus", 2),
+    ("Chinchilla lanigera", 1),
+    ("Pogona vitticeps", 1),
+    ("Cavia porcellus", 1),
+]
+
+EVENT_TYPES = ["Encounter", "Keeper Talk", "School Visit", "Outreach", "Training"]
+
+HEALTH_NOTES = [
+    "Eating well, normal behaviour",
+    "Slight limping on the left hind leg",
+    "Weight check ok",
+    "Skipped morning feed",
+    "Shedding, humidity increased",
+    "Vet check, no concerns",
+    "Minor scratch on the nose, cleaned",
+]
+
+COMMENTS = [
+    "All went well",
+    "Animal was a bit nervous with the crowd",
+    "Great engagement from the visitors",
+    "Started ten minutes late",
+    "Needed an extra break halfway through",
+]
+
+OPENING_HOUR = 9
+OPEN_HOURS = 8
+
+
+class DatasetSize(BaseModel):
+    zoos: int = Field(default=1, ge=1)
+    animals: int = Field(default=100, ge=1)  # per zoo
+    handlers: int = Field(default=20, ge=1)  # per zoo
+    events: int = 2000  # per zoo, spread over the whole window
+    days: int = 365  # days of history before today
+    future_days: int = 7  # days of scheduled events after today
+    max_animals_per_event: int = Field(default=4, ge=1)
+    handlers_per_event: int = Field(default=2, ge=1)
+    comments_per_event: int = 2
+    health_logs_per_animal_week: int = 1
+
+
+async def reset_schema(engine: AsyncEngine) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.drop_all)
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+
+class _Ids:
+    def __init__(self):
+        self.last: dict[type[SQLModel], int] = defaultdict(int)
+
+    def next(self, model: type[SQLModel]) -> int:
+        self.last[model] += 1
+        return self.last[model]
+
+
+def _roles(ids: _Ids) -> tuple[dict[type[SQLModel], list[dict]], dict[str, int]]:
+    permissions = [
+        {"id": ids.next(Permission), "name": name} for name in permission_names
+    ]
+    permission_ids = {
+        permission["name"]: permission["id"] for permission in permissions
+    }
+
+    roles, role_permissions, role_ids = [], [], {}
+    for name, names in BASIC_ROLES.items():
+        role_ids[name] = ids.next(Role)
+        roles.append({"id": role_ids[name], "name": name, "description": None})
+        role_permissions.extend(
+            {"role_id": role_ids[name], "permission_id": permission_ids[permission]}
+            for permission in names
+        )
+
+    rows = {Permission: permissions, Role: roles, RolePermission: role_permissions}
+    return rows, role_ids
+
+
+def _user(
+    ids: _Ids, zoo_id: int, role_id: int, username: str, tier: int, password: str, at
+):
+    user_id = ids.next(User)
+    return {
+        "id": user_id,
+        "email": f"{username}@example.com",
+        "first_name": username.capitalize(),
+        "last_name": f"Zoo{zoo_id}",
+        "username": username,
+        "tier": tier,
+        "image": None,
+        "hashed_password": password,
+        "role_id": role_id,
+        "zoo_id": zoo_id,
+        "group_id": None,
+        "created_at": at,
+        "updated_at": at,
+    }
+
+
+def _audit(
+    ids: _Ids, animal_id: int, action: str, at, by: int, description: str, **change
+):
+    return {
+        "id": ids.next(AnimalAudit),
+        "animal_id": animal_id,
+        "action": action,
+        "changed_field": change.get("field"),
+        "old_value": change.get("old"),
+        "new_value": change.get("new"),
+        "description": description,
+        "changed_at": at,
+        "changed_by": by,
+    }
+
+
+def _audits(
+    ids: _Ids,
+    links: list[dict],
+    events: dict[int, dict],
+    health_logs: list[dict],
+    actors: dict[int, str],
+    planner_id: int,
+) -> Iterator[dict]:
+    """Audit trail the API itself would have written for this history."""
+    for link in links:
+        animal_id, event = link["animal_id"], events[link["event_id"]]
+        yield _audit(
+            ids,
+            animal_id,
+            "event_participation_added",
+            link["created_at"],
+            planner_id,
+            f"{actors[planner_id]} added animal to event '{event['name']}'",
+        )
+
+        if link["checked_out"]:
+            by = link["user_out_id"]
+            description = f"{actors[by]} checked out animal to event '{event['name']}'"
+            yield _audit(
+                ids, animal_id, "checked_out", link["checked_out"], by, description
+            )
+            yield _audit(
+                ids,
+                animal_id,
+                "animal_status_changed",
+                link["checked_out"],
+                by,
+                description,
+                field="status",
+                old="checked_in",
+                new="checked_out",
+            )
+
+        if link["checked_in"]:
+            by = link["user_in_id"]
+            description = f"{actors[by]} checked in animal to event '{event['name']}'"
+            yield _audit(
+                ids, animal_id, "checked_in", link["checked_in"], by, description
+            )
+            yield _audit(
+                ids,
+                animal_id,
+                "animal_status_changed",
+                link["checked_in"],
+                by,
+                description,
+                field="status",
+                old="checked_out",
+                new="checked_in",
+            )
+            yield _audit(
+                ids,
+                animal_id,
+                "rest_time_started",
+                link["checked_in"],
+                by,
+                "Rest time started",
+            )
+
+    for log in health_logs:
+        yield _audit(
+            ids,
+            log["animal_id"],
+            "health_log_added",
+            log["logged_at"],
+            log["logged_by"],
+            f"{actors[log['logged_by']]} created a health log",
+            field="health_log",
+            new=log["details"],
+        )
+
+
+def _zoo_rows(
+    rng: random.Random,
+    ids: _Ids,
+    size: DatasetSize,
+    zoo_id: int,
+    role_ids: dict[str, int],
+    password: str,
+    now: datetime,
+) -> dict[type[SQLModel], Iterable[dict]]:
+    window_start = (now - timedelta(days=size.days)).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    total_days = size.days + size.future_days
+
+    zoo = {
+        "id": ids.next(Zoo),
+        "name": f"Zoo {zoo_id}",
+        "location": "Benchmark City",
+        "information": None,
+        "created_at": window_start,
+        "updated_at": window_start,
+    }
+
+    event_types = [
+        {
+            "id": ids.next(EventType),
+            "name": name,
+            "zoo_id": zoo_id,
+            "group_id": None,
+            "created_at": window_start,
+            "updated_at": window_start,
+        }
+        for name in EVENT_TYPES
+    ]
+
+    # the first zoo also gets the admin, each zoo a moderator who plans events
+    users = []
+    if zoo_id == 1:
+        users.append(
+            _user(ids, zoo_id, role_ids["admin"], "admin", 4, password, window_start)
+        )
+    planner = _user(
+        ids,
+        zoo_id,
+        role_ids["moderator"],
+        f"planner{zoo_id}",
+        4,
+        password,
+        window_start,
+    )
+    users.append(planner)
+    handlers = [
+        _user(
+            ids,
+            zoo_id,
+            role_ids["handler"],
+            f"handler{zoo_id}x{i}",
+            rng.randint(1, 4),
+            password,
+            window_start,
+        )
+        for i in range(size.handlers)
+    ]
+    users.extend(handlers)
+    handler_ids = [handler["id"] for handler in handlers]
+    actors = {user["id"]: f"{user['first_name']} {user['last_name']}" for user in users}
+
+    animals = []
+    for _ in range(size.animals):
+        species, tier = rng.choice(SPECIES)
+        animal_id = ids.next(Animal)
+        animals.append(
+            {
+                "id": animal_id,
+                "name": f"{species.split()[0]} {animal_id}",
+                "species": species,
+                "image": None,
+                "description": f"A {species} living at zoo {zoo_id}",
+                "max_daily_checkouts": rng.randint(2, 6),
+                "max_daily_checkout_hours": rng.randint(2, 6),
+                "rest_time": rng.choice([0.5, 1.0, 1.5, 2.0, 3.0]),
+                "tier": tier,
+                "daily_checkout_count": 0,
+                "daily_checkout_duration": timedelta(0),
+                "last_checkin_time": None,
+                "checked_in": True,
+                "handling_enabled": True,
+                "status": "checked_in",
+                "zoo_id": zoo_id,
+                "created_at": window_start,
+                "updated_at": window_start,
+            }
+        )
+
+    events, links, user_links, comments = {}, [], [], []
+    for day in range(total_days):
+        day_start = window_start + timedelta(days=day)
+        count = (day + 1) * size.events // total_days - day * size.events // total_days
+        starts = sorted(
+            day_start
+            + timedelta(
+                hours=OPENING_HOUR, minutes=rng.randrange(0, OPEN_HOURS * 60, 15)
+            )
+            for _ in range(count)
+        )
+
+        # animals are never double booked and respect rest time and daily caps,
+        # while different animals' events overlap freely
+        free_at: dict[int, datetime] = {}
+        checkouts: dict[int, int] = defaultdict(int)
+
+        for start_at in starts:
+            end_at = start_at + timedelta(minutes=rng.choice([30, 45, 60, 90, 120]))
+            event_type = rng.choice(event_types)
+            event_id = ids.next(Event)
+            created_at = start_at - timedelta(days=rng.randint(1, 14))
+            events[event_id] = {
+                "id": event_id,
+                "name": f"{event_type['name']} #{event_id}",
+                "description": f"{event_type['name']} scheduled for the public",
+                "start_at": start_at,
+                "end_at": end_at,
+                "event_type_id": event_type["id"],
+                "zoo_id": zoo_id,
+                "created_at": created_at,
+                "updated_at": created_at,
+            }
+
+            assigned = rng.sample(
+                handler_ids, min(len(handler_ids), size.handlers_per_event)
+            )
+            for user_id in assigned:
+                user_links.append(
+                    {
+                        "id": ids.next(UserEvent),
+                        "user_id": user_id,
+                        "event_id": event_id,
+                        "assigner_id": planner["id"],
+                        "created_at": created_at,
+                        "updated_at": created_at,
+                    }
+                )
+
+            available = [
+                animal
+                for animal in animals
+                if free_at.get(animal["id"], start_at) <= start_at
+                and checkouts[animal["id"]] < animal["max_daily_checkouts"]
+            ]
+            picked = rng.sample(
+                available,
+                min(len(available), rng.randint(1, size.max_animals_per_event)),
+            )
+
+            for animal in picked:
+                free_at[animal["id"]] = end_at + timedelta(hours=animal["rest_time"])
+                checkouts[animal["id"]] += 1
+
+                link = {
+                    "id": ids.next(AnimalEvent),
+                    "animal_id": animal["id"],
+                    "event_id": event_id,
+                    "user_out_id": None,
+                    "user_in_id": None,
+                    "checked_out": None,
+                    "checked_in": None,
+                    "duration": None,
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                }
+
+                if start_at <= now:
+                    link["checked_out"] = min(
+                        now, start_at + timedelta(minutes=rng.randint(-10, 5))
+                    )
+                    link["user_out_id"] = rng.choice(assigned)
+
+                    if end_at <= now:
+                        checked_in = min(
+                            now, end_at + timedelta(minutes=rng.randint(-5, 15))
+                        )
+                        link["checked_in"] = checked_in
+                        link["user_in_id"] = rng.choice(assigned)
+                        link["duration"] = checked_in - link["checked_out"]
+                        link["updated_at"] = checked_in
+                        animal["last_checkin_time"] = checked_in
+                    else:
+                        animal["status"] = "checked_out"
+
+                links.append(link)
+
+            if end_at <= now:
+                for _ in range(size.comments_per_event):
+                    at = end_at + timedelta(minutes=rng.randint(0, 120))
+                    comments.append(
+                        {
+                            "id": ids.next(EventComment),
+                            "comment": rng.choice(COMMENTS),
+                            "user_id": rng.choice(assigned),
+                            "event_id": event_id,
+                            "created_at": at,
+                            "updated_at": at,
+                        }
+                    )
+
+    health_logs = [
+        {
+            "id": ids.next(AnimalHealthLog),
+            "animal_id": animal["id"],
+            "details": rng.choice(HEALTH_NOTES),
+            "logged_at": window_start
+            + timedelta(weeks=week, minutes=rng.randrange(7 * 24 * 60)),
+            "logged_by": rng.choice(handler_ids),
+        }
+        for animal in animals
+        for week in range(size.days // 7)
+        for _ in range(size.health_logs_per_animal_week)
+    ]
+
+    return {
+        Zoo: [zoo],
+        EventType: event_types,
+        User: users,
+        Animal: animals,
+        Event: events.values(),
+        AnimalEvent: links,
+        UserEvent: user_links,
+        EventComment: comments,
+        AnimalHealthLog: health_logs,
+        AnimalAudit: _audits(ids, links, events, health_logs, actors, planner["id"]),
+    }
+
+
+async def _copy(
+    connection, model: type[SQLModel], records: Iterable[dict], counts: dict[str, int]
+) -> None:
+    table = model.__table__.name  # type: ignore
+    iterator = iter(records)
+    first = next(iterator, None)
+    if first is None:
+        return
+
+    columns = list(first)
+
+    def rows() -> Iterator[tuple]:
+        for record in itertools.chain([first], iterator):
+            counts[table] += 1
+            yield tuple(record[column] for column in columns)
+
+    await connection.copy_records_to_table(table, columns=columns, records=rows())
+
+
+async def seed_dataset(
+    engine: AsyncEngine,
+    size: DatasetSize,
+    seed: int = 42,
+    now: datetime | None = None,
+) -> dict[str, int]:
+    """
+    COPY a synthetic zoo into an empty schema and return the rows per table.
+
+    The same seed and `now` always produce the same rows; `now` defaults to
+    the current hour so the data has live and upcoming events.
+    """
+    rng = random.Random(seed)
+    now = now or datetime.now(UTC).replace(minute=0, second=0, microsecond=0)
+    ids = _Ids()
+    counts: dict[str, int] = defaultdict(int)
+    password = CryptContext(schemes=["bcrypt"]).hash(BENCH_PASSWORD)
+
+    # monthly audit partitions for the whole window, before anything is copied
+    async with AsyncSession(engine) as session:
+        start = (now - timedelta(days=size.days)).date()
+        end = (now + timedelta(days=size.future_days)).date()
+        await create_audit_partitions(session, start, end)
+
+    async with engine.connect() as conn:
+        connection = (await conn.get_raw_connection()).driver_connection
+        async with connection.transaction():
+            role_rows, role_ids = _roles(ids)
+            for model, records in role_rows.items():
+                await _copy(connection, model, records, counts)
+
+            # one zoo at a time so only its rows are ever held in memory
+            for zoo_id in range(1, size.zoos + 1):
+                rows = _zoo_rows(rng, ids, size, zoo_id, role_ids, password, now)
+                for model, records in rows.items():
+                    await _copy(connection, model, records, counts)
+
+            # keep the id sequences ahead of the explicit ids
+            for model, last_id in ids.last.items():
+                table = model.__table__.name  # type: ignore
+                sequence = f"pg_get_serial_sequence('\"{table}\"', 'id')"
+                await connection.execute(f"SELECT setval({sequence}, {last_id})")
+
+    return dict(counts)
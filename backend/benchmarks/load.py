@@ -0,0 +1,400 @@
+"""
+Scenario load test modelling a zoo's opening hours against a running server.
+
+Every generated handler and planner logs in at once (the login storm), then
+for --duration seconds:
+
+  event_burst     planners create bursts of events starting now, half of them
+                  with checkout_immediately, the rest assigned to a handler
+  checkout_waves  every --wave-interval all handlers check out the animals of
+                  their current events together, and check them in again
+  dashboards      --dashboards clients poll the status and live event views
+
+Start a server on a generated dataset first, e.g.
+
+    BENCH_DB_URI=... python -m benchmarks.generate --zoos 2 --handlers 40
+    DB_URI=$BENCH_DB_URI uvicorn app:app --workers 4
+    python -m benchmarks.load --zoos 2 --handlers 40 --duration 60
+
+Throughput, p50/p95/p99 latency and error rates are reported per route.
+4xx responses are business rejections the harness provokes on purpose
+(clashing events, animals still resting) and are counted apart from errors,
+which are 5xx responses and transport failures.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import UTC, datetime, timedelta
+from typing import Awaitable, Callable
+
+from httpx import AsyncClient, HTTPError, Limits, Response
+
+from benchmarks.dataset import BENCH_PASSWORD
+from benchmarks.timing import percentile
+
+
+class LoadStats:
+    def __init__(self):
+        self.timings: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, route: str, elapsed_ms: float, status: int):
+        self.timings[route].append(elapsed_ms)
+        self.statuses[route][status] += 1
+
+    def report(self, duration: float) -> dict[str, dict]:
+        report = {}
+        for route in sorted(self.timings):
+            timings, statuses = self.timings[route], self.statuses[route]
+            requests = len(timings)
+            rejected = sum(n for code, n in statuses.items() if 400 <= code < 500)
+            errors = sum(n for code, n in statuses.items() if code >= 500 or not code)
+            report[route] = {
+                "requests": requests,
+                "rps": round(requests / duration, 2),
+                "p50_ms": round(percentile(timings, 50), 2),
+                "p95_ms": round(percentile(timings, 95), 2),
+                "p99_ms": round(percentile(timings, 99), 2),
+                "max_ms": round(max(timings), 2),
+                "rejected": rejected,
+                "errors": errors,
+                "error_rate": round(errors / requests, 4),
+                "statuses": {str(code): n for code, n in sorted(statuses.items())},
+            }
+        return report
+
+
+class LoadClient:
+    """A logged in user; every request is recorded under its route template."""
+
+    def __init__(self, client: AsyncClient, stats: LoadStats):
+        self.client = client
+        self.stats = stats
+        self.headers: dict[str, str] = {}
+        self.user: dict = {}
+
+    async def request(
+        self, method: str, route: str, url: str, **kwargs
+    ) -> Response | None:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(
+                method, url, headers=self.headers, **kwargs
+            )
+        except HTTPError:
+            self.stats.record(route, (time.perf_counter() - started) * 1000, 0)
+            return None
+
+        self.stats.record(
+            route, (time.perf_counter() - started) * 1000, response.status_code
+        )
+        return response
+
+    async def login(self, username: str) -> bool:
+        response = await self.request(
+            "POST",
+            "POST /users/login",
+            "/users/login",
+            data={"username": username, "password": BENCH_PASSWORD},
+        )
+        if response is None or response.status_code != 200:
+            return False
+
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        me = await self.request("GET", "GET /users/me", "/users/me")
+        if me is not None and me.status_code == 200:
+            self.user = me.json()
+        return bool(self.user)
+
+
+class Shift:
+    def __init__(self, args: argparse.Namespace, client: AsyncClient):
+        self.args = args
+        self.client = client
+        self.stats = LoadStats()
+        self.rng = random.Random(args.random_seed)
+        self.deadline = 0.0
+        self.planners: list[LoadClient] = []
+        self.handlers: list[LoadClient] = []
+        self.animals: dict[int, list[int]] = {}
+        self.event_types: dict[int, list[int]] = {}
+
+    def running(self) -> bool:
+        return time.perf_counter() < self.deadline
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(max(0.0, min(seconds, self.deadline - time.perf_counter())))
+
+    async def login_storm(self):
+        zoos = range(1, self.args.zoos + 1)
+        usernames = [f"planner{zoo}" for zoo in zoos] + [
+            f"handler{zoo}x{i}" for zoo in zoos for i in range(self.args.handlers)
+        ]
+        clients = [LoadClient(self.client, self.stats) for _ in usernames]
+        logged_in = await asyncio.gather(
+            *(
+                client.login(name)
+                for client, name in zip(clients, usernames, strict=True)
+            )
+        )
+
+        for client, ok in zip(clients, logged_in, strict=True):
+            if not ok:
+                continue
+            if client.user["role"]["name"] == "handler":
+                self.handlers.append(client)
+            else:
+                self.planners.append(client)
+
+    async def load_reference_data(self):
+        client = (self.planners or self.handlers)[0]
+        for zoo_id in range(1, self.args.zoos + 1):
+            response = await client.request(
+                "GET", "GET /animals/", "/animals/", params={"zoo_id": zoo_id}
+            )
+            if response is not None and response.status_code == 200:
+                self.animals[zoo_id] = [animal["id"] for animal in response.json()]
+
+        response = await client.request("GET", "GET /event-type/", "/event-type/")
+        if response is not None and response.status_code == 200:
+            for event_type in response.json():
+                self.event_types.setdefault(event_type["zoo_id"], []).append(
+                    event_type["id"]
+                )
+
+
+Scenario = Callable[[Shift], Awaitable[None]]
+
+SCENARIOS: dict[str, Scenario] = {}
+
+
+def scenario(name: str):
+    def register(fn: Scenario) -> Scenario:
+        SCENARIOS[name] = fn
+        return fn
+
+    return register
+
+
+@scenario("event_burst")
+async def event_burst(shift: Shift):
+    async def create(planner: LoadClient, checkout_immediately: bool):
+        zoo_id = planner.user["zoo_id"]
+        handlers = [h for h in shift.handlers if h.user["zoo_id"] == zoo_id]
+        if not shift.animals.get(zoo_id) or not shift.event_types.get(zoo_id):
+            return
+
+        now = datetime.now(UTC)
+        body = {
+            "event": {
+                "name": "Load test encounter",
+                "description": "Created by benchmarks.load",
+                "start_at": now.isoformat(),
+                "end_at": (
+                    now + timedelta(minutes=shift.rng.choice([30, 45, 60]))
+                ).isoformat(),
+                "event_type_id": shift.rng.choice(shift.event_types[zoo_id]),
+                "zoo_id": zoo_id,
+            },
+            "animal_ids": shift.rng.sample(
+                shift.animals[zoo_id], min(2, len(shift.animals[zoo_id]))
+            ),
+            "user_ids": [shift.rng.choice(handlers).user["id"]] if handlers else [],
+            "checkout_immediately": checkout_immediately,
+        }
+        await planner.request("POST", "POST /events/", "/events/", json=body)
+
+    async def plan(planner: LoadClient):
+        while shift.running():
+            await asyncio.gather(
+                *(create(planner, i % 2 == 0) for i in range(shift.args.burst))
+            )
+            await shift.sleep(shift.args.think)
+
+    await asyncio.gather(*(plan(planner) for planner in shift.planners))
+
+
+@scenario("checkout_waves")
+async def checkout_waves(shift: Shift):
+    async def current_animals(handler: LoadClient) -> dict[int, list[int]]:
+        response = await handler.request(
+            "GET", "GET /users/{user_id}", f"/users/{handler.user['id']}"
+        )
+        if response is None or response.status_code != 200:
+            return {}
+
+        return {
+            details["event"]["id"]: [
+                animal["animal"]["id"]
+                for animal in details["animals"]
+                if not animal["animal_event"]["checked_out"]
+            ]
+            for details in response.json()["current_events"]
+        }
+
+    async def checkout(handler: LoadClient):
+        events = await current_animals(handler)
+        checked_out = {}
+        for event_id, animal_ids in events.items():
+            if not animal_ids:
+                continue
+            response = await handler.request(
+                "PUT",
+                "PUT /events/{event_id}/checkout",
+                f"/events/{event_id}/checkout",
+                json={"animal_ids": animal_ids},
+            )
+            if response is not None and response.status_code == 200:
+                checked_out[event_id] = animal_ids
+        return checked_out
+
+    async def checkin(handler: LoadClient, checked_out: dict[int, list[int]]):
+        for event_id, animal_ids in checked_out.items():
+            await handler.request(
+                "PUT",
+                "PUT /events/{event_id}/checkin",
+                f"/events/{event_id}/checkin",
+                json={"animal_ids": animal_ids},
+            )
+
+    while shift.running():
+        wave_started = time.perf_counter()
+        checked_out = await asyncio.gather(*(checkout(h) for h in shift.handlers))
+        await shift.sleep(shift.args.hold)
+        await asyncio.gather(
+            *(
+                checkin(h, events)
+                for h, events in zip(shift.handlers, checked_out, strict=True)
+            )
+        )
+        await shift.sleep(
+            shift.args.wave_interval - (time.perf_counter() - wave_started)
+        )
+
+
+DASHBOARD_ROUTES = [
+    "/animals/status",
+    "/animals/details/checkedout",
+    "/events/details/upcoming-live",
+    "/animals/feed",
+]
+
+
+@scenario("dashboards")
+async def dashboards(shift: Shift):
+    async def poll(client: LoadClient):
+        # spread the pollers over the interval instead of firing in lockstep
+        await shift.sleep(shift.rng.uniform(0, shift.args.poll_interval))
+        while shift.running():
+            for route in DASHBOARD_ROUTES:
+                await client.request("GET", f"GET {route}", route)
+            await shift.sleep(shift.args.poll_interval)
+
+    users = shift.planners or shift.handlers
+    await asyncio.gather(
+        *(poll(users[i % len(users)]) for i in range(shift.args.dashboards))
+    )
+
+
+async def run(args: argparse.Namespace) -> dict:
+    limits = Limits(max_connections=args.connections)
+    async with AsyncClient(
+        base_url=args.base_url, limits=limits, timeout=args.timeout
+    ) as client:
+        shift = Shift(args, client)
+
+        started = time.perf_counter()
+        await shift.login_storm()
+        login_duration = time.perf_counter() - started
+        print(
+            f"login storm: {len(shift.planners)} planners and "
+            f"{len(shift.handlers)} handlers in {login_duration:.1f}s"
+        )
+        if not shift.planners and not shift.handlers:
+            raise SystemExit("nobody could log in, is the dataset generated?")
+
+        await shift.load_reference_data()
+
+        started = time.perf_counter()
+        shift.deadline = started + args.duration
+        await asyncio.gather(
+            *(
+                fn(shift)
+                for name, fn in SCENARIOS.items()
+                if not args.only or name in args.only
+            )
+        )
+        duration = time.perf_counter() - started + login_duration
+
+    report = shift.stats.report(duration)
+    total = sum(route["requests"] for route in report.values())
+    errors = sum(route["errors"] for route in report.values())
+    return {
+        "meta": {
+            "created_at": datetime.now(UTC).isoformat(),
+            "base_url": args.base_url,
+            "duration_s": round(duration, 2),
+            "requests": total,
+            "rps": round(total / duration, 2),
+            "error_rate": round(errors / total, 4) if total else 0,
+        },
+        "routes": report,
+    }
+
+
+def print_report(result: dict):
+    print(
+        f"{'route':<36} {'reqs':>7} {'rps':>8} {'p50':>9} {'p95':>9} "
+        f"{'p99':>9} {'4xx':>6} {'err%':>7}"
+    )
+    for route, stats in result["routes"].items():
+        print(
+            f"{route:<36} {stats['requests']:>7} {stats['rps']:>8.1f} "
+            f"{stats['p50_ms']:>7.1f}ms {stats['p95_ms']:>7.1f}ms "
+            f"{stats['p99_ms']:>7.1f}ms {stats['rejected']:>6} "
+            f"{stats['error_rate']:>7.2%}"
+        )
+
+    meta = result["meta"]
+    print(
+        f"{meta['requests']} requests in {meta['duration_s']}s, "
+        f"{meta['rps']} req/s, {meta['error_rate']:.2%} errors"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--zoos", type=int, default=1)
+    parser.add_argument("--handlers", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--only", nargs="*", choices=list(SCENARIOS))
+    parser.add_argument("--burst", type=int, default=5, help="events per burst")
+    parser.add_argument("--think", type=float, default=2, help="seconds between bursts")
+    parser.add_argument("--wave-interval", type=float, default=15)
+    parser.add_argument("--hold", type=float, default=5, help="seconds checked out")
+    parser.add_argument("--dashboards", type=int, default=10)
+    parser.add_argument("--poll-interval", type=float, default=5)
+    parser.add_argument("--connections", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_report(result)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(result, file, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Worker startup profile and budget.
+
+Imports the FastAPI app in fresh interpreters, once under `-X importtime` to
+attribute import time to top-level packages and --runs times to measure the
+wall time and peak RSS a worker pays before it can serve. The exit code is 1
+when the median import exceeds --budget-ms, the peak RSS exceeds --budget-mb,
+or one of LAZY_MODULES was imported eagerly.
+
+    python -m benchmarks.startup --runs 5 --budget-ms 1500 --output startup.json
+
+Settings are read from the environment or .env as usual; nothing connects to
+the database while importing.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+# heavy packages only rarely hit routes need, they must load on first use
+LAZY_MODULES = ["pandas", "numpy", "pyarrow", "boto3", "botocore", "resend"]
+
+PROBE = f"""
+import json, resource, sys, time
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    "import_ms": elapsed * 1000,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "eager": [name for name in {LAZY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def probe(*flags: str) -> tuple[dict, str]:
+    result = subprocess.run(
+        [sys.executable, *flags, "-c", PROBE],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.splitlines()[-1]), result.stderr
+
+
+def parse_importtime(stderr: str) -> dict[str, dict]:
+    """Sum the self time of every module per top-level package."""
+    packages: dict[str, dict] = defaultdict(lambda: {"self_ms": 0.0, "modules": 0})
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+
+        _, self_us, _, name = (
+            part.strip() for part in line.replace(":", "|", 1).split("|")
+        )
+        package = packages[name.split(".")[0]]
+        package["self_ms"] += int(self_us) / 1000
+        package["modules"] += 1
+
+    return dict(sorted(packages.items(), key=lambda item: -item[1]["self_ms"]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--budget-mb", type=float, default=150)
+    parser.add_argument("--output", help="write the profile as JSON")
+    args = parser.parse_args()
+
+    _, stderr = probe("-X", "importtime")
+    packages = parse_importtime(stderr)
+
+    runs = [probe()[0] for _ in range(args.runs)]
+    import_ms = statistics.median(run["import_ms"] for run in runs)
+    max_rss_mb = max(run["max_rss_mb"] for run in runs)
+    eager = sorted({name for run in runs for name in run["eager"]})
+
+    print(f"{'package':<24} {'self':>10} {'modules':>8}")
+    for name, stats in list(packages.items())[: args.top]:
+        print(f"{name:<24} {stats['self_ms']:>8.1f}ms {stats['modules']:>8}")
+    print(
+        f"import app: median {import_ms:.0f}ms (budget {args.budget_ms:.0f}ms), "
+        f"peak rss {max_rss_mb:.0f}MB (budget {args.budget_mb:.0f}MB)"
+    )
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(
+                {
+                    "import_ms": round(import_ms, 1),
+                    "max_rss_mb": round(max_rss_mb, 1),
+                    "eager": eager,
+                    "packages": packages,
+                },
+                file,
+                indent=2,
+            )
+        print(f"results written to {args.output}")
+
+    failures = []
+    if import_ms > args.budget_ms:
+        failures.append(f"import took {import_ms:.0f}ms")
+    if max_rss_mb > args.budget_mb:
+        failures.append(f"peak rss was {max_rss_mb:.0f}MB")
+    if eager:
+        failures.append(f"imported eagerly: {', '.join(eager)}")
+
+    if failures:
+        print("startup budget exceeded: " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import statistics
+import time
+from typing import Awaitable, Callable
+
+
+async def measure(
+    fn: Callable[[], Awaitable[object]], repeat: int, warmup: int = 0
+) -> list[float]:
+    """Run `fn` warmup + repeat times and return the timed runs in milliseconds."""
+    for _ in range(warmup):
+        await fn()
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def percentile(timings: list[float], q: int) -> float:
+    if len(timings) < 2:
+        return timings[0]
+    return statistics.quantiles(timings, n=100, method="inclusive")[q - 1]
+
+
+def summarize(timings: list[float]) -> dict[str, float]:
+    return {
+        "runs": len(timings),
+        "min_ms": round(min(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "max_ms": round(max(timings), 3),
+    }
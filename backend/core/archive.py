@@ -0,0 +1,133 @@
+"""
+Cold archive storage.
+
+Archived rows are written as zstd compressed parquet files, one per source
+table, zoo and month, on local disk or in an S3 bucket. What is archived
+where is recorded in the cold_archive table (db/archive.py), so reading
+history never has to list the storage.
+"""
+
+import io
+import os
+from datetime import date
+from typing import Protocol
+
+import sqlalchemy as sa
+
+from core.config import settings
+from core.utils import get_s3_client
+
+
+def archive_path(source: str, zoo_id: int, month: date) -> str:
+    return f"{source}/zoo={zoo_id}/{month:%Y-%m}.parquet"
+
+
+# ---------------------------------------------
+# STORAGE
+# ---------------------------------------------
+
+
+class Storage(Protocol):
+    def read(self, path: str) -> bytes | None:
+        """The file contents, None if there is no such file."""
+        ...
+
+    def write(self, path: str, data: bytes) -> None: ...
+
+
+class LocalStorage:
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def read(self, path: str) -> bytes | None:
+        try:
+            with open(os.path.join(self.directory, path), "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, path: str, data: bytes) -> None:
+        full_path = os.path.join(self.directory, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        # readers never see a half written file
+        with open(f"{full_path}.tmp", "wb") as file:
+            file.write(data)
+        os.replace(f"{full_path}.tmp", full_path)
+
+
+class S3Storage:
+    def __init__(self, bucket: str, prefix: str):
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def read(self, path: str) -> bytes | None:
+        client = get_s3_client()
+        try:
+            response = client.get_object(
+                Bucket=self.bucket, Key=f"{self.prefix}/{path}"
+            )
+        except client.exceptions.NoSuchKey:
+            return None
+        return response["Body"].read()
+
+    def write(self, path: str, data: bytes) -> None:
+        get_s3_client().put_object(
+            Body=data,
+            Key=f"{self.prefix}/{path}",
+            Bucket=self.bucket,
+            ContentType="application/vnd.apache.parquet",
+        )
+
+
+def get_storage() -> Storage:
+    if settings.COLD_ARCHIVE_STORAGE == "s3":
+        bucket = settings.COLD_ARCHIVE_BUCKET or settings.AWS_BUCKET_NAME
+        return S3Storage(bucket, settings.COLD_ARCHIVE_PATH)
+    return LocalStorage(settings.COLD_ARCHIVE_PATH)
+
+
+# ---------------------------------------------
+# PARQUET
+# ---------------------------------------------
+
+
+def archived_columns(table: sa.Table) -> list[sa.Column]:
+    # generated columns (search vectors) are derived, not history
+    return [column for column in table.columns if column.computed is None]
+
+
+def arrow_schema(table: sa.Table):
+    # spelled out so a month with only null values in a column keeps its type
+    import pyarrow as pa
+
+    fields = []
+    for column in archived_columns(table):
+        if isinstance(column.type, sa.Integer):
+            type_ = pa.int64()
+        elif isinstance(column.type, sa.DateTime):
+            type_ = pa.timestamp("us", tz="UTC")
+        else:
+            type_ = pa.string()
+        fields.append(pa.field(column.name, type_, nullable=column.nullable))
+    return pa.schema(fields)
+
+
+def encode_rows(table: sa.Table, rows: list[dict]) -> bytes:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    buffer = io.BytesIO()
+    pq.write_table(
+        pa.Table.from_pylist(rows, schema=arrow_schema(table)),
+        buffer,
+        compression="zstd",
+    )
+    return buffer.getvalue()
+
+
+def decode_rows(data: bytes, animal_id: int | None = None) -> list[dict]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    filters = [("animal_id", "=", animal_id)] if animal_id is not None else None
+    return pq.read_table(pa.BufferReader(data), filters=filters).to_pylist()
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
 
@@ -12,6 +14,46 @@ class Config(BaseSettings):
     DB_URI: str
     SECRET_KEY: str
 
+    # read-only dashboards and reports read from this replica when it is set,
+    # up and at most REPLICA_MAX_LAG seconds behind; a client's reads stay on
+    # the primary for READ_YOUR_WRITES seconds after each of its own writes
+    DB_REPLICA_URI: str = ""
+    REPLICA_MAX_LAG: float = 10
+    REPLICA_RETRY_AFTER: float = 30  # seconds on the primary after a failure
+    READ_YOUR_WRITES: float = 5
+
+    # seconds between maintenance runs (reset tokens, cold archive, partitions)
+    MAINTENANCE_INTERVAL: float = 3600
+
+    # animal_audit is partitioned by month, partitions are created this many
+    # months ahead; partitions older than AUDIT_RETENTION_MONTHS (0 keeps all)
+    # are detached and moved to AUDIT_ARCHIVE_SCHEMA, or dropped if it's empty
+    AUDIT_PARTITIONS_AHEAD: int = 3
+    AUDIT_RETENTION_MONTHS: int = 0
+    AUDIT_ARCHIVE_SCHEMA: str = "archive"
+
+    # audits and health logs older than COLD_ARCHIVE_MONTHS (0 disables it) are
+    # moved to zstd parquet files, one per zoo and month, under COLD_ARCHIVE_PATH
+    # on local disk or in COLD_ARCHIVE_BUCKET (defaults to AWS_BUCKET_NAME)
+    COLD_ARCHIVE_MONTHS: int = 0
+    COLD_ARCHIVE_STORAGE: Literal["local", "s3"] = "local"
+    COLD_ARCHIVE_PATH: str = "cold-archive"
+    COLD_ARCHIVE_BUCKET: str = ""
+
+    # bearer token Prometheus has to send to scrape /metrics, open when empty
+    METRICS_TOKEN: str = ""
+
+    # traces of sampled requests and email batches, as JSON lines on stdout or
+    # in TRACE_FILE; requests with a sampled upstream traceparent are always
+    # traced, and traces shorter than TRACE_MIN_DURATION_MS aren't exported
+    TRACE_EXPORTER: Literal["none", "console", "file"] = "none"
+    TRACE_SAMPLE_RATE: float = 0.01
+    TRACE_MIN_DURATION_MS: float = 0
+    TRACE_FILE: str = "traces.jsonl"
+
+    # seconds before a role/tier change or revocation reaches other workers
+    TOKEN_REVOCATION_REFRESH: float = 10
+
     # Admin User
     ADMIN_USERNAME: str
     ADMIN_PASSWORD: str
@@ -28,7 +70,18 @@ class Config(BaseSettings):
     AWS_BUCKET_NAME: str
 
     # RESEND API KEY
-    RESEND_API_KEY: str
+    RESEND_API_KEY: str = ""
+
+    # Emails are queued in the outbox and sent by a background worker
+    EMAIL_FROM: str = "OpenHAMS <hams@ahmed-abdullah.live>"
+    EMAIL_TRANSPORT: Literal["resend", "smtp", "file"] = "resend"
+    EMAIL_FILE_DIR: str = "outbox"  # file transport, one .eml per email
+    SMTP_HOST: str = "localhost"
+    SMTP_PORT: int = 1025
+    EMAIL_WORKER: bool = True  # run the worker inside the API process
+    EMAIL_BATCH_SIZE: int = 50
+    EMAIL_MAX_ATTEMPTS: int = 5
+    EMAIL_POLL_INTERVAL: float = 5
 
 
 settings = Config()  # type: ignore
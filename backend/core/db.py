@@ -3,3 +3,11 @@ from sqlalchemy.ext.asyncio import create_async_engine
 from core.config import settings
 
 engine = create_async_engine(settings.DB_URI)
+
+# only read through api.deps.ReadSessionDep, pinged so a replica that went
+# away is noticed when the connection is checked out rather than mid query
+replica_engine = (
+    create_async_engine(settings.DB_REPLICA_URI, pool_pre_ping=True)
+    if settings.DB_REPLICA_URI
+    else None
+)
@@ -0,0 +1,236 @@
+"""
+Outbox email sender.
+
+Routes only queue emails (db.emails.queue_email); this worker sends them in
+batches through the configured transport and retries failures with
+exponential backoff. It runs inside the API process by default, set
+EMAIL_WORKER=false there and start it separately to scale it on its own:
+
+    python -m core.email
+"""
+
+import asyncio
+import logging
+import os
+import smtplib
+from datetime import UTC, datetime, timedelta
+from email.message import EmailMessage
+from email.utils import make_msgid
+from functools import cache
+from typing import TYPE_CHECKING, Protocol
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.config import settings
+from core.db import engine
+from core.tracing import span, trace
+from db.emails import claim_emails, retry_delay
+from models import EmailOutbox
+
+if TYPE_CHECKING:
+    from jinja2 import Template
+
+TEMPLATES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "templates", "emails"
+)
+
+logger = logging.getLogger(__name__)
+
+SUBJECTS = {
+    "reset-password": "Password Change Request",
+}
+
+# how long a claimed email stays hidden from other workers while sending
+LEASE = timedelta(minutes=5)
+
+_wake_up = asyncio.Event()
+
+
+def wake_up_worker():
+    """Let an in-process worker pick up a freshly queued email right away."""
+    _wake_up.set()
+
+
+# ---------------------------------------------
+# TEMPLATES
+# ---------------------------------------------
+
+
+@cache
+def get_template(name: str) -> "Template":
+    # compiled once per process, rendering is then a plain function call
+    from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+    environment = Environment(
+        loader=FileSystemLoader(TEMPLATES_DIR),
+        autoescape=select_autoescape(),
+        auto_reload=False,
+    )
+    return environment.get_template(f"{name}.html")
+
+
+def render(email: EmailOutbox) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = settings.EMAIL_FROM
+    message["To"] = email.to
+    message["Subject"] = SUBJECTS[email.template]
+    message["Message-ID"] = make_msgid()
+    message.set_content(get_template(email.template).render(**email.context), "html")
+    return message
+
+
+# ---------------------------------------------
+# TRANSPORTS
+# ---------------------------------------------
+
+
+class Transport(Protocol):
+    def send(self, messages: list[EmailMessage]) -> list[Exception | None]:
+        """Send a batch, returning the error (or None) for every message."""
+        ...
+
+
+class ResendTransport:
+    def __init__(self):
+        import resend
+
+        resend.api_key = settings.RESEND_API_KEY
+        self.resend = resend
+
+    def send(self, messages: list[EmailMessage]) -> list[Exception | None]:
+        params = [
+            {
+                "from": message["From"],
+                "to": [message["To"]],
+                "subject": message["Subject"],
+                "html": message.get_content(),
+            }
+            for message in messages
+        ]
+        try:
+            self.resend.Batch.send(params)  # type: ignore
+        except Exception as e:
+            return [e] * len(messages)
+        return [None] * len(messages)
+
+
+class SMTPTransport:
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+
+    def send(self, messages: list[EmailMessage]) -> list[Exception | None]:
+        errors: list[Exception | None] = []
+        try:
+            with smtplib.SMTP(self.host, self.port) as smtp:
+                for message in messages:
+                    try:
+                        smtp.send_message(message)
+                        errors.append(None)
+                    except smtplib.SMTPException as e:
+                        errors.append(e)
+        except OSError as e:
+            errors.extend([e] * (len(messages) - len(errors)))
+        return errors
+
+
+class FileTransport:
+    """Writes every email to `directory` as an .eml file, for local development."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def send(self, messages: list[EmailMessage]) -> list[Exception | None]:
+        os.makedirs(self.directory, exist_ok=True)
+        errors: list[Exception | None] = []
+        for message in messages:
+            name = message["Message-ID"].strip("<>").replace("@", "_")
+            try:
+                with open(os.path.join(self.directory, f"{name}.eml"), "wb") as file:
+                    file.write(message.as_bytes())
+                errors.append(None)
+            except OSError as e:
+                errors.append(e)
+        return errors
+
+
+def get_transport() -> Transport:
+    if settings.EMAIL_TRANSPORT == "smtp":
+        return SMTPTransport(settings.SMTP_HOST, settings.SMTP_PORT)
+    if settings.EMAIL_TRANSPORT == "file":
+        return FileTransport(settings.EMAIL_FILE_DIR)
+    return ResendTransport()
+
+
+# ---------------------------------------------
+# WORKER
+# ---------------------------------------------
+
+
+async def send_batch(transport: Transport) -> int:
+    """Send one batch of due emails, returns how many were claimed."""
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        emails = await claim_emails(session, settings.EMAIL_BATCH_SIZE, LEASE)
+        if not emails:
+            return 0
+
+        # rendering and sending are blocking, keep them off the event loop
+        def send() -> list[Exception | None]:
+            messages, errors = [], {}
+            for email in emails:
+                try:
+                    messages.append((email, render(email)))
+                except Exception as e:
+                    errors[email.id] = e
+            with span(
+                "email.send",
+                transport=type(transport).__name__,
+                messages=len(messages),
+            ):
+                sent = transport.send([message for _, message in messages])
+            errors.update(
+                (email.id, error)
+                for (email, _), error in zip(messages, sent, strict=True)
+            )
+            return [errors[email.id] for email in emails]
+
+        with trace("email.batch", emails=len(emails)):
+            now = datetime.now(UTC)
+            for email, error in zip(emails, await asyncio.to_thread(send), strict=True):
+                if error is None:
+                    email.status = "sent"
+                    email.sent_at = now
+                elif email.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+                    email.status = "failed"
+                    email.last_error = str(error)
+                else:
+                    email.last_error = str(error)
+                    email.next_attempt_at = now + retry_delay(email.attempts)
+                session.add(email)
+
+            await session.commit()
+        return len(emails)
+
+
+async def run_worker():
+    transport = get_transport()
+    while True:
+        _wake_up.clear()
+        try:
+            claimed = await send_batch(transport)
+        except Exception:
+            logger.exception("email worker error")
+            claimed = 0
+
+        # a full batch means more are probably waiting
+        if claimed == settings.EMAIL_BATCH_SIZE:
+            continue
+
+        try:
+            await asyncio.wait_for(_wake_up.wait(), settings.EMAIL_POLL_INTERVAL)
+        except TimeoutError:
+            pass
+
+
+if __name__ == "__main__":
+    asyncio.run(run_worker())
@@ -0,0 +1,47 @@
+"""
+Periodic housekeeping run by the API process next to the email worker.
+"""
+
+import asyncio
+import logging
+from datetime import UTC, datetime
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.config import settings
+from core.db import engine
+from db.archive import archive_cold_rows
+from db.partitions import (
+    add_months,
+    create_audit_partitions,
+    detach_old_audit_partitions,
+)
+from db.users import purge_expired_reset_tokens
+
+logger = logging.getLogger(__name__)
+
+
+async def maintain_audit_partitions(session) -> None:
+    this_month = datetime.now(UTC).date().replace(day=1)
+    await create_audit_partitions(
+        session, this_month, add_months(this_month, settings.AUDIT_PARTITIONS_AHEAD)
+    )
+
+    if settings.AUDIT_RETENTION_MONTHS:
+        await detach_old_audit_partitions(
+            session, settings.AUDIT_RETENTION_MONTHS, settings.AUDIT_ARCHIVE_SCHEMA
+        )
+
+
+async def run_maintenance():
+    # rows are archived before their audit partitions can be detached
+    jobs = [purge_expired_reset_tokens, archive_cold_rows, maintain_audit_partitions]
+    while True:
+        for job in jobs:
+            try:
+                async with AsyncSession(engine) as session:
+                    await job(session)
+            except Exception:
+                logger.exception("maintenance job %s failed", job.__name__)
+
+        await asyncio.sleep(settings.MAINTENANCE_INTERVAL)
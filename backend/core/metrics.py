@@ -0,0 +1,264 @@
+"""
+Prometheus metrics.
+
+Counters, gauges and histograms live in this process and are rendered in the
+text exposition format by GET /metrics. Requests are labelled with their route
+template ("/animals/{animal_id}"), never the raw path, so the number of series
+stays bounded by the number of routes; database time is summed per request
+from SQLAlchemy's cursor events.
+"""
+
+import bisect
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from core.singleflight import stats as coalescing_stats
+from models import AnimalAudit
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_registry: list["Metric"] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)
+    )
+    return "{" + pairs + "}"
+
+
+class Metric(ABC):
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        _registry.append(self)
+
+    @abstractmethod
+    def samples(self) -> list[str]: ...
+
+    def render(self) -> str:
+        return "\n".join(
+            [
+                f"# HELP {self.name} {self.help}",
+                f"# TYPE {self.name} {self.type}",
+                *self.samples(),
+            ]
+        )
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self.values: dict[tuple, float] = defaultdict(float)
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self.values[labels] += amount
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_labels(self.labels, labels)} {value}"
+            for labels, value in self.values.items()
+        ]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.values[labels] -= amount
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+        # per label set: counts per bucket (the last one is +Inf), sum
+        self.values: dict[tuple, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        counts, total = self.values.setdefault(
+            labels, ([0] * (len(self.buckets) + 1), [0.0])
+        )
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def samples(self) -> list[str]:
+        samples = []
+        for labels, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip([*self.buckets, "+Inf"], counts, strict=True):
+                cumulative += count
+                samples.append(
+                    f"{self.name}_bucket"
+                    f"{_labels((*self.labels, 'le'), (*labels, bound))} {cumulative}"
+                )
+            samples.append(f"{self.name}_sum{_labels(self.labels, labels)} {total[0]}")
+            samples.append(
+                f"{self.name}_count{_labels(self.labels, labels)} {cumulative}"
+            )
+        return samples
+
+
+REQUESTS = Counter(
+    "hams_http_requests_total", "HTTP requests", ("method", "route", "status")
+)
+REQUEST_DURATION = Histogram(
+    "hams_http_request_duration_seconds",
+    "HTTP request latency",
+    ("method", "route"),
+)
+REQUEST_DB_DURATION = Histogram(
+    "hams_http_request_db_seconds",
+    "Time spent in database queries per HTTP request",
+    ("method", "route"),
+)
+IN_PROGRESS = Gauge("hams_http_requests_in_progress", "HTTP requests being served")
+CHECKOUTS = Counter("hams_checkouts_total", "Animals checked out")
+CHECKINS = Counter("hams_checkins_total", "Animals checked in")
+AUDITS = Counter("hams_audits_written_total", "Animal audit logs written", ("action",))
+
+
+class CoalescingMetric(Metric):
+    type = "counter"
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_labels(self.labels, (handler, outcome))} {counts[outcome]}"
+            for handler, counts in coalescing_stats.items()
+            for outcome in ("executions", "shared")
+        ]
+
+
+CoalescingMetric(
+    "hams_coalesced_requests_total",
+    "Runs of coalesced handlers, and requests that shared a concurrent run",
+    ("handler", "outcome"),
+)
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+# seconds of database time of the current request, None outside of one
+_db_time: ContextVar[list[float] | None] = ContextVar("db_time", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, many):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, many):
+    started = conn.info["query_start"].pop()
+    db_time = _db_time.get()
+    if db_time is not None:
+        db_time[0] += time.perf_counter() - started
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    # a failed statement never reaches after_cursor_execute
+    if context.connection is not None:
+        starts = context.connection.info.get("query_start")
+        if starts:
+            starts.pop()
+
+
+# audits count once their transaction commits, not when they're added
+@event.listens_for(Session, "after_flush")
+def _after_flush(session, flush_context):
+    for instance in session.new:
+        if isinstance(instance, AnimalAudit):
+            session.info.setdefault("audits", []).append(instance.action)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    for action in session.info.pop("audits", []):
+        AUDITS.inc(action)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("audits", None)
+
+
+_routes: dict = {}
+
+
+def route_of(scope) -> str:
+    """Path template of the route that served a request, once it's routed."""
+    # the router leaves the matched endpoint in the scope
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    if endpoint not in _routes:
+        for route in scope["app"].routes:
+            if getattr(route, "endpoint", None) is endpoint:
+                _routes[endpoint] = route.path
+                break
+        else:
+            _routes[endpoint] = "unmatched"
+    return _routes[endpoint]
+
+
+class MetricsMiddleware:
+    """Pure ASGI, so responses are not buffered or copied on the way out."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        db_time = [0.0]
+        token = _db_time.set(db_time)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_PROGRESS.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            IN_PROGRESS.dec()
+            _db_time.reset(token)
+
+            method, route = scope["method"], route_of(scope)
+            REQUESTS.inc(method, route, status)
+            REQUEST_DURATION.observe(elapsed, method, route)
+            REQUEST_DB_DURATION.observe(db_time[0], method, route)
@@ -0,0 +1,182 @@
+"""
+Animal-to-event assignment for a batch of planned events.
+
+Every animal's commitments are a sorted interval list, so whether it can take
+an event (no overlap, rest time on both sides, daily checkout count and hours)
+is a bisect plus a look at its neighbours. Events are filled greedily in start
+order, scarce animals last; shortfalls are then repaired with augmenting paths
+as in bipartite matching, moving an assigned animal to another event and
+refilling its old place, until everything is filled or the time budget is up.
+"""
+
+import bisect
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+# commitments already in the database, as opposed to a planned slot index
+EXISTING = -1
+
+
+class AnimalSchedule:
+    def __init__(
+        self,
+        animal_id: int,
+        rest: timedelta,
+        max_daily_checkouts: int,
+        max_daily_time: timedelta,
+    ):
+        self.animal_id = animal_id
+        self.rest = rest
+        self.max_daily_checkouts = max_daily_checkouts
+        self.max_daily_time = max_daily_time
+
+        # (start, end, slot) sorted by start; existing commitments may overlap
+        # (a checkout still out, events created without clash checks), so the
+        # longest one bounds how far back an overlapping interval can start
+        self.intervals: list[tuple[datetime, datetime, int]] = []
+        self.longest = timedelta(0)
+        self.daily_count: dict[date, int] = defaultdict(int)
+        self.daily_time: dict[date, timedelta] = defaultdict(timedelta)
+
+    def add(self, start: datetime, end: datetime, slot: int = EXISTING) -> None:
+        bisect.insort(self.intervals, (start, end, slot))
+        self.longest = max(self.longest, end - start)
+        self.daily_count[start.date()] += 1
+        self.daily_time[start.date()] += end - start
+
+    def remove(self, start: datetime, end: datetime, slot: int) -> None:
+        self.intervals.remove((start, end, slot))
+        self.daily_count[start.date()] -= 1
+        self.daily_time[start.date()] -= end - start
+
+    def conflicts(self, start: datetime, end: datetime) -> list[int] | None:
+        """
+        The planned slots standing in the way of [start, end) with rest on both
+        sides, None when an existing commitment does.
+        """
+        slots = []
+        # everything starting before end + rest, walked back while it could
+        # still end within rest of start
+        index = bisect.bisect_left(self.intervals, (end + self.rest,))
+        while index > 0:
+            index -= 1
+            other_start, other_end, slot = self.intervals[index]
+            if other_start + self.longest + self.rest <= start:
+                break
+            if other_end + self.rest <= start:
+                continue
+            if slot == EXISTING:
+                return None
+            slots.append(slot)
+        return slots
+
+    def within_caps(self, start: datetime, end: datetime) -> bool:
+        day = start.date()
+        return (
+            self.daily_count[day] < self.max_daily_checkouts
+            and self.daily_time[day] + (end - start) <= self.max_daily_time
+        )
+
+
+class Slot:
+    def __init__(
+        self, index: int, start: datetime, end: datetime, count: int, candidates
+    ):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.count = count
+        self.candidates: list[int] = list(candidates)
+        self.assigned: set[int] = set()
+
+    @property
+    def missing(self) -> int:
+        return self.count - len(self.assigned)
+
+
+class Planner:
+    def __init__(self, schedules: dict[int, AnimalSchedule], slots: list[Slot]):
+        self.schedules = schedules
+        self.slots = slots
+        # how many slots want each animal, scarce animals are kept for last
+        self.demand: dict[int, int] = defaultdict(int)
+        for slot in slots:
+            for animal_id in slot.candidates:
+                self.demand[animal_id] += 1
+
+    def assign(self, slot: Slot, animal_id: int) -> None:
+        self.schedules[animal_id].add(slot.start, slot.end, slot.index)
+        slot.assigned.add(animal_id)
+
+    def unassign(self, slot: Slot, animal_id: int) -> None:
+        self.schedules[animal_id].remove(slot.start, slot.end, slot.index)
+        slot.assigned.discard(animal_id)
+
+    def fits(self, slot: Slot, animal_id: int) -> bool:
+        schedule = self.schedules[animal_id]
+        return schedule.conflicts(slot.start, slot.end) == [] and schedule.within_caps(
+            slot.start, slot.end
+        )
+
+    def fill(self, slot: Slot) -> None:
+        available = [
+            animal_id
+            for animal_id in slot.candidates
+            if animal_id not in slot.assigned and self.fits(slot, animal_id)
+        ]
+        available.sort(
+            key=lambda animal_id: (
+                self.demand[animal_id],
+                self.schedules[animal_id].daily_time[slot.start.date()],
+                animal_id,
+            )
+        )
+        for animal_id in available[: slot.missing]:
+            self.assign(slot, animal_id)
+
+    def augment(self, slot: Slot, visited: set[int], deadline: float) -> bool:
+        """Find one more animal for `slot`, moving others along the way."""
+        for animal_id in slot.candidates:
+            if animal_id in slot.assigned or animal_id in visited:
+                continue
+            if time.monotonic() > deadline:
+                return False
+            visited.add(animal_id)
+
+            schedule = self.schedules[animal_id]
+            blocking = schedule.conflicts(slot.start, slot.end)
+            # only a single planned slot in the way can be moved aside
+            if blocking is None or len(blocking) > 1:
+                continue
+
+            if not blocking:
+                if schedule.within_caps(slot.start, slot.end):
+                    self.assign(slot, animal_id)
+                    return True
+                continue
+
+            other = self.slots[blocking[0]]
+            self.unassign(other, animal_id)
+            if schedule.within_caps(slot.start, slot.end):
+                self.assign(slot, animal_id)
+                if self.augment(other, visited, deadline):
+                    return True
+                self.unassign(slot, animal_id)
+            self.assign(other, animal_id)
+
+        return False
+
+    def solve(self, budget: timedelta) -> bool:
+        """Assign as many animals as possible, True if every slot is full."""
+        deadline = time.monotonic() + budget.total_seconds()
+
+        for slot in sorted(self.slots, key=lambda slot: (slot.start, slot.end)):
+            self.fill(slot)
+
+        for slot in self.slots:
+            while slot.missing > 0 and time.monotonic() < deadline:
+                if not self.augment(slot, set(), deadline):
+                    break
+
+        return all(slot.missing == 0 for slot in self.slots)
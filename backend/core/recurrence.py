@@ -0,0 +1,46 @@
+"""
+Recurrence rules of event series.
+
+A series stores its first occurrence and an RFC 5545 RRULE; occurrences are
+expanded on demand with dateutil in the series' own time zone, so a daily
+10:00 encounter stays at 10:00 local time across daylight saving changes.
+"""
+
+from datetime import UTC, datetime, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from dateutil.rrule import rrule, rrulestr
+from fastapi import HTTPException
+
+
+# series are expanded on every listing, parsed rules are reused
+@lru_cache(maxsize=1024)
+def build_rule(rule: str, start_at: datetime, timezone: str) -> rrule:
+    try:
+        start = start_at.astimezone(ZoneInfo(timezone))
+        parsed = rrulestr(rule, dtstart=start)
+    except ZoneInfoNotFoundError:
+        raise HTTPException(status_code=400, detail="Unknown time zone") from None
+    except (ValueError, TypeError) as error:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid recurrence rule: {error}"
+        ) from None
+    if not isinstance(parsed, rrule):
+        raise HTTPException(
+            status_code=400, detail="Only a single RRULE is supported per series"
+        )
+    return parsed
+
+
+def occurrences_between(rule: rrule, start: datetime, end: datetime) -> list[datetime]:
+    """Occurrence starts in [start, end), in UTC."""
+    return [
+        occurrence.astimezone(UTC)
+        for occurrence in rule.between(start, end, inc=True)
+        if occurrence < end
+    ]
+
+
+def is_occurrence(rule: rrule, start: datetime) -> bool:
+    return bool(occurrences_between(rule, start, start + timedelta(microseconds=1)))
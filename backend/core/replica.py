@@ -0,0 +1,73 @@
+"""
+When a read-only request may use the replica.
+
+The decision is per worker process: a client (its Authorization header) that
+wrote something in the last READ_YOUR_WRITES seconds reads from the primary,
+and so does everyone while the replica is unreachable or lagging, until the
+next check.
+"""
+
+import time
+
+from fastapi import Request
+
+from core.config import settings
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# seconds between replication lag checks
+LAG_CHECK_INTERVAL = 5
+
+# 0 when the replica has replayed everything it received, so an idle primary
+# doesn't look like lag
+LAG_QUERY = """
+SELECT CASE
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+# client -> monotonic time its read-your-writes window ends
+_writes: dict[str, float] = {}
+_unavailable_until = 0.0
+_lag_checked_at = 0.0
+
+
+def client_key(request: Request) -> str | None:
+    return request.headers.get("authorization")
+
+
+def note_write(request: Request) -> None:
+    key = client_key(request)
+    if key and settings.READ_YOUR_WRITES > 0:
+        now = time.monotonic()
+        _writes[key] = now + settings.READ_YOUR_WRITES
+        # forget windows that are over, the dict stays at recent writers
+        if len(_writes) > 1000:
+            for stale in [key for key, until in _writes.items() if until < now]:
+                del _writes[stale]
+
+
+def replica_usable(request: Request) -> bool:
+    now = time.monotonic()
+    if now < _unavailable_until:
+        return False
+    key = client_key(request)
+    return not (key and _writes.get(key, 0) > now)
+
+
+def lag_check_due() -> bool:
+    global _lag_checked_at
+    now = time.monotonic()
+    if now - _lag_checked_at < LAG_CHECK_INTERVAL:
+        return False
+    _lag_checked_at = now
+    return True
+
+
+def replica_failed(retry_after: float | None = None) -> None:
+    """Send reads to the primary for a while."""
+    global _unavailable_until
+    _unavailable_until = time.monotonic() + (
+        settings.REPLICA_RETRY_AFTER if retry_after is None else retry_after
+    )
@@ -1,3 +1,4 @@
+import hashlib
 from datetime import datetime, timedelta, timezone
 
 from jose import jwt
@@ -32,3 +33,8 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+
+
+def hash_token(token: str) -> str:
+    """Single use tokens are random enough for a plain, indexable sha256."""
+    return hashlib.sha256(token.encode()).hexdigest()
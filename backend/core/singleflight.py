@@ -0,0 +1,89 @@
+"""
+Coalescing of identical concurrent requests.
+
+A route handler wrapped in `coalesce` runs once per distinct set of arguments
+at a time: requests arriving while that run is in flight wait for it and get
+the same result instead of repeating the work. Nothing is cached, the first
+request after it finishes runs the handler again.
+"""
+
+import asyncio
+import functools
+from collections import Counter, defaultdict
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models import User
+from schemas import Principal
+
+# handler -> executions and requests that shared one instead
+stats: dict[str, Counter] = defaultdict(Counter)
+
+_in_flight: dict[tuple, asyncio.Future] = {}
+
+
+def _key_part(value):
+    # results may depend on who asks, so those only share within one user
+    if isinstance(value, Principal | User):
+        return value.id
+    # a replica session may lag, a caller pinned to the primary mustn't share
+    if isinstance(value, AsyncSession):
+        return value.bind
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+def _retrieve(future: asyncio.Future) -> None:
+    # nobody may have been waiting for a failed run
+    if not future.cancelled():
+        future.exception()
+
+
+def coalesce(handler):
+    """
+    Route decorator, below `@router.get(...)`. Only for handlers that read and
+    whose result is shared by everyone passing the same arguments.
+    """
+    name = f"{handler.__module__}.{handler.__name__}"
+
+    @functools.wraps(handler)
+    async def wrapper(**kwargs):
+        key = (
+            name,
+            *sorted(
+                ((param, _key_part(value)) for param, value in kwargs.items()),
+                key=lambda item: item[0],
+            ),
+        )
+
+        while (future := _in_flight.get(key)) is not None:
+            try:
+                result = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # the run we waited for was cancelled, not this request
+                if future.cancelled():
+                    continue
+                raise
+            stats[name]["shared"] += 1
+            return result
+
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_retrieve)
+        _in_flight[key] = future
+        stats[name]["executions"] += 1
+        try:
+            result = await handler(**kwargs)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del _in_flight[key]
+
+    return wrapper
@@ -0,0 +1,290 @@
+"""
+Request tracing.
+
+A sampled request gets a trace: a tree of timed spans for the request, its
+route handler, response serialization, every SQL statement, S3 uploads and
+email sends. Finished traces are exported as one JSON line each to stdout or
+TRACE_FILE. Whether to sample is decided once when a trace starts: always when
+an upstream W3C `traceparent` header says it's sampled, otherwise with
+probability TRACE_SAMPLE_RATE. Spans outside of a sampled trace cost one
+contextvar lookup, and traces shorter than TRACE_MIN_DURATION_MS are dropped
+before export, so tracing can stay on in production.
+"""
+
+import functools
+import inspect
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from core.config import settings
+from core.metrics import route_of
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+# a request looping over queries shouldn't grow its trace without bound
+MAX_SPANS = 1000
+MAX_STATEMENT = 1000
+
+_trace: ContextVar["Trace | None"] = ContextVar("trace", default=None)
+_span: ContextVar["Span | None"] = ContextVar("span", default=None)
+_export_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("span_id", "parent_id", "name", "attributes", "start", "end", "error")
+
+    def __init__(
+        self, name: str, parent_id: str | None, attributes: dict, start: int | None
+    ):
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start = start or time.perf_counter_ns()
+        self.end: int | None = None
+        self.error: str | None = None
+
+    def finish(self) -> None:
+        self.end = time.perf_counter_ns()
+
+
+class Trace:
+    def __init__(self, trace_id: str, parent_id: str | None):
+        self.trace_id = trace_id
+        self.parent_id = parent_id  # span of the upstream service, if any
+        self.wall_start = time.time_ns()
+        self.start = time.perf_counter_ns()
+        self.spans: list[Span] = []
+        self.dropped = 0
+        self.handler: Span | None = None
+
+    def add(
+        self,
+        name: str,
+        parent: Span | None,
+        attributes: dict,
+        start: int | None = None,
+    ) -> Span:
+        span = Span(
+            name, parent.span_id if parent else self.parent_id, attributes, start
+        )
+        if len(self.spans) < MAX_SPANS:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+        return span
+
+    @property
+    def root(self) -> Span:
+        return self.spans[0]
+
+    def as_dict(self) -> dict:
+        def ms(ns: int) -> float:
+            return round(ns / 1_000_000, 3)
+
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "start": self.wall_start / 1_000_000_000,
+            "duration_ms": ms((self.root.end or self.start) - self.start),
+            "dropped_spans": self.dropped,
+            "spans": [
+                {
+                    "span_id": span.span_id,
+                    "parent_id": span.parent_id,
+                    "name": span.name,
+                    "offset_ms": ms(span.start - self.start),
+                    "duration_ms": ms(span.end - span.start) if span.end else None,
+                    "attributes": span.attributes,
+                    "error": span.error,
+                }
+                for span in self.spans
+            ],
+        }
+
+
+def start_trace(traceparent: str | None = None) -> Trace | None:
+    """A new trace if this one is sampled, continuing an upstream one."""
+    if settings.TRACE_EXPORTER == "none":
+        return None
+    trace_id, parent_id, sampled = None, None, False
+    if traceparent and (match := TRACEPARENT.match(traceparent.strip().lower())):
+        trace_id, parent_id, flags = match.groups()
+        sampled = bool(int(flags, 16) & 1)
+    if not sampled and random.random() >= settings.TRACE_SAMPLE_RATE:
+        return None
+    return Trace(trace_id or os.urandom(16).hex(), parent_id)
+
+
+def export(trace: Trace) -> None:
+    data = trace.as_dict()
+    if data["duration_ms"] < settings.TRACE_MIN_DURATION_MS:
+        return
+    line = json.dumps(data, default=str)
+    # email batches export from the worker while requests export on the loop
+    with _export_lock:
+        if settings.TRACE_EXPORTER == "console":
+            print(line, file=sys.stdout, flush=True)
+        elif settings.TRACE_EXPORTER == "file":
+            with open(settings.TRACE_FILE, "a") as file:
+                file.write(line + "\n")
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time a block as a child of the current span, a no-op when not tracing."""
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+
+    current = trace.add(name, _span.get(), attributes)
+    token = _span.set(current)
+    try:
+        yield current
+    except BaseException as error:
+        current.error = repr(error)
+        raise
+    finally:
+        _span.reset(token)
+        current.finish()
+
+
+@contextmanager
+def trace(name: str, traceparent: str | None = None, **attributes):
+    """Root span of a request or a background job, yields the Trace if sampled."""
+    current = start_trace(traceparent)
+    if current is None:
+        yield None
+        return
+
+    token = _trace.set(current)
+    try:
+        with span(name, **attributes):
+            yield current
+    finally:
+        _trace.reset(token)
+        export(current)
+
+
+# ---------------------------------------------
+# SQL
+# ---------------------------------------------
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, many):
+    trace = _trace.get()
+    current = None
+    if trace is not None:
+        current = trace.add(
+            f"db {statement.lstrip().split(' ', 1)[0].upper()}",
+            _span.get(),
+            {"db.statement": statement[:MAX_STATEMENT], "db.executemany": many},
+        )
+    # pushed even when not tracing so it always pairs with the pop below
+    conn.info.setdefault("trace_spans", []).append(current)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, many):
+    current = conn.info["trace_spans"].pop()
+    if current is not None:
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            current.attributes["db.rowcount"] = cursor.rowcount
+        current.finish()
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    spans = context.connection.info.get("trace_spans") if context.connection else None
+    if spans:
+        current = spans.pop()
+        if current is not None:
+            current.error = repr(context.original_exception)
+            current.finish()
+
+
+# ---------------------------------------------
+# REQUESTS
+# ---------------------------------------------
+
+
+def _traced(call, name: str):
+    @contextmanager
+    def handler_span():
+        with span("handler", function=name) as current:
+            yield
+        # serialization is timed from here to the response start
+        if current is not None:
+            _trace.get().handler = current  # type: ignore
+
+    if inspect.iscoroutinefunction(call):
+
+        @functools.wraps(call)
+        async def async_wrapper(**kwargs):
+            with handler_span():
+                return await call(**kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(call)
+    def wrapper(**kwargs):
+        with handler_span():
+            return call(**kwargs)
+
+    return wrapper
+
+
+def instrument_routes(app) -> None:
+    """Give route handlers their own span, once all routers are included."""
+    for route in app.routes:
+        if isinstance(route, APIRoute):
+            call = route.dependant.call
+            route.dependant.call = _traced(
+                call, f"{call.__module__}.{call.__qualname__}"
+            )
+
+
+class TracingMiddleware:
+    """Pure ASGI, starts the trace of sampled requests and exports it."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or settings.TRACE_EXPORTER == "none":
+            return await self.app(scope, receive, send)
+
+        traceparent = dict(scope["headers"]).get(b"traceparent", b"").decode("latin-1")
+        attributes = {"http.method": scope["method"], "http.target": scope["path"]}
+        with trace("request", traceparent, **attributes) as current:
+            if current is None:
+                return await self.app(scope, receive, send)
+
+            async def send_traced(message):
+                if message["type"] == "http.response.start":
+                    current.root.attributes["http.status_code"] = message["status"]
+                    MutableHeaders(scope=message).append("X-Trace-Id", current.trace_id)
+                    handler = current.handler
+                    if handler is not None and handler.end is not None:
+                        current.add(
+                            "serialize", current.root, {}, start=handler.end
+                        ).finish()
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_traced)
+            finally:
+                current.root.name = f"{scope['method']} {route_of(scope)}"
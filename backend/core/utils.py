@@ -1,4 +1,5 @@
 from datetime import UTC, datetime, timedelta
+from functools import cache
 
 import sqlalchemy as sa
 from sqlalchemy.types import TIMESTAMP
@@ -24,6 +25,10 @@ def updated_at_field() -> datetime:
     )
 
 
+def as_utc(value: datetime) -> datetime:
+    return value.astimezone(UTC) if value.tzinfo else value.replace(tzinfo=UTC)
+
+
 def time_since(delta: timedelta) -> str:
     if delta.days > 0:
         return f"{delta.days} days"
@@ -39,3 +44,18 @@ def snake_to_capital_case(s: str) -> str:
     words = s.split("_")
     capitalized_words = [word.capitalize() for word in words]
     return " ".join(capitalized_words)
+
+
+@cache
+def get_s3_client():
+    # boto3 is slow to import and build a client for, so do it on first use
+    import boto3
+
+    from core.config import settings
+
+    return boto3.client(
+        "s3",
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        region_name=settings.AWS_REGION,
+    )
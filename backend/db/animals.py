@@ -2,10 +2,12 @@ from datetime import UTC, date, datetime, timedelta
 from typing import Literal
 
 from fastapi import HTTPException
-from sqlalchemy import func
+from sqlalchemy import func, literal, tuple_
+from sqlalchemy.types import TIMESTAMP
 from sqlmodel import and_, col, desc, select
 
-from core.utils import time_since
+from core.utils import as_utc, time_since
+from db.series import get_occurrences
 from models import (
     Animal,
     AnimalActitvityLog,
@@ -20,17 +22,19 @@ from models import (
 )
 
 
-async def get_all_animals(zoo_id: int | None, session) -> list[Animal]:
+def get_animals_query(
+    zoo_id: int | None = None,
+    status: str | None = None,
+    species: str | None = None,
+):
+    query = select(Animal)
     if zoo_id:
-        animals = await session.exec(
-            select(Animal)
-            .where(Animal.zoo_id == zoo_id)
-            .order_by(desc(Animal.updated_at))
-        )
-    else:
-        animals = await session.exec(select(Animal))
-
-    return animals.all()
+        query = query.where(Animal.zoo_id == zoo_id)
+    if status:
+        query = query.where(Animal.status == status)
+    if species:
+        query = query.where(Animal.species == species)
+    return query
 
 
 async def get_animal_by_id(id: int, session) -> Animal | None:
@@ -300,6 +304,25 @@ async def validate_event_clashes(
         .group_by(Animal.name)
     )
     clashing_animals = list(clashing_animals.all())
+
+    # recurring events that aren't rows yet, widened so back to back clash too
+    occurrences = await get_occurrences(
+        session,
+        as_utc(start_at) - timedelta(microseconds=1),
+        as_utc(end_at) + timedelta(microseconds=1),
+        zoo_id=zoo_id,
+        overlapping=True,
+        animal_ids=animal_ids,
+    )
+    series_animal_ids = {
+        animal_id for _, series in occurrences for animal_id in series.animal_ids
+    } & set(animal_ids)
+    if series_animal_ids:
+        names = await session.exec(
+            select(Animal.name).where(col(Animal.id).in_(series_animal_ids))
+        )
+        clashing_animals = list(dict.fromkeys([*clashing_animals, *names]))
+
     if clashing_animals:
         raise HTTPException(
             status_code=400,
@@ -332,14 +355,23 @@ async def validate_animals_availability(animal_ids: list[int], session):
     return
 
 
-async def retrieve_animal_logs(animal_id: int, session):
+async def retrieve_animal_logs(
+    animal_id: int,
+    session,
+    start: datetime | None = None,
+    end: datetime | None = None,
+):
     animal = await get_animal_by_id(animal_id, session)
     if not animal:
         raise HTTPException(status_code=404, detail="Animal not found")
 
     logs = await session.exec(
         select(AnimalHealthLog)
-        .where(col(AnimalHealthLog.animal_id) == animal_id)
+        .where(
+            col(AnimalHealthLog.animal_id) == animal_id,
+            col(AnimalHealthLog.logged_at) >= start if start else True,
+            col(AnimalHealthLog.logged_at) < end if end else True,
+        )
         .order_by(desc(AnimalHealthLog.logged_at))
     )
     logs = logs.unique()
@@ -350,6 +382,26 @@ async def retrieve_animal_logs(animal_id: int, session):
     ]
 
 
+def get_health_log_timeline_query(
+    animal_id: int, since: tuple[datetime, int] | None = None
+):
+    # only the log columns, the animal and users are sent once per page
+    query = select(
+        AnimalHealthLog.id,
+        AnimalHealthLog.details,
+        AnimalHealthLog.logged_at,
+        AnimalHealthLog.logged_by,
+    ).where(AnimalHealthLog.animal_id == animal_id)
+
+    if since:
+        logged_at, log_id = since
+        query = query.where(
+            tuple_(col(AnimalHealthLog.logged_at), col(AnimalHealthLog.id))
+            > tuple_(literal(logged_at, TIMESTAMP(timezone=True)), log_id)
+        )
+    return query
+
+
 async def toggle_animal_availability(
     session, animal_id: int, user_id: int, status: Literal["available", "unavailable"]
 ):
@@ -0,0 +1,192 @@
+"""
+Cold archive of animal_audit and animal_health_log.
+
+Rows older than COLD_ARCHIVE_MONTHS are moved out of postgres into one
+parquet file per table, zoo and month (core/archive.py), and the per-animal
+history endpoints read them back for ranges reaching that far.
+"""
+
+import asyncio
+from datetime import UTC, date, datetime
+
+import sqlalchemy as sa
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import col, select
+
+from core.archive import (
+    archive_path,
+    archived_columns,
+    decode_rows,
+    encode_rows,
+    get_storage,
+)
+from core.config import settings
+from db.partitions import add_months
+from db.users import get_users_by_ids
+from models import (
+    Animal,
+    AnimalAudit,
+    AnimalAuditWithDetails,
+    AnimalHealthLog,
+    AnimalHealthLogWithDetails,
+    ColdArchive,
+)
+
+# archived table -> (model, timestamp column)
+SOURCES = {
+    "animal_audit": (AnimalAudit, "changed_at"),
+    "animal_health_log": (AnimalHealthLog, "logged_at"),
+}
+
+
+def month_start(month: date) -> datetime:
+    return datetime(month.year, month.month, 1, tzinfo=UTC)
+
+
+async def get_cold_months(session, source: str, before: date) -> list[tuple[int, date]]:
+    """The (zoo id, month) pairs that still have rows older than `before`."""
+    model, timestamp = SOURCES[source]
+    table = model.__table__
+    month = func.date_trunc("month", func.timezone("UTC", table.c[timestamp]))
+
+    result = await session.execute(
+        select(Animal.zoo_id, month)
+        .join(Animal, col(Animal.id) == table.c.animal_id)
+        .where(table.c[timestamp] < month_start(before))
+        .group_by(Animal.zoo_id, month)
+        .order_by(month)
+    )
+    return [(zoo_id, month.date()) for zoo_id, month in result]
+
+
+async def archive_month(session, source: str, zoo_id: int, month: date) -> int:
+    """
+    Move a zoo's `source` rows of `month` to its archive file, returns how
+    many rows were moved. The rows are only deleted once the file is written.
+    """
+    model, timestamp = SOURCES[source]
+    table = model.__table__
+    storage = get_storage()
+    path = archive_path(source, zoo_id, month)
+
+    rows = await session.execute(
+        sa.delete(table)
+        .where(
+            table.c.animal_id.in_(select(Animal.id).where(Animal.zoo_id == zoo_id)),
+            table.c[timestamp] >= month_start(month),
+            table.c[timestamp] < month_start(add_months(month, 1)),
+        )
+        .returning(*archived_columns(table))
+    )
+    rows = [dict(row) for row in rows.mappings()]
+    if not rows:
+        await session.rollback()
+        return 0
+
+    # a file from an earlier run (even one that died before committing its
+    # delete) is merged by id, so rows are neither lost nor duplicated
+    def write() -> int:
+        existing = storage.read(path)
+        merged = {row["id"]: row for row in decode_rows(existing)} if existing else {}
+        merged.update((row["id"], row) for row in rows)
+        storage.write(path, encode_rows(table, list(merged.values())))
+        return len(merged)
+
+    row_count = await asyncio.to_thread(write)
+    await session.execute(
+        insert(ColdArchive)
+        .values(
+            source=source, zoo_id=zoo_id, month=month, path=path, row_count=row_count
+        )
+        .on_conflict_do_update(
+            index_elements=["source", "zoo_id", "month"],
+            set_={
+                "path": path,
+                "row_count": row_count,
+                "archived_at": datetime.now(UTC),
+            },
+        )
+    )
+    await session.commit()
+    return len(rows)
+
+
+async def archive_cold_rows(session) -> int:
+    """Archive every month older than COLD_ARCHIVE_MONTHS, returns the rows moved."""
+    if not settings.COLD_ARCHIVE_MONTHS:
+        return 0
+
+    this_month = datetime.now(UTC).date().replace(day=1)
+    before = add_months(this_month, -settings.COLD_ARCHIVE_MONTHS)
+
+    moved = 0
+    for source in SOURCES:
+        for zoo_id, month in await get_cold_months(session, source, before):
+            moved += await archive_month(session, source, zoo_id, month)
+    return moved
+
+
+async def get_archived_rows(
+    session, source: str, animal: Animal, start: datetime, end: datetime | None
+) -> list[dict]:
+    """The archived `source` rows of an animal in [start, end)."""
+    _, timestamp = SOURCES[source]
+    start = start.astimezone(UTC)
+    end = end.astimezone(UTC) if end else None
+
+    archives = await session.exec(
+        select(ColdArchive).where(
+            ColdArchive.source == source,
+            ColdArchive.zoo_id == animal.zoo_id,
+            col(ColdArchive.month) >= start.date().replace(day=1),
+            col(ColdArchive.month) <= end.date() if end else True,
+        )
+    )
+    paths = [archive.path for archive in archives]
+    if not paths:
+        return []
+
+    storage = get_storage()
+
+    def read() -> list[dict]:
+        rows = []
+        for path in paths:
+            data = storage.read(path)
+            if data:
+                rows.extend(decode_rows(data, animal.id))
+        return rows
+
+    return [
+        row
+        for row in await asyncio.to_thread(read)
+        if row[timestamp] >= start and (not end or row[timestamp] < end)
+    ]
+
+
+async def get_archived_audits(
+    session, animal: Animal, start: datetime, end: datetime | None
+) -> list[AnimalAuditWithDetails]:
+    rows = await get_archived_rows(session, "animal_audit", animal, start, end)
+    users = await get_users_by_ids(session, {row["changed_by"] for row in rows})
+    return [
+        AnimalAuditWithDetails(
+            audit=AnimalAudit(**row), animal=animal, user=users[row["changed_by"]]
+        )
+        for row in rows
+        if row["changed_by"] in users  # rows of since deleted users are skipped
+    ]
+
+
+async def get_archived_health_logs(
+    session, animal: Animal, start: datetime, end: datetime | None
+) -> list[AnimalHealthLogWithDetails]:
+    rows = await get_archived_rows(session, "animal_health_log", animal, start, end)
+    users = await get_users_by_ids(session, {row["logged_by"] for row in rows})
+    return [
+        AnimalHealthLogWithDetails(
+            log=AnimalHealthLog(**row), animal=animal, user=users[row["logged_by"]]
+        )
+        for row in rows
+        if row["logged_by"] in users
+    ]
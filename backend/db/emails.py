@@ -0,0 +1,46 @@
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import update
+from sqlmodel import col, select
+
+from models import EmailOutbox
+
+
+def queue_email(session, to: str, template: str, **context) -> EmailOutbox:
+    """Add an email to the outbox, it is sent once the caller's session commits."""
+    email = EmailOutbox(to=to, template=template, context=context)  # type: ignore
+    session.add(email)
+    return email
+
+
+async def claim_emails(session, limit: int, lease: timedelta) -> list[EmailOutbox]:
+    """
+    Take up to `limit` due emails and push their next attempt out by `lease`,
+    so a worker that dies mid-send leaves them to be retried instead of lost.
+    """
+    now = datetime.now(UTC)
+    due = (
+        select(EmailOutbox.id)
+        .where(
+            EmailOutbox.status == "pending",
+            col(EmailOutbox.next_attempt_at) <= now,
+        )
+        .order_by(col(EmailOutbox.next_attempt_at))
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    emails = await session.execute(
+        update(EmailOutbox)
+        .where(col(EmailOutbox.id).in_(due))
+        .values(attempts=col(EmailOutbox.attempts) + 1, next_attempt_at=now + lease)
+        .returning(EmailOutbox)
+        .execution_options(synchronize_session=False)
+    )
+    emails = list(emails.scalars())
+    await session.commit()
+    return emails
+
+
+def retry_delay(attempts: int) -> timedelta:
+    # 30s, 1m, 2m, 4m ... capped at an hour
+    return timedelta(seconds=min(30 * 2 ** (attempts - 1), 3600))
@@ -0,0 +1,250 @@
+"""
+Bulk event import.
+
+The whole batch is validated before anything is written: lookups are one
+query each, and clashes are found with a sweep over every animal's intervals
+sorted by start, the imported events together with the ones already in the
+database, which are loaded with a single range query. Everything is then
+inserted in one transaction.
+"""
+
+import csv
+import io
+import re
+from collections import defaultdict
+from datetime import timedelta
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlmodel import and_, col, select
+
+from core.utils import as_utc
+from db.animals import log_audit
+from db.series import get_occurrences
+from models import (
+    Animal,
+    AnimalEvent,
+    Event,
+    EventImportResult,
+    EventType,
+    ImportRowError,
+    User,
+    UserEvent,
+)
+from schemas import ImportedEvent
+
+CSV_COLUMNS = [
+    "name",
+    "description",
+    "start_at",
+    "end_at",
+    "event_type_id",
+    "animal_ids",
+    "user_ids",
+]
+
+
+def parse_events_csv(
+    data: bytes,
+) -> tuple[list[ImportedEvent], list[ImportRowError]]:
+    """
+    Rows of a csv with CSV_COLUMNS as its header, ids in a cell separated by
+    spaces, commas or semicolons.
+    """
+    reader = csv.DictReader(io.StringIO(data.decode("utf-8-sig")))
+    missing = set(CSV_COLUMNS[:5]) - set(reader.fieldnames or [])
+    if missing:
+        return [], [
+            ImportRowError(
+                row=0, errors=[f"Missing columns: {', '.join(sorted(missing))}"]
+            )
+        ]
+
+    events, errors = [], []
+    for row, record in enumerate(reader, start=1):
+        for column in ("animal_ids", "user_ids"):
+            record[column] = [
+                value
+                for value in re.split(r"[\s,;]+", record.get(column) or "")
+                if value
+            ]
+        try:
+            events.append(ImportedEvent.model_validate(record))
+        except ValidationError as error:
+            errors.append(
+                ImportRowError(
+                    row=row,
+                    errors=[
+                        f"{'.'.join(map(str, issue['loc']))}: {issue['msg']}"
+                        for issue in error.errors()
+                    ],
+                )
+            )
+    return events, errors
+
+
+def find_clashes(intervals: list[tuple], errors: dict[int, list[str]], names: dict):
+    """
+    Sweep over (animal id, start, end, row, label) intervals, row is None for
+    an event already in the database or a series occurrence, named by label.
+    Sorted by start, an interval clashes with an earlier one exactly when it
+    starts before the latest end so far, so only that one has to be kept;
+    clashes between two existing events are not the import's business.
+    """
+    latest = None
+    for interval in sorted(intervals, key=lambda interval: interval[:3]):
+        animal_id, start, end, row, label = interval
+        if latest is None or latest[0] != animal_id:
+            latest = interval
+            continue
+
+        # inclusive like validate_event_clashes, back to back events clash too
+        if start <= latest[2]:
+            other = f"row {latest[3]}" if latest[3] else latest[4]
+            if row:
+                errors[row].append(f"Animal {names[animal_id]} clashes with {other}")
+            elif latest[3]:
+                errors[latest[3]].append(
+                    f"Animal {names[animal_id]} clashes with {label}"
+                )
+
+        if end > latest[2]:
+            latest = interval
+
+
+async def validate_import(
+    session, zoo_id: int, events: list[ImportedEvent]
+) -> list[ImportRowError]:
+    errors: dict[int, list[str]] = defaultdict(list)
+
+    event_types = set(
+        await session.exec(select(EventType.id).where(EventType.zoo_id == zoo_id))
+    )
+    user_ids = {user_id for event in events for user_id in event.user_ids}
+    users = set(await session.exec(select(User.id).where(col(User.id).in_(user_ids))))
+    animal_ids = {animal_id for event in events for animal_id in event.animal_ids}
+    names = dict(
+        await session.exec(
+            select(Animal.id, Animal.name).where(
+                col(Animal.id).in_(animal_ids), Animal.zoo_id == zoo_id
+            )
+        )
+    )
+
+    intervals = []
+    for row, event in enumerate(events, start=1):
+        start, end = as_utc(event.start_at), as_utc(event.end_at)
+        if end < start:
+            errors[row].append("Event end time must be after its start time")
+        if event.event_type_id not in event_types:
+            errors[row].append("Event type not found for this zoo")
+        for user_id in event.user_ids:
+            if user_id not in users:
+                errors[row].append(f"User {user_id} not found")
+        for animal_id in dict.fromkeys(event.animal_ids):
+            if animal_id not in names:
+                errors[row].append(f"Animal {animal_id} not found")
+            elif start <= end:
+                intervals.append((animal_id, start, end, row, None))
+
+    if intervals:
+        first = min(interval[1] for interval in intervals)
+        last = max(interval[2] for interval in intervals)
+        # every unfinished participation of these animals around the batch
+        existing = await session.exec(
+            select(AnimalEvent.animal_id, Event.start_at, Event.end_at, Event.id)
+            .join(Event, col(Event.id) == AnimalEvent.event_id)
+            .where(
+                and_(
+                    Event.zoo_id == zoo_id,
+                    Event.start_at <= last,
+                    Event.end_at >= first,
+                    col(AnimalEvent.animal_id).in_(names),
+                    col(AnimalEvent.checked_in).is_(None),
+                )
+            )
+        )
+        intervals.extend(
+            (animal_id, as_utc(start), as_utc(end), None, f"event {event_id}")
+            for animal_id, start, end, event_id in existing
+        )
+        occurrences = await get_occurrences(
+            session,
+            first - timedelta(microseconds=1),
+            last + timedelta(microseconds=1),
+            zoo_id=zoo_id,
+            overlapping=True,
+            animal_ids=list(names),
+        )
+        intervals.extend(
+            (
+                animal_id,
+                event.start_at,
+                event.end_at,
+                None,
+                f"series {series.id} at {event.start_at.isoformat()}",
+            )
+            for event, series in occurrences
+            for animal_id in series.animal_ids
+            if animal_id in names
+        )
+        find_clashes(intervals, errors, names)
+
+    return [ImportRowError(row=row, errors=errors[row]) for row in sorted(errors)]
+
+
+def raise_row_errors(errors: list[ImportRowError]):
+    if errors:
+        raise HTTPException(
+            status_code=400, detail=[error.model_dump() for error in errors]
+        )
+
+
+async def import_events(
+    session,
+    zoo_id: int,
+    events: list[ImportedEvent],
+    current_user: User,
+    dry_run: bool = False,
+) -> EventImportResult:
+    """
+    Insert the events and their links in one transaction, nothing at all
+    unless every row is valid.
+    """
+    raise_row_errors(await validate_import(session, zoo_id, events))
+    if dry_run:
+        return EventImportResult(event_ids=[])
+
+    user_id = current_user.id
+    description = f"{current_user.first_name} {current_user.last_name} ({current_user.role.name}) added animal to event"
+
+    created = [
+        Event(
+            **event.model_dump(exclude={"animal_ids", "user_ids"}),
+            zoo_id=zoo_id,
+        )
+        for event in events
+    ]
+    session.add_all(created)
+    # one multi row insert, ids come back for the links
+    await session.flush()
+
+    for event, imported in zip(created, events, strict=True):
+        session.add_all(
+            UserEvent(user_id=id, event_id=event.id, assigner_id=user_id)  # type: ignore
+            for id in dict.fromkeys(imported.user_ids)
+        )
+        for id in dict.fromkeys(imported.animal_ids):
+            session.add(AnimalEvent(animal_id=id, event_id=event.id))  # type: ignore
+            await log_audit(
+                session=session,
+                animal_id=id,
+                changed_by=user_id,
+                action="event_participation_added",
+                commit=False,
+                description=f"{description} '{event.name}'",
+            )
+
+    event_ids = [event.id for event in created]
+    await session.commit()
+    return EventImportResult(event_ids=event_ids)
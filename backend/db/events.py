@@ -1,25 +1,45 @@
-from sqlalchemy.orm import joinedload
-from sqlmodel import col, select
+from datetime import date, datetime, timedelta
 
+import sqlalchemy as sa
+from sqlalchemy import ColumnElement, func, literal_column
+from sqlalchemy.dialects.postgresql import JSON, aggregate_order_by
+from sqlalchemy.orm import noload
+from sqlmodel import SQLModel, col, select
+
+from db.series import get_occurrences
 from models import (
+    Animal,
     AnimalEvent,
     AnimalEventWithDetails,
+    CalendarAnimal,
+    CalendarDay,
+    CalendarEvent,
     Event,
     EventComment,
     EventCommentWithUser,
+    EventType,
     EventWithDetailsAndComments,
+    User,
     UserEvent,
     UserEventWithDetails,
+    UserPublic,
+    Zoo,
 )
 
 
-async def get_all_events(session, zoo_id: int | None = None) -> list[Event]:
+def get_events_query(
+    zoo_id: int | None = None,
+    from_: datetime | None = None,
+    to: datetime | None = None,
+):
+    query = select(Event)
     if zoo_id:
-        events = await session.exec(select(Event).where(Event.zoo_id == zoo_id))
-    else:
-        events = await session.exec(select(Event))
-
-    return events.all()
+        query = query.where(Event.zoo_id == zoo_id)
+    if from_:
+        query = query.where(Event.start_at >= from_)
+    if to:
+        query = query.where(Event.start_at < to)
+    return query
 
 
 async def get_event_by_id(id: int, session) -> Event | None:
@@ -27,60 +47,239 @@ async def get_event_by_id(id: int, session) -> Event | None:
     return event
 
 
-async def get_events_details(session, events: list[Event]):
-    event_ids = [event.id for event in events]
+def _json_object(model: type[SQLModel], entity) -> ColumnElement:
+    pairs = []
+    for name in model.model_fields:
+        column = getattr(entity, name)
+        # intervals are sent as seconds, which pydantic reads back as timedelta
+        if isinstance(column.type, sa.Interval):
+            column = func.extract("epoch", column)
+        pairs.extend([sa.literal_column(f"'{name}'"), column])
+    return func.json_build_object(*pairs)
+
+
+def _json_agg(first: str, first_object, second: str, second_object, order_by):
+    item = func.json_build_object(
+        sa.literal_column(f"'{first}'"),
+        first_object,
+        sa.literal_column(f"'{second}'"),
+        second_object,
+    )
+    return func.coalesce(
+        func.json_agg(aggregate_order_by(item, order_by)),
+        sa.text("'[]'::json"),
+        type_=JSON,
+    )
+
+
+def _event_animals_json():
+    return (
+        select(
+            _json_agg(
+                "animal_event",
+                _json_object(AnimalEvent, AnimalEvent),
+                "animal",
+                _json_object(Animal, Animal),
+                col(AnimalEvent.id),
+            )
+        )
+        .select_from(AnimalEvent)
+        .join(Animal, col(Animal.id) == col(AnimalEvent.animal_id))
+        .where(col(AnimalEvent.event_id) == col(Event.id))
+        .correlate(Event)
+        .scalar_subquery()
+    )
+
 
-    event_animal_details = await session.exec(
-        select(AnimalEvent)
-        .where(col(AnimalEvent.event_id).in_(event_ids))
-        .options(
-            joinedload(AnimalEvent.animal),  # type: ignore
+def _event_users_json():
+    return (
+        select(
+            _json_agg(
+                "user_event",
+                _json_object(UserEvent, UserEvent),
+                "user",
+                _json_object(UserPublic, User),
+                col(UserEvent.id),
+            )
         )
+        .select_from(UserEvent)
+        .join(User, col(User.id) == col(UserEvent.user_id))
+        .where(col(UserEvent.event_id) == col(Event.id))
+        .correlate(Event)
+        .scalar_subquery()
     )
-    event_animal_details = list(event_animal_details.unique())
 
-    event_user_details = await session.exec(
-        select(UserEvent)
-        .where(col(UserEvent.event_id).in_(event_ids))
-        .options(
-            joinedload(UserEvent.user),  # type: ignore
+
+def _event_comments_json():
+    return (
+        select(
+            _json_agg(
+                "comment",
+                _json_object(EventComment, EventComment),
+                "user",
+                _json_object(UserPublic, User),
+                col(EventComment.created_at),
+            )
         )
+        .select_from(EventComment)
+        .join(User, col(User.id) == col(EventComment.user_id))
+        .where(col(EventComment.event_id) == col(Event.id))
+        .correlate(Event)
+        .scalar_subquery()
     )
-    event_user_details = list(event_user_details.unique())
 
-    events_comments = await session.exec(
-        select(EventComment)
-        .where(col(EventComment.event_id).in_(event_ids))
-        .options(
-            joinedload(EventComment.user)  # type: ignore
+
+async def get_events_details(session, *criteria) -> list[EventWithDetailsAndComments]:
+    """
+    Load the events matching `criteria` with their animals, handlers and
+    comments already nested by PostgreSQL (json_agg over correlated
+    subqueries), so a page of event details costs a single round trip.
+    """
+    query = (
+        select(
+            Event,
+            EventType,
+            Zoo,
+            _event_animals_json(),
+            _event_users_json(),
+            _event_comments_json(),
         )
+        .join(EventType, col(EventType.id) == col(Event.event_type_id))
+        .join(Zoo, col(Zoo.id) == col(Event.zoo_id))
+        .where(*criteria)
+        .order_by(col(Event.start_at), col(Event.id))
+        .options(noload(Event.event_type))  # type: ignore
     )
-    events_comments = list(events_comments.unique())
 
     events_with_details: list[EventWithDetailsAndComments] = []
-    for event in events:
+    for event, event_type, zoo, animals, users, comments in await session.exec(query):
         event_details = EventWithDetailsAndComments(
             event=event,
             animals=[
                 AnimalEventWithDetails(
-                    animal_event=animal_event, animal=animal_event.animal
+                    animal_event=AnimalEvent.model_validate(item["animal_event"]),
+                    animal=Animal.model_validate(item["animal"]),
                 )
-                for animal_event in event_animal_details
-                if animal_event.event_id == event.id
+                for item in animals
             ],
             users=[
-                UserEventWithDetails(user_event=user_event, user=user_event.user)
-                for user_event in event_user_details
-                if user_event.event_id == event.id
+                UserEventWithDetails(
+                    user_event=UserEvent.model_validate(item["user_event"]),
+                    user=UserPublic.model_validate(item["user"]),
+                )
+                for item in users
             ],
             comments=[
-                EventCommentWithUser(user=event_comment.user, comment=event_comment)
-                for event_comment in events_comments
-                if event_comment.event_id == event.id
+                EventCommentWithUser(
+                    comment=EventComment.model_validate(item["comment"]),
+                    user=UserPublic.model_validate(item["user"]),
+                )
+                for item in comments
             ],
-            event_type=event.event_type,
-            zoo=event.zoo,
+            event_type=event_type,
+            zoo=zoo,
         )
         events_with_details.append(event_details)
 
     return events_with_details
+
+
+def overlaps_period(start: datetime, end: datetime):
+    # served by the GiST index on tstzrange(start_at, end_at, '[]'), closed so
+    # that events with start_at == end_at aren't empty ranges matching nothing
+    # inline, the expression has to match the index's exactly
+    bounds = literal_column("'[]'")
+    return func.tstzrange(col(Event.start_at), col(Event.end_at), bounds).op("&&")(
+        func.tstzrange(start, end)
+    )
+
+
+async def get_calendar_events(
+    session, start: datetime, end: datetime, zoo_id: int | None = None
+) -> list[CalendarEvent]:
+    query = (
+        select(Event, AnimalEvent.animal_id)
+        .outerjoin(AnimalEvent)
+        .where(overlaps_period(start, end))
+        .order_by(col(Event.start_at), col(Event.id))
+        .options(noload(Event.event_type))  # type: ignore
+    )
+    if zoo_id:
+        query = query.where(Event.zoo_id == zoo_id)
+
+    calendar: dict[int, CalendarEvent] = {}
+    for event, animal_id in await session.exec(query):
+        item = calendar.setdefault(event.id, CalendarEvent(event=event, animal_ids=[]))
+        if animal_id is not None:
+            item.animal_ids.append(animal_id)
+
+    occurrences = [
+        CalendarEvent(event=event, animal_ids=series.animal_ids)
+        for event, series in await get_occurrences(
+            session, start, end, zoo_id=zoo_id, overlapping=True
+        )
+    ]
+    return sorted(
+        [*calendar.values(), *occurrences],
+        key=lambda item: (item.event.start_at, item.event.id or 0),
+    )
+
+
+async def get_calendar_summary(
+    session, start: datetime, end: datetime, zoo_id: int | None = None
+) -> list[CalendarDay]:
+    query = (
+        select(Event.id, Event.start_at, Event.end_at, Animal.id, Animal.name)
+        .outerjoin(AnimalEvent, col(AnimalEvent.event_id) == col(Event.id))
+        .outerjoin(Animal, col(Animal.id) == col(AnimalEvent.animal_id))
+        .where(overlaps_period(start, end))
+    )
+    if zoo_id:
+        query = query.where(Event.zoo_id == zoo_id)
+
+    days: dict[date, tuple[set, dict[int, str]]] = {
+        start.date() + timedelta(days=i): (set(), {}) for i in range((end - start).days)
+    }
+
+    rows = list(await session.exec(query))
+
+    # occurrences of series are counted by their series and start
+    occurrences = await get_occurrences(
+        session, start, end, zoo_id=zoo_id, overlapping=True
+    )
+    animal_ids = {id for _, series in occurrences for id in series.animal_ids}
+    names = {}
+    if animal_ids:
+        names = dict(
+            await session.exec(
+                select(Animal.id, Animal.name).where(col(Animal.id).in_(animal_ids))
+            )
+        )
+    for event, series in occurrences:
+        key = (series.id, event.occurrence_start)
+        if not series.animal_ids:
+            rows.append((key, event.start_at, event.end_at, None, None))
+        for animal_id in series.animal_ids:
+            if animal_id in names:
+                rows.append(
+                    (key, event.start_at, event.end_at, animal_id, names[animal_id])
+                )
+
+    for event_id, start_at, end_at, animal_id, animal_name in rows:
+        first = max(start_at, start).date()
+        # an event ending exactly at midnight does not occupy the next day
+        last = max(first, (min(end_at, end) - timedelta(microseconds=1)).date())
+        for i in range((last - first).days + 1):
+            event_ids, animals = days[first + timedelta(days=i)]
+            event_ids.add(event_id)
+            if animal_id is not None:
+                animals[animal_id] = animal_name
+
+    return [
+        CalendarDay(
+            day=day,
+            event_count=len(event_ids),
+            animals=[CalendarAnimal(id=id, name=name) for id, name in animals.items()],
+        )
+        for day, (event_ids, animals) in days.items()
+    ]
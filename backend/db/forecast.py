@@ -0,0 +1,136 @@
+"""
+Availability forecast for every animal of a zoo over a time window.
+
+Time is cut into fixed steps and the whole zoo is one animals x steps grid:
+scheduled events and rest periods are painted with difference arrays, daily
+checkout counts and hours are running sums per day, so the cost is a handful
+of numpy passes no matter how many animals or events there are.
+"""
+
+from datetime import UTC, datetime, timedelta
+
+from sqlmodel import select
+
+from core.utils import as_utc
+from db.planning import get_commitments
+from models import Animal, AnimalForecast, ForecastPeriod
+
+# state codes, a higher one wins when several apply to the same step
+FORECAST_STATES = ["available", "limit_reached", "resting", "scheduled", "unavailable"]
+
+DAY = timedelta(days=1)
+
+
+async def forecast_availability(
+    session, zoo_id: int, start: datetime, end: datetime, step: timedelta
+) -> list[AnimalForecast]:
+    import numpy as np
+
+    start, end = as_utc(start), as_utc(end)
+    # the grid starts a whole day early, so rest and daily caps carry over
+    grid_start = datetime.combine(start.date() - DAY, datetime.min.time(), UTC)
+    days = (end - grid_start + DAY - timedelta(microseconds=1)) // DAY
+    steps_per_day = DAY // step
+    steps = days * steps_per_day
+
+    animals = list(
+        await session.exec(
+            select(
+                Animal.id,
+                Animal.name,
+                Animal.status,
+                Animal.handling_enabled,
+                Animal.rest_time,
+                Animal.max_daily_checkouts,
+                Animal.max_daily_checkout_hours,
+            )
+            .where(Animal.zoo_id == zoo_id)
+            .order_by(Animal.id)
+        )
+    )
+    if not animals:
+        return []
+    row = {animal.id: index for index, animal in enumerate(animals)}
+    rest = np.array([animal.rest_time * 3600 for animal in animals])
+
+    commitments = [
+        (row[animal_id], begin, finish)
+        for animal_id, begin, finish in await get_commitments(
+            session, zoo_id, grid_start, grid_start + days * DAY
+        )
+        if animal_id in row
+    ]
+
+    step_seconds = step.total_seconds()
+    origin = grid_start.timestamp()
+    rows = np.array([commitment[0] for commitment in commitments], dtype=int)
+    begins = np.array([c[1].timestamp() - origin for c in commitments])
+    finishes = np.array([c[2].timestamp() - origin for c in commitments])
+
+    def cell(seconds, round_up=False):
+        cells = np.ceil(seconds / step_seconds) if round_up else seconds // step_seconds
+        return np.clip(cells, 0, steps).astype(int)
+
+    def paint(first, last):
+        # +1 where a period starts, -1 after it ends, running sum > 0 inside
+        marks = np.zeros((len(animals), steps + 1))
+        np.add.at(marks, (rows, first), 1)
+        np.add.at(marks, (rows, last), -1)
+        return np.cumsum(marks[:, :steps], axis=1) > 0
+
+    first_cell = cell(begins)
+    scheduled = paint(first_cell, cell(finishes, round_up=True))
+    resting = paint(cell(finishes), cell(finishes + rest[rows], round_up=True))
+
+    # checkouts and hours so far that day, both counted when a checkout starts
+    counts = np.zeros((len(animals), steps))
+    hours = np.zeros((len(animals), steps))
+    starts_in_grid = first_cell < steps
+    np.add.at(counts, (rows[starts_in_grid], first_cell[starts_in_grid]), 1)
+    np.add.at(
+        hours,
+        (rows[starts_in_grid], first_cell[starts_in_grid]),
+        ((finishes - begins) / 3600)[starts_in_grid],
+    )
+    shape = (len(animals), days, steps_per_day)
+    counts = np.cumsum(counts.reshape(shape), axis=2).reshape(len(animals), steps)
+    hours = np.cumsum(hours.reshape(shape), axis=2).reshape(len(animals), steps)
+
+    max_checkouts = np.array([animal.max_daily_checkouts for animal in animals])
+    max_hours = np.array([animal.max_daily_checkout_hours for animal in animals])
+    limit_reached = (counts >= max_checkouts[:, None]) | (hours >= max_hours[:, None])
+    unavailable = np.array(
+        [
+            animal.status == "unavailable" or not animal.handling_enabled
+            for animal in animals
+        ]
+    )
+
+    states = np.select(
+        [unavailable[:, None], scheduled, resting, limit_reached],
+        [4, 3, 2, 1],
+        default=0,
+    )
+
+    # only the requested window is returned, as runs of the same state
+    first = int((start - grid_start) // step)
+    last = int(-(-(end - grid_start) // step))
+    states = states[:, first:last]
+
+    forecasts = []
+    for animal, states_row in zip(animals, states, strict=True):
+        changes = np.flatnonzero(np.diff(states_row)) + 1
+        bounds = [0, *changes.tolist(), len(states_row)]
+        periods = [
+            ForecastPeriod(
+                start=max(start, grid_start + (first + begin) * step),
+                end=min(end, grid_start + (first + finish) * step),
+                state=FORECAST_STATES[states_row[begin]],
+            )
+            for begin, finish in zip(bounds, bounds[1:], strict=False)
+        ]
+        forecasts.append(
+            AnimalForecast(animal_id=animal.id, name=animal.name, periods=periods)
+        )
+
+    return forecasts
@@ -0,0 +1,110 @@
+"""
+Per-animal history stream.
+
+Audits, health logs and event participations are read through server side
+cursors, each already in time order from its index, and merged k-way as they
+are consumed, so memory stays at a few batches however long the history is.
+"""
+
+import heapq
+import json
+from typing import AsyncIterator
+
+from sqlmodel import asc, col, desc, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.db import engine
+from db.utils import SortOrder
+from models import AnimalAudit, AnimalEvent, AnimalHealthLog, Event
+
+# rows fetched per cursor round trip
+HISTORY_BATCH = 500
+
+
+def history_queries(animal_id: int, order: SortOrder) -> dict:
+    direction = desc if order == "desc" else asc
+    return {
+        "audit": select(
+            col(AnimalAudit.changed_at).label("at"),
+            AnimalAudit.id,
+            AnimalAudit.action,
+            AnimalAudit.changed_field,
+            AnimalAudit.old_value,
+            AnimalAudit.new_value,
+            AnimalAudit.description,
+            AnimalAudit.changed_by,
+        )
+        .where(AnimalAudit.animal_id == animal_id)
+        .order_by(direction(AnimalAudit.changed_at), direction(AnimalAudit.id)),
+        "health_log": select(
+            col(AnimalHealthLog.logged_at).label("at"),
+            AnimalHealthLog.id,
+            AnimalHealthLog.details,
+            AnimalHealthLog.logged_by,
+        )
+        .where(AnimalHealthLog.animal_id == animal_id)
+        .order_by(direction(AnimalHealthLog.logged_at), direction(AnimalHealthLog.id)),
+        "event": select(
+            col(Event.start_at).label("at"),
+            AnimalEvent.id,
+            AnimalEvent.event_id,
+            Event.name,
+            Event.start_at,
+            Event.end_at,
+            AnimalEvent.checked_out,
+            AnimalEvent.checked_in,
+            AnimalEvent.user_out_id,
+            AnimalEvent.user_in_id,
+        )
+        .join(Event, col(Event.id) == AnimalEvent.event_id)
+        .where(AnimalEvent.animal_id == animal_id)
+        .order_by(direction(Event.start_at), direction(AnimalEvent.id)),
+    }
+
+
+async def merge_sorted(
+    streams: dict[str, AsyncIterator], order: SortOrder
+) -> AsyncIterator[dict]:
+    """k-way merge of row streams that are each sorted by (at, id) in `order`."""
+    sign = -1 if order == "desc" else 1
+
+    def key(row) -> tuple[float, int]:
+        at = row.at.timestamp() if row.at else 0.0
+        return sign * at, sign * row.id
+
+    # one head per stream, the index keeps ties between streams stable
+    heap = []
+    for index, (kind, stream) in enumerate(streams.items()):
+        row = await anext(stream, None)
+        if row is not None:
+            heap.append((key(row), index, kind, row))
+    heapq.heapify(heap)
+
+    iterators = list(streams.values())
+    while heap:
+        _, index, kind, row = heap[0]
+        yield {"type": kind, **row._asdict()}
+
+        following = await anext(iterators[index], None)
+        if following is None:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (key(following), index, kind, following))
+
+
+async def stream_animal_history(
+    animal_id: int, order: SortOrder = "desc"
+) -> AsyncIterator[bytes]:
+    """The animal's history as NDJSON lines."""
+    # its own session, the request's one is closed once streaming starts
+    async with AsyncSession(engine) as session:
+        streams = {}
+        for kind, query in history_queries(animal_id, order).items():
+            result = await session.stream(
+                query.execution_options(yield_per=HISTORY_BATCH)
+            )
+            streams[kind] = aiter(result)
+
+        async for item in merge_sorted(streams, order):
+            line = json.dumps(item, default=lambda value: value.isoformat())
+            yield f"{line}\n".encode()
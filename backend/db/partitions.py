@@ -0,0 +1,157 @@
+"""
+Monthly range partitions of animal_audit.
+
+Partitions are named animal_audit_YYYY_MM and hold [month, next month) in
+UTC. animal_audit_default catches anything outside them; future months are
+created ahead of time so it normally stays empty, rows that land there while
+their month is missing are moved once it is created.
+"""
+
+import re
+from datetime import UTC, date, datetime, time
+
+import sqlalchemy as sa
+
+AUDIT_TABLE = "animal_audit"
+DEFAULT_PARTITION = f"{AUDIT_TABLE}_default"
+
+PARTITION_NAME = re.compile(rf"^{AUDIT_TABLE}_(\d{{4}})_(\d{{2}})$")
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{AUDIT_TABLE}_{month:%Y_%m}"
+
+
+def partition_month(name: str) -> date | None:
+    match = PARTITION_NAME.match(name)
+    return date(int(match[1]), int(match[2]), 1) if match else None
+
+
+async def get_audit_partitions(session) -> list[str]:
+    result = await session.execute(
+        sa.text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = CAST(:table AS regclass) "
+            "ORDER BY child.relname"
+        ),
+        {"table": AUDIT_TABLE},
+    )
+    return list(result.scalars())
+
+
+async def create_audit_partition(session, month: date, has_default: bool) -> None:
+    name = partition_name(month)
+    bounds = {
+        "start": datetime.combine(month, time(), UTC),
+        "end": datetime.combine(add_months(month, 1), time(), UTC),
+    }
+    in_range = "changed_at >= :start AND changed_at < :end"
+
+    # Postgres won't create a partition for rows the default one holds, so
+    # those move over with the default detached, all in the caller's transaction
+    stranded = has_default and await session.scalar(
+        sa.text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_range})"),
+        bounds,
+    )
+    if stranded:
+        await session.execute(
+            sa.text(f"ALTER TABLE {AUDIT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}")
+        )
+
+    await session.execute(
+        sa.text(
+            f"CREATE TABLE {name} PARTITION OF {AUDIT_TABLE} "
+            f"FOR VALUES FROM ('{month} 00:00+00') "
+            f"TO ('{add_months(month, 1)} 00:00+00')"
+        )
+    )
+
+    if stranded:
+        await session.execute(
+            sa.text(
+                f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE {in_range}"
+            ),
+            bounds,
+        )
+        await session.execute(
+            sa.text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_range}"), bounds
+        )
+        await session.execute(
+            sa.text(
+                f"ALTER TABLE {AUDIT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"
+            )
+        )
+
+
+async def create_audit_partitions(session, start: date, end: date) -> list[str]:
+    """Create the missing monthly partitions from `start` to `end` inclusive."""
+    existing = set(await get_audit_partitions(session))
+    created = []
+
+    month = start.replace(day=1)
+    while month <= end:
+        name = partition_name(month)
+        if name not in existing:
+            await create_audit_partition(
+                session, month, has_default=DEFAULT_PARTITION in existing
+            )
+            created.append(name)
+        month = add_months(month, 1)
+
+    await session.commit()
+    return created
+
+
+async def drop_foreign_keys(session, table: str) -> None:
+    result = await session.execute(
+        sa.text(
+            "SELECT conname FROM pg_constraint "
+            "WHERE conrelid = CAST(:table AS regclass) AND contype = 'f'"
+        ),
+        {"table": table},
+    )
+    for constraint in result.scalars().all():
+        await session.execute(
+            sa.text(f'ALTER TABLE {table} DROP CONSTRAINT "{constraint}"')
+        )
+
+
+async def detach_old_audit_partitions(
+    session, retention_months: int, archive_schema: str = ""
+) -> list[str]:
+    """
+    Detach the partitions that ended more than `retention_months` ago and move
+    them to `archive_schema` without their foreign keys, or drop them when no
+    schema is given.
+    """
+    oldest_kept = add_months(datetime.now(UTC).date().replace(day=1), -retention_months)
+    if archive_schema:
+        await session.execute(sa.text(f"CREATE SCHEMA IF NOT EXISTS {archive_schema}"))
+
+    detached = []
+    for name in await get_audit_partitions(session):
+        month = partition_month(name)
+        if month is None or month >= oldest_kept:
+            continue
+
+        await session.execute(
+            sa.text(f"ALTER TABLE {AUDIT_TABLE} DETACH PARTITION {name}")
+        )
+        if archive_schema:
+            # cold history must not block deleting its animals and users
+            await drop_foreign_keys(session, name)
+            await session.execute(
+                sa.text(f"ALTER TABLE {name} SET SCHEMA {archive_schema}")
+            )
+        else:
+            await session.execute(sa.text(f"DROP TABLE {name}"))
+        detached.append(name)
+
+    await session.commit()
+    return detached
@@ -1,11 +1,12 @@
-from typing import Literal, get_args
+from typing import Iterable, Literal, get_args
 
 from psycopg2 import IntegrityError
 from sqlmodel import col, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from core.db import engine
-from models import Permission
+from models import Permission, Role, RolePermission, User
+from schemas import Principal
 
 PermissionType = Literal[
     "create_events",
@@ -38,6 +39,14 @@ PermissionType = Literal[
 
 permission_names = get_args(PermissionType)
 
+# a role's permissions compiled into an int, bit i set for permission_names[i]
+PERMISSION_BITS: dict[str, int] = {
+    name: 1 << bit for bit, name in enumerate(permission_names)
+}
+
+# role id -> (permission mask, permissions), shared by every request
+_role_permissions: dict[int, tuple[int, list[Permission]]] = {}
+
 
 async def create_permissions() -> None:
     async with AsyncSession(engine) as session:
@@ -67,5 +76,44 @@ async def get_permissions(
     return list(permissions.all())
 
 
-def has_permission(user_permissions: list[Permission], permission: PermissionType):
-    return any(p.name == permission for p in user_permissions)
+def permission_mask(names: Iterable[str]) -> int:
+    mask = 0
+    for name in names:
+        mask |= PERMISSION_BITS.get(name, 0)
+    return mask
+
+
+async def load_role_permissions(session) -> None:
+    """(Re)build the permissions cache of every role, call it when roles change."""
+    rows = await session.exec(
+        select(Role.id, Permission.id, Permission.name)
+        .join(RolePermission, isouter=True)
+        .join(Permission, isouter=True)
+        .order_by(col(Role.id), col(Permission.id))
+    )
+
+    roles: dict[int, list[Permission]] = {}
+    for role_id, permission_id, name in rows:
+        permissions = roles.setdefault(role_id, [])
+        if permission_id is not None:
+            permissions.append(Permission(id=permission_id, name=name))
+
+    _role_permissions.clear()
+    for role_id, permissions in roles.items():
+        mask = permission_mask(permission.name for permission in permissions)
+        _role_permissions[role_id] = (mask, permissions)
+
+
+async def ensure_role_permissions(session, role_id: int) -> None:
+    # roles created by another worker are picked up the first time they're seen
+    if role_id not in _role_permissions:
+        await load_role_permissions(session)
+
+
+def get_role_permissions(role_id: int) -> list[Permission]:
+    return _role_permissions.get(role_id, (0, []))[1]
+
+
+def has_permission(user: User | Principal, permission: PermissionType) -> bool:
+    mask, _ = _role_permissions.get(user.role_id, (0, []))
+    return bool(mask & PERMISSION_BITS[permission])
@@ -0,0 +1,130 @@
+import asyncio
+from datetime import UTC, datetime, timedelta
+
+from sqlmodel import col, select
+
+from core.planning import AnimalSchedule, Planner, Slot
+from core.utils import as_utc
+from db.events import overlaps_period
+from models import Animal, AnimalEvent, Event, EventPlan, PlannedAssignment
+from schemas import PlanRequest
+
+# commitments this far around the planned events still matter, for rest
+# time and for the daily caps of the days they fall on
+PLANNING_MARGIN = timedelta(days=1)
+
+
+async def get_plannable_animals(session, zoo_id: int) -> list:
+    animals = await session.exec(
+        select(
+            Animal.id,
+            Animal.name,
+            Animal.species,
+            Animal.tier,
+            Animal.rest_time,
+            Animal.max_daily_checkouts,
+            Animal.max_daily_checkout_hours,
+        ).where(
+            Animal.zoo_id == zoo_id,
+            col(Animal.handling_enabled).is_(True),
+            # marked unavailable by an admin, not by its schedule
+            col(Animal.status) != "unavailable",
+        )
+    )
+    return list(animals)
+
+
+async def get_commitments(
+    session, zoo_id: int, start: datetime, end: datetime
+) -> list[tuple[int, datetime, datetime]]:
+    """
+    (animal id, start, end) of every event an animal of the zoo is part of in
+    [start, end): actual times once checked in, scheduled ones until then.
+    """
+    rows = await session.exec(
+        select(
+            AnimalEvent.animal_id,
+            Event.start_at,
+            Event.end_at,
+            AnimalEvent.checked_out,
+            AnimalEvent.checked_in,
+        )
+        .join(Event, col(Event.id) == AnimalEvent.event_id)
+        .where(Event.zoo_id == zoo_id, overlaps_period(start, end))
+    )
+
+    now = datetime.now(UTC)
+    commitments = []
+    for animal_id, start_at, end_at, checked_out, checked_in in rows:
+        if checked_in:
+            commitments.append((animal_id, checked_out or start_at, checked_in))
+        elif checked_out:
+            # still out, busy at least until now
+            commitments.append((animal_id, checked_out, max(end_at, now)))
+        else:
+            commitments.append((animal_id, start_at, end_at))
+    return commitments
+
+
+async def plan_event_assignments(
+    session, body: PlanRequest, max_tier: int
+) -> EventPlan:
+    started = datetime.now(UTC)
+    periods = [(as_utc(event.start_at), as_utc(event.end_at)) for event in body.events]
+
+    animals = await get_plannable_animals(session, body.zoo_id)
+    commitments = await get_commitments(
+        session,
+        body.zoo_id,
+        min(start for start, _ in periods) - PLANNING_MARGIN,
+        max(end for _, end in periods) + PLANNING_MARGIN,
+    )
+
+    schedules = {
+        animal.id: AnimalSchedule(
+            animal.id,
+            timedelta(hours=animal.rest_time),
+            animal.max_daily_checkouts,
+            timedelta(hours=animal.max_daily_checkout_hours),
+        )
+        for animal in animals
+    }
+    for animal_id, start, end in commitments:
+        if animal_id in schedules:
+            schedules[animal_id].add(start, end)
+
+    slots = []
+    for index, (event, (start, end)) in enumerate(
+        zip(body.events, periods, strict=True)
+    ):
+        tier = min(max_tier, event.max_tier or max_tier)
+        species = event.species.lower() if event.species else None
+        allowed = set(event.animal_ids) if event.animal_ids else None
+        candidates = [
+            animal.id
+            for animal in animals
+            if animal.tier <= tier
+            and (not species or animal.species.lower() == species)
+            and (allowed is None or animal.id in allowed)
+        ]
+        slots.append(Slot(index, start, end, event.count, candidates))
+
+    planner = Planner(schedules, slots)
+    complete = await asyncio.to_thread(
+        planner.solve, timedelta(milliseconds=body.budget_ms)
+    )
+
+    return EventPlan(
+        assignments=[
+            PlannedAssignment(
+                name=event.name,
+                start_at=slot.start,
+                end_at=slot.end,
+                animal_ids=sorted(slot.assigned),
+                missing=slot.missing,
+            )
+            for event, slot in zip(body.events, slots, strict=True)
+        ],
+        complete=complete,
+        elapsed_ms=(datetime.now(UTC) - started).total_seconds() * 1000,
+    )
@@ -3,7 +3,12 @@ from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from core.db import engine
-from db.permissions import PermissionType, get_permissions, permission_names
+from db.permissions import (
+    PermissionType,
+    get_permissions,
+    load_role_permissions,
+    permission_names,
+)
 from models import Role
 
 
@@ -25,6 +30,30 @@ async def create_role(session, name: str, permission_names: list[PermissionType]
     except IntegrityError:
         await session.rollback()
 
+    await load_role_permissions(session)
+
+
+BASIC_ROLES: dict[str, list[PermissionType]] = {
+    "admin": list(permission_names),
+    "moderator": [
+        "view_animals",
+        "view_events",
+        "create_events",
+        "update_events",
+        "delete_events",
+        "update_animals",
+        "delete_animals",
+    ],
+    "handler": [
+        "view_animals",
+        "checkout_animals",
+        "checkin_animals",
+        "view_events",
+        "add_animal_health_log",
+    ],
+    "visitor": ["view_animals", "view_events"],
+}
+
 
 async def create_basic_roles():
     async with AsyncSession(engine) as session:
@@ -32,29 +61,5 @@ async def create_basic_roles():
         if admin_exists:
             return
 
-        await create_role(session, "admin", permission_names=list(permission_names))
-        await create_role(
-            session,
-            "moderator",
-            [
-                "view_animals",
-                "view_events",
-                "create_events",
-                "update_events",
-                "delete_events",
-                "update_animals",
-                "delete_animals",
-            ],
-        )
-        await create_role(
-            session,
-            "handler",
-            [
-                "view_animals",
-                "checkout_animals",
-                "checkin_animals",
-                "view_events",
-                "add_animal_health_log",
-            ],
-        )
-        await create_role(session, "visitor", ["view_animals", "view_events"])
+        for name, role_permissions in BASIC_ROLES.items():
+            await create_role(session, name, role_permissions)
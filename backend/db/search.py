@@ -0,0 +1,88 @@
+"""
+Full-text search over the generated search_vector columns (models.add_search_vector).
+
+Every search type is one ranked query against a GIN index, scoped by zoo and
+paged by keyset on (rank, id).
+"""
+
+from typing import Literal
+
+import sqlalchemy as sa
+from sqlalchemy import func
+from sqlmodel import col, select
+
+from models import Animal, AnimalHealthLog, Event, EventComment
+
+SearchType = Literal["animals", "health_logs", "comments"]
+
+LANGUAGE = sa.literal_column("'english'::regconfig")
+
+HEADLINE_OPTIONS = "MaxFragments=2, MaxWords=20, MinWords=5, StartSel=<b>, StopSel=</b>"
+
+
+def search_query(search_type: SearchType, text: str, zoo_id: int | None):
+    """
+    The select for `text` with its rank and id columns to page on, rows carry
+    the SearchHit fields. Results of zoo_id=None span every zoo.
+    """
+    tsquery = func.websearch_to_tsquery(LANGUAGE, text)
+
+    if search_type == "animals":
+        vector = Animal.__table__.c.search_vector  # type: ignore
+        document = func.coalesce(Animal.description, Animal.species)
+        columns = [
+            sa.literal("animal").label("type"),
+            col(Animal.id).label("id"),
+            col(Animal.name).label("title"),
+            col(Animal.id).label("animal_id"),
+            sa.null().label("event_id"),
+            col(Animal.updated_at).label("at"),
+        ]
+        query = select(*columns).select_from(Animal)
+        id_column = col(Animal.id)
+        zoo_column = Animal.zoo_id
+    elif search_type == "health_logs":
+        vector = AnimalHealthLog.__table__.c.search_vector  # type: ignore
+        document = AnimalHealthLog.details
+        columns = [
+            sa.literal("health_log").label("type"),
+            col(AnimalHealthLog.id).label("id"),
+            col(Animal.name).label("title"),
+            col(AnimalHealthLog.animal_id).label("animal_id"),
+            sa.null().label("event_id"),
+            col(AnimalHealthLog.logged_at).label("at"),
+        ]
+        query = (
+            select(*columns)
+            .select_from(AnimalHealthLog)
+            .join(Animal, col(Animal.id) == AnimalHealthLog.animal_id)
+        )
+        id_column = col(AnimalHealthLog.id)
+        zoo_column = Animal.zoo_id
+    else:
+        vector = EventComment.__table__.c.search_vector  # type: ignore
+        document = EventComment.comment
+        columns = [
+            sa.literal("comment").label("type"),
+            col(EventComment.id).label("id"),
+            col(Event.name).label("title"),
+            sa.null().label("animal_id"),
+            col(EventComment.event_id).label("event_id"),
+            col(EventComment.created_at).label("at"),
+        ]
+        query = (
+            select(*columns)
+            .select_from(EventComment)
+            .join(Event, col(Event.id) == EventComment.event_id)
+        )
+        id_column = col(EventComment.id)
+        zoo_column = Event.zoo_id
+
+    rank = func.ts_rank_cd(vector, tsquery, type_=sa.Float)
+    headline = func.ts_headline(LANGUAGE, document, tsquery, HEADLINE_OPTIONS)
+
+    query = query.add_columns(rank.label("rank"), headline.label("headline")).where(
+        vector.op("@@")(tsquery),
+        zoo_column == zoo_id if zoo_id else True,
+    )
+    return query, rank, id_column
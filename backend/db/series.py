@@ -0,0 +1,290 @@
+"""
+Recurring events.
+
+Occurrences of a series are expanded from its rule only for the window a
+query asks for and returned as transient Event objects (no id, with series_id
+and occurrence_start set), minus cancelled ones and those that already exist
+as rows. An occurrence becomes a real Event with its animal and user links
+once it is checked out or edited, through materialize_occurrence, so storage
+and clash checks only ever see occurrences something happened to.
+"""
+
+import bisect
+from datetime import datetime, timedelta
+from itertools import islice
+
+from fastapi import HTTPException
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import col, or_, select
+
+from core.recurrence import build_rule, is_occurrence, occurrences_between
+from core.utils import as_utc
+from db.utils import SortOrder, decode_cursor
+from models import Animal, AnimalEvent, Event, EventSeries, User, UserEvent
+
+# a rule with an end is expanded once to store its last occurrence
+MAX_SERIES_OCCURRENCES = 10_000
+
+# a new series without an end is checked for clashes this far ahead, later
+# occurrences when they are materialized
+CLASH_HORIZON = timedelta(days=366)
+
+
+def series_until(series: EventSeries) -> datetime | None:
+    """Start of the last occurrence of a series, None when it never ends."""
+    rule = build_rule(series.rrule, series.start_at, series.timezone)
+    if rule._count is None and rule._until is None:
+        return None
+    occurrences = list(islice(rule, MAX_SERIES_OCCURRENCES + 1))
+    if len(occurrences) > MAX_SERIES_OCCURRENCES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A series can't have more than {MAX_SERIES_OCCURRENCES} occurrences, leave its end open instead",
+        )
+    if not occurrences:
+        raise HTTPException(status_code=400, detail="The rule has no occurrences")
+    return as_utc(occurrences[-1])
+
+
+def occurrence_event(series: EventSeries, start: datetime) -> Event:
+    return Event(
+        name=series.name,
+        description=series.description,
+        start_at=start,
+        end_at=start + (series.end_at - series.start_at),
+        event_type_id=series.event_type_id,
+        zoo_id=series.zoo_id,
+        series_id=series.id,
+        occurrence_start=start,
+    )  # type: ignore
+
+
+async def get_occurrences(
+    session,
+    start: datetime,
+    end: datetime,
+    zoo_id: int | None = None,
+    overlapping: bool = False,
+    animal_ids: list[int] | None = None,
+) -> list[tuple[Event, EventSeries]]:
+    """
+    Occurrences that are not rows yet starting in [start, end), or with
+    `overlapping` all of those overlapping it, by start. With `animal_ids`
+    only of series involving any of those animals.
+    """
+    until = col(EventSeries.until)
+    last_end = until + (col(EventSeries.end_at) - col(EventSeries.start_at))
+    query = select(EventSeries).where(
+        EventSeries.start_at < end,
+        or_(until.is_(None), last_end > start if overlapping else until >= start),
+    )
+    if zoo_id:
+        query = query.where(EventSeries.zoo_id == zoo_id)
+    if animal_ids is not None:
+        query = query.where(col(EventSeries.animal_ids).overlap(animal_ids))
+    all_series = list(await session.exec(query))
+    if not all_series:
+        return []
+
+    longest = max(series.end_at - series.start_at for series in all_series)
+    lower = start - longest if overlapping else start
+    # occurrences already materialized, wherever they were moved to since
+    materialized = set(
+        await session.exec(
+            select(Event.series_id, Event.occurrence_start).where(
+                col(Event.series_id).in_([series.id for series in all_series]),
+                col(Event.occurrence_start) >= lower,
+                col(Event.occurrence_start) < end,
+            )
+        )
+    )
+
+    occurrences = []
+    for series in all_series:
+        duration = series.end_at - series.start_at
+        rule = build_rule(series.rrule, series.start_at, series.timezone)
+        cancelled = set(series.exdates)
+        first = start - duration + timedelta(microseconds=1) if overlapping else start
+        for occurrence in occurrences_between(rule, first, end):
+            if occurrence in cancelled or (series.id, occurrence) in materialized:
+                continue
+            occurrences.append((occurrence_event(series, occurrence), series))
+
+    occurrences.sort(key=lambda item: item[0].start_at)
+    return occurrences
+
+
+async def validate_series_clashes(session, series: EventSeries) -> None:
+    """
+    Occurrences of a new series must not clash with unfinished events of its
+    animals or occurrences of other series, inclusive like
+    validate_event_clashes.
+    """
+    if not series.animal_ids:
+        return
+
+    duration = series.end_at - series.start_at
+    start = as_utc(series.start_at)
+    end = series.until + duration if series.until else start + CLASH_HORIZON
+    rule = build_rule(series.rrule, series.start_at, series.timezone)
+    starts = occurrences_between(rule, start, end + timedelta(microseconds=1))
+
+    rows = await session.exec(
+        select(AnimalEvent.animal_id, Event.start_at, Event.end_at)
+        .join(Event, col(Event.id) == AnimalEvent.event_id)
+        .where(
+            Event.zoo_id == series.zoo_id,
+            Event.start_at <= end,
+            Event.end_at >= start,
+            col(AnimalEvent.animal_id).in_(series.animal_ids),
+            col(AnimalEvent.checked_in).is_(None),
+        )
+    )
+    busy = [
+        (animal_id, as_utc(begin), as_utc(until)) for animal_id, begin, until in rows
+    ]
+    occurrences = await get_occurrences(
+        session,
+        start - timedelta(microseconds=1),
+        end + timedelta(microseconds=1),
+        zoo_id=series.zoo_id,
+        overlapping=True,
+        animal_ids=series.animal_ids,
+    )
+    busy.extend(
+        (animal_id, event.start_at, event.end_at)
+        for event, other in occurrences
+        for animal_id in set(other.animal_ids) & set(series.animal_ids)
+    )
+
+    clashing = set()
+    for animal_id, busy_start, busy_end in busy:
+        # the first occurrence ending at or after busy_start
+        index = bisect.bisect_left(starts, busy_start - duration)
+        if index < len(starts) and starts[index] <= busy_end:
+            clashing.add(animal_id)
+
+    if clashing:
+        names = list(
+            await session.exec(select(Animal.name).where(col(Animal.id).in_(clashing)))
+        )
+        raise HTTPException(
+            status_code=400,
+            detail=f"Animal{'' if len(names) == 1 else 's'} {', '.join(names)} {'is' if len(names) == 1 else 'are'} already assigned to an event during an occurrence of this series",
+        )
+
+
+async def get_series(session, series_id: int) -> EventSeries:
+    series = await session.get(EventSeries, series_id)
+    if not series:
+        raise HTTPException(status_code=404, detail="Event series not found")
+    return series
+
+
+def validate_occurrence(series: EventSeries, start: datetime) -> datetime:
+    start = as_utc(start)
+    rule = build_rule(series.rrule, series.start_at, series.timezone)
+    if start in series.exdates or not is_occurrence(rule, start):
+        raise HTTPException(status_code=404, detail="Occurrence not found")
+    return start
+
+
+async def get_materialized(session, series_id: int, start: datetime) -> Event | None:
+    events = await session.exec(
+        select(Event).where(
+            Event.series_id == series_id, Event.occurrence_start == start
+        )
+    )
+    return events.first()
+
+
+async def materialize_occurrence(session, series_id: int, start: datetime) -> Event:
+    """The occurrence as an Event row with its links, created on first use."""
+    series = await get_series(session, series_id)
+    start = validate_occurrence(series, start)
+
+    event = occurrence_event(series, start)
+    # a concurrent request may be materializing the same occurrence
+    inserted = await session.execute(
+        insert(Event)
+        .values(event.model_dump(exclude={"id", "created_at", "updated_at"}))
+        .on_conflict_do_nothing(index_elements=["series_id", "occurrence_start"])
+        .returning(col(Event.id))
+    )
+    event_id = inserted.scalar()
+    if event_id is None:
+        await session.rollback()
+        return await get_materialized(session, series_id, start)  # type: ignore
+
+    # animals and handlers may have moved on since the series was created
+    animal_ids = list(
+        await session.exec(
+            select(Animal.id).where(
+                col(Animal.id).in_(series.animal_ids), Animal.zoo_id == series.zoo_id
+            )
+        )
+    )
+    # the series was only checked so far ahead and events may have been added
+    # since; the row just inserted keeps the occurrence from clashing with
+    # itself. Imported here, db.animals reads occurrences from this module
+    from db.animals import validate_event_clashes
+
+    await validate_event_clashes(
+        animal_ids, event.end_at, event.start_at, series.zoo_id, session, event_id
+    )
+    user_ids = await session.exec(
+        select(User.id).where(col(User.id).in_(series.user_ids))
+    )
+    session.add_all(
+        AnimalEvent(animal_id=animal_id, event_id=event_id)  # type: ignore
+        for animal_id in animal_ids
+    )
+    session.add_all(
+        UserEvent(user_id=user_id, event_id=event_id, assigner_id=series.created_by)  # type: ignore
+        for user_id in user_ids
+    )
+    await session.commit()
+
+    return await session.get(Event, event_id)  # type: ignore
+
+
+def cancel_occurrence(series: EventSeries, start: datetime) -> None:
+    # assigned anew, in place changes of an ARRAY are not tracked
+    series.exdates = sorted({*series.exdates, as_utc(start)})
+
+
+async def get_page_occurrences(
+    session,
+    start: datetime,
+    end: datetime,
+    zoo_id: int | None,
+    order: SortOrder,
+    cursor: str | None,
+    last_start: datetime | None,
+) -> list[tuple[Event, EventSeries]]:
+    """
+    Occurrences that belong on a page of events sorted by start: past the
+    cursor and up to `last_start`, the page's last event unless it is the last
+    page, so every occurrence shows up on exactly one page.
+    """
+    after = decode_cursor(cursor, col(Event.start_at))[0] if cursor else None
+    occurrences = await get_occurrences(session, start, end, zoo_id=zoo_id)
+    if order == "desc":
+        occurrences.reverse()
+        return [
+            (event, series)
+            for event, series in occurrences
+            if (after is None or event.start_at < after)
+            and (last_start is None or event.start_at >= last_start)
+        ]
+    return [
+        (event, series)
+        for event, series in occurrences
+        if (after is None or event.start_at > after)
+        and (last_start is None or event.start_at <= last_start)
+    ]
+
+
+def merge_by_start(rows: list, occurrences: list, order: SortOrder, key) -> list:
+    # stable, so rows keep their id order among equal starts
+    return sorted([*rows, *occurrences], key=key, reverse=order == "desc")
@@ -0,0 +1,105 @@
+import hashlib
+import time
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.config import settings
+from core.db import engine
+from db.permissions import permission_names
+from models import TokenRevocation, User
+from schemas import Principal
+
+# claims signed under a different permission bit layout are not trusted
+_layout = ",".join(permission_names).encode()
+PERMISSIONS_VERSION = hashlib.sha256(_layout).hexdigest()[:12]
+
+# revocations commit a little after their revoked_at, re-read this far back
+SYNC_OVERLAP = timedelta(minutes=1)
+
+# user id -> lowest token version still valid, mirrors token_revocation
+_versions: dict[int, int] = {}
+_synced_at = 0.0
+_last_revoked_at: datetime | None = None
+
+
+def token_claims(user: User, version: int) -> dict:
+    return {
+        "sub": user.username,
+        "uid": user.id,
+        "rid": user.role_id,
+        "role": user.role.name,
+        "tier": user.tier,
+        "zoo": user.zoo_id,
+        "ver": version,
+        "pv": PERMISSIONS_VERSION,
+    }
+
+
+def principal_from_claims(payload: dict) -> tuple[Principal, int] | None:
+    """The principal and token version, None for tokens without usable claims."""
+    if payload.get("pv") != PERMISSIONS_VERSION or "uid" not in payload:
+        return None
+
+    principal = Principal(
+        id=payload["uid"],
+        username=payload["sub"],
+        role_id=payload["rid"],
+        role=payload["role"],
+        tier=payload["tier"],
+        zoo_id=payload["zoo"],
+    )
+    return principal, payload["ver"]
+
+
+async def get_token_version(session, user_id: int) -> int:
+    revocation = await session.get(TokenRevocation, user_id)
+    return revocation.version if revocation else 0
+
+
+async def revoke_tokens(session, user_id: int) -> None:
+    """
+    Invalidate the claims of every token issued to the user so far, e.g. after
+    a role or tier change. Takes effect when the caller's session commits.
+    """
+    now = datetime.now(UTC)
+    version = await session.scalar(
+        insert(TokenRevocation)
+        .values(user_id=user_id, version=1, revoked_at=now)
+        .on_conflict_do_update(
+            index_elements=[col(TokenRevocation.user_id)],
+            set_={"version": col(TokenRevocation.version) + 1, "revoked_at": now},
+        )
+        .returning(col(TokenRevocation.version))
+    )
+    _versions[user_id] = version
+
+
+async def sync_revocations() -> None:
+    global _last_revoked_at
+
+    query = select(TokenRevocation)
+    if _last_revoked_at:
+        query = query.where(
+            col(TokenRevocation.revoked_at) > _last_revoked_at - SYNC_OVERLAP
+        )
+
+    async with AsyncSession(engine) as session:
+        for revocation in await session.exec(query):
+            version = _versions.get(revocation.user_id, 0)
+            _versions[revocation.user_id] = max(version, revocation.version)
+            if not _last_revoked_at or revocation.revoked_at > _last_revoked_at:
+                _last_revoked_at = revocation.revoked_at
+
+
+async def is_revoked(user_id: int, version: int) -> bool:
+    global _synced_at
+
+    # at most one query per refresh interval, no matter how many requests
+    if time.monotonic() - _synced_at > settings.TOKEN_REVOCATION_REFRESH:
+        _synced_at = time.monotonic()
+        await sync_revocations()
+
+    return version < _versions.get(user_id, 0)
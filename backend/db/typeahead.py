@@ -0,0 +1,81 @@
+"""
+Trigram typeahead for the handler and animal pickers.
+
+Matches are substrings (or, for typos, close words) of the USER_TYPEAHEAD and
+ANIMAL_TYPEAHEAD expressions, both answered by their pg_trgm GIN index, and
+only the columns a picker shows are selected.
+"""
+
+import sqlalchemy as sa
+from sqlalchemy import func
+from sqlmodel import col, select
+
+from models import (
+    ANIMAL_TYPEAHEAD,
+    USER_TYPEAHEAD,
+    Animal,
+    AnimalSuggestion,
+    Role,
+    User,
+    UserSuggestion,
+)
+
+HANDLER_ROLES = ["admin", "moderator", "handler"]
+
+
+def matches(document, text: str):
+    # `<%` is pg_trgm's word similarity, it forgives typos like "lepord"
+    return sa.or_(
+        document.icontains(text, autoescape=True),
+        sa.literal(text).op("<%")(document),
+    )
+
+
+async def suggest_users(
+    session,
+    text: str,
+    limit: int,
+    zoo_id: int | None = None,
+    handlers_only: bool = False,
+) -> list[UserSuggestion]:
+    document = sa.literal_column(f"({USER_TYPEAHEAD})", sa.String)
+    query = (
+        select(
+            User.id,
+            User.first_name,
+            User.last_name,
+            User.username,
+            User.image,
+            User.role_id,
+        )
+        .where(
+            matches(document, text),
+            User.zoo_id == zoo_id if zoo_id else True,
+            col(User.role_id).in_(
+                select(Role.id).where(col(Role.name).in_(HANDLER_ROLES))
+            )
+            if handlers_only
+            else True,
+        )
+        .order_by(func.word_similarity(text, document).desc(), col(User.id))
+        .limit(limit)
+    )
+    users = await session.exec(query)
+    return [UserSuggestion.model_validate(user._mapping) for user in users]
+
+
+async def suggest_animals(
+    session, text: str, limit: int, zoo_id: int | None = None
+) -> list[AnimalSuggestion]:
+    document = sa.literal_column(f"({ANIMAL_TYPEAHEAD})", sa.String)
+    query = (
+        select(Animal.id, Animal.name, Animal.species, Animal.image, Animal.status)
+        .where(
+            matches(document, text),
+            Animal.zoo_id == zoo_id if zoo_id else True,
+        )
+        .order_by(func.word_similarity(text, document).desc(), col(Animal.id))
+        .limit(limit)
+    )
+    animals = await session.exec(query)
+    return [AnimalSuggestion.model_validate(animal._mapping) for animal in animals]
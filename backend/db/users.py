@@ -1,8 +1,16 @@
+import secrets
+from datetime import UTC, datetime, timedelta
+
 from fastapi import HTTPException
+from sqlalchemy import delete
+from sqlalchemy.orm import lazyload
 from sqlmodel import col, select
 
+from core.security import hash_token
 from db.permissions import has_permission
-from models import User, UserEvent
+from models import PasswordResetToken, User, UserEvent
+
+RESET_TOKEN_TTL = timedelta(hours=2)
 
 
 async def get_user_by_email(email: str, session) -> User | None:
@@ -20,6 +28,16 @@ async def get_user_by_username(username: str, session) -> User | None:
     return user
 
 
+async def get_users_by_ids(session, user_ids: set[int]) -> dict[int, User]:
+    """Users by id without their role, zoo and group, for public user maps."""
+    if not user_ids:
+        return {}
+    users = await session.exec(
+        select(User).where(col(User.id).in_(user_ids)).options(lazyload("*"))
+    )
+    return {user.id: user for user in users}
+
+
 async def validate_users(user_ids: list[int], session) -> list[User]:
     users = (
         await session.exec(select(User).where(col(User.id).in_(user_ids)))
@@ -31,7 +49,7 @@ async def validate_users(user_ids: list[int], session) -> list[User]:
 
 
 async def validate_check_in_out_permissions(current_user: User, event_id: int, session):
-    if not has_permission(current_user.role.permissions, "checkin_animals"):
+    if not has_permission(current_user, "checkin_animals"):
         raise HTTPException(
             status_code=401, detail="You are not authorized to perform this action"
         )
@@ -50,3 +68,46 @@ async def validate_check_in_out_permissions(current_user: User, event_id: int, s
             )
 
     return True
+
+
+def create_reset_token(session, user_id: int) -> str:
+    """Returns the raw token to email, only its digest is stored."""
+    token = secrets.token_urlsafe(32)
+    reset_token = PasswordResetToken(
+        token_hash=hash_token(token),
+        user_id=user_id,
+        expires_at=datetime.now(UTC) + RESET_TOKEN_TTL,
+    )  # type: ignore
+    session.add(reset_token)
+    return token
+
+
+async def consume_reset_token(session, token: str) -> PasswordResetToken | None:
+    """Delete and return the token in one statement, so it can only be used once."""
+    result = await session.execute(
+        delete(PasswordResetToken)
+        .where(col(PasswordResetToken.token_hash) == hash_token(token))
+        .returning(PasswordResetToken)
+        .execution_options(synchronize_session=False)
+    )
+    return result.scalars().first()
+
+
+async def purge_expired_reset_tokens(session, batch_size: int = 1000) -> int:
+    """Delete expired tokens in batches, committing each, returns how many."""
+    purged = 0
+    while True:
+        expired = (
+            select(PasswordResetToken.id)
+            .where(col(PasswordResetToken.expires_at) < datetime.now(UTC))
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        result = await session.execute(
+            delete(PasswordResetToken).where(col(PasswordResetToken.id).in_(expired))
+        )
+        await session.commit()
+
+        purged += result.rowcount
+        if result.rowcount < batch_size:
+            return purged
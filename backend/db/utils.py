@@ -0,0 +1,95 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Literal
+
+import sqlalchemy as sa
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+from sqlmodel import asc, desc
+
+SortOrder = Literal["asc", "desc"]
+
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(value: Any, id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str, sort_column) -> tuple[Any, int]:
+    try:
+        value, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if value is not None and isinstance(sort_column.type, sa.DateTime):
+            value = datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return value, int(id)
+
+
+async def paginate(
+    session,
+    query,
+    sort_column,
+    id_column,
+    order: SortOrder = "asc",
+    limit: int | None = None,
+    cursor: str | None = None,
+    key: Callable[[Any], tuple[Any, int]] | None = None,
+) -> tuple[list, str | None]:
+    """
+    Keyset pagination over (sort_column, id_column).
+
+    The id column breaks ties so the ordering is stable, and the cursor holds
+    the sort key of the last returned row, so every page is a single index
+    range scan no matter how deep the client has paged.
+    """
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort_column)
+        row_key = sa.tuple_(sort_column, id_column)
+        last_key = sa.tuple_(sa.literal(value, sort_column.type), last_id)
+        query = query.where(
+            row_key < last_key if order == "desc" else row_key > last_key
+        )
+
+    direction = desc if order == "desc" else asc
+    query = query.order_by(direction(sort_column), direction(id_column))
+
+    if limit:
+        # fetch one extra row to know whether there is a next page
+        query = query.limit(limit + 1)
+
+    rows = list((await session.exec(query)).unique())
+
+    if not limit or len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    if key is None:
+        last = rows[-1]
+        value, last_id = getattr(last, sort_column.key), last.id
+    else:
+        value, last_id = key(rows[-1])
+
+    return rows, encode_cursor(value, last_id)
+
+
+async def estimate_count(session, query) -> int:
+    """
+    Row estimate from the planner instead of an exact COUNT(*), so asking for a
+    total never costs a full scan of the filtered table.
+    """
+    compiled = (
+        query.order_by(None)
+        .limit(None)
+        .compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    )
+    plan = (
+        await session.execute(sa.text(f"EXPLAIN (FORMAT JSON) {compiled}"))
+    ).scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
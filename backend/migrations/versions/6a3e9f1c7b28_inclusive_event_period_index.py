@@ -0,0 +1,30 @@
+"""inclusive event period index
+
+Revision ID: 6a3e9f1c7b28
+Revises: 5f2d8e6a4b17
+Create Date: 2026-10-20 09:14:52.318406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a3e9f1c7b28'
+down_revision: Union[str, None] = '5f2d8e6a4b17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # closed ranges, a zero-length event is a point instead of an empty range
+    op.drop_index('ix_event_period', table_name='event', postgresql_using='gist')
+    op.create_index('ix_event_period', 'event', [sa.text("tstzrange(start_at, end_at, '[]')")], unique=False, postgresql_using='gist')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_event_period', table_name='event', postgresql_using='gist')
+    op.create_index('ix_event_period', 'event', [sa.text('tstzrange(start_at, end_at)')], unique=False, postgresql_using='gist')
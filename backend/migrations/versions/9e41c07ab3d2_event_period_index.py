@@ -0,0 +1,28 @@
+"""event period index
+
+Revision ID: 9e41c07ab3d2
+Revises: 5b2d8e71c4a9
+Create Date: 2026-10-19 11:03:27.904615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e41c07ab3d2'
+down_revision: Union[str, None] = '5b2d8e71c4a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # GiST index used by the calendar's range overlap (&&) predicate
+    op.create_index('ix_event_period', 'event', [sa.text('tstzrange(start_at, end_at)')], unique=False, postgresql_using='gist')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_event_period', table_name='event', postgresql_using='gist')
@@ -0,0 +1,98 @@
+"""partition animal audit
+
+Revision ID: f3c8b2e71d05
+Revises: e5b19f7a3c42
+Create Date: 2026-10-19 18:02:41.527310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c8b2e71d05'
+down_revision: Union[str, None] = 'e5b19f7a3c42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # partition bounds are whole months in UTC
+    op.execute("SET LOCAL TIME ZONE 'UTC'")
+    op.rename_table('animal_audit', 'animal_audit_unpartitioned')
+    op.execute('ALTER TABLE animal_audit_unpartitioned RENAME CONSTRAINT animal_audit_pkey TO animal_audit_unpartitioned_pkey')
+    op.execute('ALTER SEQUENCE animal_audit_id_seq OWNED BY NONE')
+
+    op.execute("""
+        CREATE TABLE animal_audit (
+            id INTEGER NOT NULL DEFAULT nextval('animal_audit_id_seq'),
+            animal_id INTEGER NOT NULL REFERENCES animal (id),
+            changed_field VARCHAR,
+            old_value VARCHAR,
+            new_value VARCHAR,
+            description VARCHAR,
+            action VARCHAR NOT NULL,
+            changed_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            changed_by INTEGER NOT NULL REFERENCES "user" (id),
+            CONSTRAINT animal_audit_pkey PRIMARY KEY (id, changed_at)
+        ) PARTITION BY RANGE (changed_at)
+    """)
+    op.execute('ALTER SEQUENCE animal_audit_id_seq OWNED BY animal_audit.id')
+    op.execute('CREATE TABLE animal_audit_default PARTITION OF animal_audit DEFAULT')
+
+    # one partition per month from the oldest row up to three months ahead,
+    # later months are created by the maintenance loop
+    op.execute("""
+        DO $$
+        DECLARE
+            month DATE := date_trunc('month', COALESCE((SELECT min(changed_at) FROM animal_audit_unpartitioned), now()));
+        BEGIN
+            WHILE month <= date_trunc('month', now() + INTERVAL '3 months') LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF animal_audit FOR VALUES FROM (%L) TO (%L)',
+                    'animal_audit_' || to_char(month, 'YYYY_MM'),
+                    month::timestamptz,
+                    (month + INTERVAL '1 month')::timestamptz
+                );
+                month := month + INTERVAL '1 month';
+            END LOOP;
+        END $$
+    """)
+
+    op.execute("""
+        INSERT INTO animal_audit
+        SELECT id, animal_id, changed_field, old_value, new_value, description, action, COALESCE(changed_at, now()), changed_by
+        FROM animal_audit_unpartitioned
+    """)
+    op.drop_table('animal_audit_unpartitioned')
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_index('ix_animal_audit_animal_id_changed_at', 'animal_audit', ['animal_id', 'changed_at'], unique=False)
+    op.create_index('ix_animal_audit_changed_at', 'animal_audit', ['changed_at'], unique=False)
+    # ### end Alembic commands ###
+
+
+def downgrade() -> None:
+    # rows in detached or archived partitions are not brought back
+    op.rename_table('animal_audit', 'animal_audit_partitioned')
+    op.execute('ALTER SEQUENCE animal_audit_id_seq OWNED BY NONE')
+    op.create_table('animal_audit',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('animal_audit_id_seq')"), nullable=False),
+    sa.Column('animal_id', sa.Integer(), nullable=False),
+    sa.Column('changed_field', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('old_value', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('new_value', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('description', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('action', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('changed_at', sa.TIMESTAMP(timezone=True), nullable=True),
+    sa.Column('changed_by', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['animal_id'], ['animal.id'], ),
+    sa.ForeignKeyConstraint(['changed_by'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute('ALTER SEQUENCE animal_audit_id_seq OWNED BY animal_audit.id')
+    op.execute('INSERT INTO animal_audit SELECT * FROM animal_audit_partitioned')
+    # dropping the parent drops every attached partition with it
+    op.drop_table('animal_audit_partitioned')
@@ -1,9 +1,10 @@
-from datetime import UTC, datetime, timedelta
+from datetime import UTC, date, datetime, timedelta
 from typing import Literal
 
 import sqlalchemy as sa
 from pydantic import BaseModel
 from sqlalchemy import Index
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
 from sqlalchemy.types import TIMESTAMP
 from sqlmodel import Field, Relationship, SQLModel
 
@@ -51,15 +52,59 @@ class PasswordResetToken(SQLModel, table=True):
     __tablename__ = "password_reset_token"  # type: ignore
 
     id: int = Field(primary_key=True)
-    token: str
+    token_hash: str = Field(max_length=64, unique=True)  # sha256 hex digest
     user_id: int = Field(foreign_key="user.id")
     expires_at: datetime = Field(
         sa_column=sa.Column(
             type_=TIMESTAMP(timezone=True),
+            index=True,
         )
     )
 
 
+class TokenRevocation(SQLModel, table=True):
+    """Tokens of `user_id` issued with a lower version than this are revoked."""
+
+    __tablename__ = "token_revocation"  # type: ignore
+
+    # no foreign key, the row has to outlive a deleted user's tokens
+    user_id: int = Field(primary_key=True)
+    version: int = Field(default=1)
+    revoked_at: datetime = Field(
+        sa_column=sa.Column(type_=TIMESTAMP(timezone=True), index=True)
+    )
+
+
+class EmailOutbox(SQLModel, table=True):
+    __tablename__ = "email_outbox"  # type: ignore
+    __table_args__ = (
+        Index(
+            "ix_email_outbox_due",
+            "next_attempt_at",
+            postgresql_where=sa.text("status = 'pending'"),
+        ),
+    )
+
+    id: int = Field(primary_key=True)
+    to: str
+    template: str
+    context: dict = Field(default_factory=dict, sa_column=sa.Column(sa.JSON))
+    status: str = Field(default="pending")  # pending, sent or failed
+    attempts: int = Field(default=0)
+    last_error: str | None = Field(default=None)
+    next_attempt_at: datetime = Field(
+        sa_column=sa.Column(
+            default=lambda: datetime.now(UTC),
+            type_=TIMESTAMP(timezone=True),
+        )
+    )
+    sent_at: datetime | None = Field(
+        default=None, sa_column=sa.Column(type_=TIMESTAMP(timezone=True))
+    )
+
+    created_at: datetime = created_at_field()
+
+
 class Zoo(SQLModel, table=True):
     id: int = Field(primary_key=True)
     name: str = Field(max_length=255)
@@ -102,6 +147,12 @@ class GroupWithZoo(GroupPublic):
     zoo: Zoo | None = None
 
 
+# the text typeahead matches against, the trigram indexes are on these exact
+# expressions so queries have to use them verbatim (db/typeahead.py)
+USER_TYPEAHEAD = "first_name || ' ' || last_name || ' ' || username || ' ' || email"
+ANIMAL_TYPEAHEAD = "name || ' ' || species"
+
+
 class UserPublic(SQLModel):
     id: int = Field(primary_key=True)
     email: str = Field(unique=True)
@@ -137,6 +188,15 @@ class User(UserPublic, table=True):
     health_logs: list["AnimalHealthLog"] = Relationship(back_populates="user")
     events_link: list["UserEvent"] = Relationship(back_populates="user")
 
+    __table_args__ = (
+        Index("ix_user_created_at_id", "created_at", "id"),
+        Index(
+            "ix_user_typeahead",
+            sa.text(f"({USER_TYPEAHEAD}) gin_trgm_ops"),
+            postgresql_using="gin",
+        ),
+    )
+
 
 class UserWithDetails(UserPublic):
     role: RoleWithPermissions | None = None
@@ -146,6 +206,7 @@ class UserWithDetails(UserPublic):
 
 class AnimalEvent(SQLModel, table=True):
     __tablename__ = "animal_event"  # type: ignore
+    __table_args__ = (Index("ix_animal_event_animal_id", "animal_id"),)
 
     id: int = Field(primary_key=True)
 
@@ -233,6 +294,15 @@ class Animal(AnimalIn, table=True):
     audits: list["AnimalAudit"] = Relationship(back_populates="animal")
     health_logs: list["AnimalHealthLog"] = Relationship(back_populates="animal")
 
+    __table_args__ = (
+        Index("ix_animal_zoo_id_updated_at_id", "zoo_id", "updated_at", "id"),
+        Index(
+            "ix_animal_typeahead",
+            sa.text(f"({ANIMAL_TYPEAHEAD}) gin_trgm_ops"),
+            postgresql_using="gin",
+        ),
+    )
+
 
 class EventTypeIn(SQLModel):
     name: str
@@ -282,6 +352,17 @@ class Event(EventIn, table=True):
     created_at: datetime = created_at_field()
     updated_at: datetime = updated_at_field()
 
+    # set on occurrences of a series once they are materialized
+    series_id: int | None = Field(
+        default=None,
+        sa_column=sa.Column(
+            sa.Integer, sa.ForeignKey("event_series.id", ondelete="SET NULL")
+        ),
+    )
+    occurrence_start: datetime | None = Field(
+        default=None, sa_column=sa.Column(type_=TIMESTAMP(timezone=True))
+    )
+
     event_type: EventType = Relationship(
         back_populates="events", sa_relationship_kwargs={"lazy": "selectin"}
     )
@@ -291,6 +372,65 @@ class Event(EventIn, table=True):
     comments: list["EventComment"] = Relationship(back_populates="event")
     users_link: list["UserEvent"] = Relationship(back_populates="event")
 
+    __table_args__ = (
+        Index("ix_event_start_at_id", "start_at", "id"),
+        Index("ix_event_zoo_id_start_at", "zoo_id", "start_at"),
+        Index(
+            "ix_event_period",
+            sa.text("tstzrange(start_at, end_at, '[]')"),
+            postgresql_using="gist",
+        ),
+        Index(
+            "ix_event_series_id_occurrence_start",
+            "series_id",
+            "occurrence_start",
+            unique=True,
+        ),
+    )
+
+
+class EventSeriesIn(SQLModel):
+    name: str
+    description: str
+    # the first occurrence, its length is every occurrence's length
+    start_at: datetime = Field(sa_column=sa.Column(type_=TIMESTAMP(timezone=True)))
+    end_at: datetime = Field(sa_column=sa.Column(type_=TIMESTAMP(timezone=True)))
+    rrule: str  # RFC 5545, e.g. "FREQ=DAILY;BYDAY=MO,TU,WE,TH,FR"
+    timezone: str = "UTC"  # the rule is expanded in local time of this zone
+    event_type_id: int = Field(foreign_key="event_type.id")
+    zoo_id: int = Field(foreign_key="zoo.id")
+
+
+class EventSeries(EventSeriesIn, table=True):
+    """
+    A recurring event. Occurrences only exist as Event rows once they are
+    checked out or edited, until then they are expanded from the rule.
+    """
+
+    __tablename__ = "event_series"  # type: ignore
+    __table_args__ = (Index("ix_event_series_zoo_id_start_at", "zoo_id", "start_at"),)
+
+    id: int = Field(primary_key=True)
+    # start of the last occurrence, None when the rule has no end
+    until: datetime | None = Field(
+        default=None, sa_column=sa.Column(type_=TIMESTAMP(timezone=True))
+    )
+    animal_ids: list[int] = Field(
+        default_factory=list, sa_column=sa.Column(ARRAY(sa.Integer), nullable=False)
+    )
+    user_ids: list[int] = Field(
+        default_factory=list, sa_column=sa.Column(ARRAY(sa.Integer), nullable=False)
+    )
+    # cancelled occurrences
+    exdates: list[datetime] = Field(
+        default_factory=list,
+        sa_column=sa.Column(ARRAY(TIMESTAMP(timezone=True)), nullable=False),
+    )
+    created_by: int = Field(foreign_key="user.id")
+
+    created_at: datetime = created_at_field()
+    updated_at: datetime = updated_at_field()
+
 
 class AnimalActitvityLog(SQLModel, table=True):
     __tablename__ = "animal_activity_log"  # type: ignore
@@ -305,8 +445,14 @@ class AnimalActitvityLog(SQLModel, table=True):
 
 class AnimalAudit(SQLModel, table=True):
     __tablename__ = "animal_audit"  # type: ignore
+    # range partitioned by month of changed_at, partitions live in db/partitions.py
+    __table_args__ = (
+        Index("ix_animal_audit_animal_id_changed_at", "animal_id", "changed_at"),
+        Index("ix_animal_audit_changed_at", "changed_at"),
+        {"postgresql_partition_by": "RANGE (changed_at)"},
+    )
 
-    id: int = Field(primary_key=True)
+    id: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": True})
     animal_id: int = Field(foreign_key="animal.id")
     changed_field: str | None = Field(default=None)
     old_value: str | None = Field(default=None)
@@ -318,6 +464,7 @@ class AnimalAudit(SQLModel, table=True):
         default_factory=lambda: datetime.now(UTC),
         sa_column=sa.Column(
             type_=TIMESTAMP(timezone=True),
+            primary_key=True,  # the partition key has to be part of it
         ),
     )
     changed_by: int = Field(foreign_key="user.id")
@@ -330,12 +477,28 @@ class AnimalAudit(SQLModel, table=True):
     )
 
 
+# rows outside every monthly partition land here instead of failing to insert
+sa.event.listen(
+    AnimalAudit.__table__,
+    "after_create",
+    sa.DDL("CREATE TABLE animal_audit_default PARTITION OF animal_audit DEFAULT"),
+)
+
+
 class AnimalHealthLogIn(SQLModel):
     details: str
 
 
 class AnimalHealthLog(SQLModel, table=True):
     __tablename__ = "animal_health_log"  # type: ignore
+    __table_args__ = (
+        Index(
+            "ix_animal_health_log_animal_id_logged_at_id",
+            "animal_id",
+            "logged_at",
+            "id",
+        ),
+    )
 
     id: int = Field(primary_key=True)
     animal_id: int = Field(foreign_key="animal.id")
@@ -356,6 +519,33 @@ class AnimalHealthLog(SQLModel, table=True):
     )
 
 
+class ColdArchive(SQLModel, table=True):
+    """A parquet file holding `source` rows of one zoo and month, see db/archive.py."""
+
+    __tablename__ = "cold_archive"  # type: ignore
+    __table_args__ = (
+        Index(
+            "ix_cold_archive_source_zoo_id_month",
+            "source",
+            "zoo_id",
+            "month",
+            unique=True,
+        ),
+    )
+
+    id: int = Field(primary_key=True)
+    source: str  # animal_audit or animal_health_log
+    # no foreign key, archived history has to outlive a deleted zoo
+    zoo_id: int
+    month: date
+    path: str
+    row_count: int
+    archived_at: datetime = Field(
+        default_factory=lambda: datetime.now(UTC),
+        sa_column=sa.Column(type_=TIMESTAMP(timezone=True)),
+    )
+
+
 class EventCommentIn(SQLModel):
     comment: str
 
@@ -392,6 +582,73 @@ class UserEvent(SQLModel, table=True):
 
 
 # Composite models
+# the typeahead indexes need pg_trgm before any table is created
+sa.event.listen(
+    SQLModel.metadata,
+    "before_create",
+    sa.DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"),
+)
+
+
+def add_search_vector(table: sa.Table, document: str) -> None:
+    """
+    A stored tsvector column generated from `document`, with a GIN index, used
+    by db/search.py. It is left unmapped so it is never loaded with the rows.
+    """
+    table.append_column(
+        sa.Column("search_vector", TSVECTOR, sa.Computed(document, persisted=True))
+    )
+    Index(
+        f"ix_{table.name}_search_vector",
+        table.c.search_vector,
+        postgresql_using="gin",
+    )
+
+
+add_search_vector(
+    Animal.__table__,  # type: ignore
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(species, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')",
+)
+add_search_vector(
+    AnimalHealthLog.__table__,  # type: ignore
+    "to_tsvector('english', coalesce(details, ''))",
+)
+add_search_vector(
+    EventComment.__table__,  # type: ignore
+    "to_tsvector('english', coalesce(comment, ''))",
+)
+
+
+class SearchHit(BaseModel):
+    type: Literal["animal", "health_log", "comment"]
+    id: int
+    title: str
+    headline: str
+    rank: float
+    animal_id: int | None
+    event_id: int | None
+    at: datetime | None
+
+
+class UserSuggestion(BaseModel):
+    id: int
+    first_name: str
+    last_name: str
+    username: str
+    image: str | None
+    role_id: int
+
+
+class AnimalSuggestion(BaseModel):
+    id: int
+    name: str
+    species: str
+    image: str | None
+    status: str | None
+
+
 class EventWithAnimals(BaseModel):
     event: Event
     animals: list[Animal]
@@ -409,6 +666,35 @@ class EventCreate(BaseModel):
     checkout_immediately: bool = False
 
 
+class EventSeriesCreate(BaseModel):
+    series: EventSeriesIn
+    animal_ids: list[int]
+    user_ids: list[int]
+
+
+class PlannedAssignment(BaseModel):
+    name: str
+    start_at: datetime
+    end_at: datetime
+    animal_ids: list[int]
+    missing: int  # animals that could not be found
+
+
+class EventPlan(BaseModel):
+    assignments: list[PlannedAssignment]
+    complete: bool
+    elapsed_ms: float
+
+
+class ImportRowError(BaseModel):
+    row: int  # from 1, a csv header is not counted
+    errors: list[str]
+
+
+class EventImportResult(BaseModel):
+    event_ids: list[int]  # in row order, empty on a dry run
+
+
 class EventWithDetails(BaseModel):
     event: Event
     animals: list[Animal]
@@ -484,6 +770,33 @@ class AnimalHealthLogWithDetails(BaseModel):
     animal: Animal
 
 
+class HealthLogEntry(BaseModel):
+    id: int
+    details: str
+    logged_at: datetime | None
+    logged_by: int
+
+
+class HealthLogTimeline(BaseModel):
+    animal: Animal
+    users: dict[int, UserPublic]  # by id, for logged_by
+    logs: list[HealthLogEntry]
+    # pass back as `since` to only get logs added after these
+    since: str | None
+
+
+class ForecastPeriod(BaseModel):
+    start: datetime
+    end: datetime
+    state: Literal["available", "limit_reached", "resting", "scheduled", "unavailable"]
+
+
+class AnimalForecast(BaseModel):
+    animal_id: int
+    name: str
+    periods: list[ForecastPeriod]
+
+
 class RestingAnimal(BaseModel):
     animal_status: AnimalStatus
     daily_checkout_count: int
@@ -492,6 +805,22 @@ class RestingAnimal(BaseModel):
     health_logs: list[AnimalHealthLogWithDetails]
 
 
+class CalendarEvent(BaseModel):
+    event: Event
+    animal_ids: list[int]
+
+
+class CalendarAnimal(BaseModel):
+    id: int
+    name: str
+
+
+class CalendarDay(BaseModel):
+    day: date
+    event_count: int
+    animals: list[CalendarAnimal]
+
+
 class FeedEvent(BaseModel):
     name: str
     image: str | None
@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from pydantic import BaseModel, EmailStr, Field
 
 
@@ -10,6 +12,17 @@ class TokenData(BaseModel):
     username: str | None = None
 
 
+class Principal(BaseModel):
+    """The authenticated user as described by their token's claims."""
+
+    id: int
+    username: str
+    role_id: int
+    role: str
+    tier: int
+    zoo_id: int | None
+
+
 class UserUpdate(BaseModel):
     first_name: str
     last_name: str
@@ -24,6 +37,7 @@ class UserCreate(UserUpdate):
 class RoleIn(BaseModel):
     name: str
 
+
 class TierIn(BaseModel):
     tier: int
 
@@ -33,3 +47,38 @@ class ZooIn(BaseModel):
     location: str
     information: str | None
 
+
+class PlannedEvent(BaseModel):
+    name: str
+    start_at: datetime
+    end_at: datetime
+    count: int = Field(ge=1)  # animals needed
+    species: str | None = None
+    max_tier: int | None = None  # defaults to the planner's own tier
+    animal_ids: list[int] | None = None  # only pick from these
+
+
+class PlanRequest(BaseModel):
+    zoo_id: int
+    events: list[PlannedEvent] = Field(min_length=1, max_length=500)
+    budget_ms: int = Field(default=500, ge=10, le=5000)
+
+
+class ImportedEvent(BaseModel):
+    name: str
+    description: str = ""
+    start_at: datetime
+    end_at: datetime
+    event_type_id: int
+    animal_ids: list[int] = []
+    user_ids: list[int] = []
+
+
+# shared by the JSON body and the CSV upload
+MAX_IMPORT_ROWS = 1000
+
+
+class EventImport(BaseModel):
+    zoo_id: int
+    events: list[ImportedEvent] = Field(min_length=1, max_length=MAX_IMPORT_ROWS)
+    dry_run: bool = False  # validate only
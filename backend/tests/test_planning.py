@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+from core.planning import AnimalSchedule, Planner, Slot
+
+
+def at(hour: int) -> datetime:
+    return datetime(2024, 6, 1, hour)
+
+
+def schedule(rest: timedelta = timedelta(0)) -> AnimalSchedule:
+    return AnimalSchedule(
+        1, rest, max_daily_checkouts=10, max_daily_time=timedelta(hours=24)
+    )
+
+
+def test_conflicts_with_nested_existing_intervals():
+    animal = schedule()
+    animal.add(at(8), at(18))
+    animal.add(at(9), at(10))
+
+    assert animal.conflicts(at(12), at(13)) is None
+    assert animal.conflicts(at(18), at(19)) == []
+
+
+def test_conflicts_respects_rest_around_long_interval():
+    animal = schedule(rest=timedelta(hours=1))
+    animal.add(at(6), at(12))
+    animal.add(at(7), at(8))
+
+    assert animal.conflicts(at(12), at(13)) is None
+    assert animal.conflicts(at(13), at(14)) == []
+
+
+def test_solve_skips_animal_busy_in_nested_interval():
+    busy, free = schedule(), AnimalSchedule(2, timedelta(0), 10, timedelta(hours=24))
+    busy.add(at(8), at(18))
+    busy.add(at(9), at(10))
+    slot = Slot(0, at(12), at(13), 1, [1, 2])
+
+    assert Planner({1: busy, 2: free}, [slot]).solve(timedelta(seconds=1))
+    assert slot.assigned == {2}